@@ -0,0 +1,343 @@
+"""
+ArchOctopus 网络连接池模块
+    ClientPool -- 进程级httpx客户端注册表
+    SharedClient -- 从注册表借出的共享客户端
+    RateLimiter -- 令牌桶限速器
+    AdaptiveLimiter -- 按主机自适应的限速器
+
+解析线程, 下载线程及同步模块不再各自创建并关闭httpx.Client, 而是按(代理, cookies)从注册表借用客户端,
+使同一主机的请求可以复用已建立的TLS连接(keep-alive), 并在服务端支持时使用HTTP/2.
+每个主机的请求还受自适应限速器控制, 收到429/5xx时降速, 请求成功时逐步提速.
+解析页面及接口的GET请求可以使用共享的HTTP缓存(archoctopus.httpcache), 以条件请求代替重复下载.
+"""
+
+import threading
+import hashlib
+import time
+import logging
+from contextlib import contextmanager
+from importlib.util import find_spec
+from http.cookiejar import CookieJar
+from urllib.parse import urlparse
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from archoctopus.constants import APP_NAME
+from archoctopus.httpcache import cache_key
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:58.0) Gecko/20100101 Firefox/58.0',
+}
+
+# 需要降速并重试的响应码
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+logger = logging.getLogger(APP_NAME)
+
+
+def cookies_identity(cookies: [CookieJar, None]) -> str:
+    """
+    计算cookies指纹
+    每个任务都会重新读取浏览器cookies, 内容相同的cookies视为同一身份, 共享同一个客户端.
+    """
+    if not cookies:
+        return ""
+    items = sorted((c.domain, c.path, c.name, c.value or "") for c in cookies)
+    return hashlib.sha1(repr(items).encode("utf-8")).hexdigest()
+
+
+def client_key(cookies: [CookieJar, None] = None, proxies: [str, None] = None) -> tuple:
+    return proxies or "", cookies_identity(cookies)
+
+
+class RateLimiter:
+    """
+    令牌桶限速器
+    每秒补充rate个令牌, 最多积累burst个, 每个请求消耗一个令牌, 令牌不足时等待.
+    通过get按名称(如站点名)在进程内共享.
+    """
+    _lock = threading.Lock()
+    _limiters = {}
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0        # 在此时间(monotonic)之前暂停发出请求
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get(cls, name: str, rate: float, burst: int = 1):
+        """获取指定名称的共享限速器, 参数变化时更新"""
+        with cls._lock:
+            limiter = cls._limiters.get(name)
+            if limiter is None:
+                limiter = cls._limiters[name] = cls(rate, burst)
+            else:
+                limiter.rate, limiter.burst = rate, max(burst, 1)
+        return limiter
+
+    def reserve(self) -> float:
+        """
+        预定一个令牌, 不等待
+        :return: 调用方发出请求前需要等待的时间(秒)
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        """取得一个令牌, 必要时等待"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+def parse_retry_after(value: [str, None]) -> [float, None]:
+    """解析Retry-After响应头(秒数或HTTP日期), 返回等待秒数"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class AdaptiveLimiter(RateLimiter):
+    """
+    按主机自适应的令牌桶限速器(AIMD)
+    请求成功时速率加性增加(increase), 收到429/5xx时速率乘性减小(decrease),
+    响应带有Retry-After时, 在指定时间内暂停该主机的全部请求. 速率最终收敛到主机可以承受的最高值.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.5, max_rate: float = 100.0,
+                 increase: float = 0.5, decrease: float = 0.5):
+        super(AdaptiveLimiter, self).__init__(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+
+    def feedback(self, status_code: int, retry_after: [float, None] = None):
+        """根据响应码调整速率"""
+        with self.lock:
+            if status_code in RETRY_STATUS_CODES:
+                self.rate = max(self.rate * self.decrease, self.min_rate)
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                logger.debug("主机限速: status=%s, rate=%.2f, retry_after=%s", status_code, self.rate, retry_after)
+            elif status_code < 400:
+                self.rate = min(self.rate + self.increase, self.max_rate)
+
+    def update(self, response: httpx.Response):
+        self.feedback(response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+
+
+class SharedClient:
+    """
+    共享客户端
+    接口与httpx.Client保持一致(request/stream/get/post/cookies/close), 请求时按主机限制并发连接数.
+    close()只归还客户端, 连接保留在连接池中供后续任务复用.
+    """
+
+    def __init__(self,
+                 pool,
+                 client: httpx.Client,
+                 follow_redirects: bool = False,
+                 limiter: RateLimiter = None,
+                 use_cache: bool = False,
+                 identity: str = ""):
+        self.pool = pool
+        self.client = client
+        self.follow_redirects = follow_redirects
+        self.limiter = limiter      # 可选的限速器, 每个请求发出前取得一个令牌
+        self.use_cache = use_cache  # GET请求使用连接池的HTTP缓存
+        self.identity = identity    # cookies指纹, 用于区分不同账号的缓存
+
+    @property
+    def cookies(self):
+        return self.client.cookies
+
+    @property
+    def headers(self):
+        return self.client.headers
+
+    def _send(self, request: httpx.Request, follow_redirects: bool) -> httpx.Response:
+        if self.limiter is not None:
+            self.limiter.acquire()
+        host_limiter = self.pool.host_limiter(request.url)
+        host_limiter.acquire()
+        with self.pool.host_slot(request.url):
+            response = self.client.send(request, follow_redirects=follow_redirects)
+        host_limiter.update(response)
+        return response
+
+    def request(self, method, url, cache_ttl: [float, None] = None, **kwargs) -> httpx.Response:
+        """
+        发出请求
+        :param cache_ttl: 缓存有效期(秒), 有效期内直接使用缓存内容; 用于没有ETag/Last-Modified的接口
+        """
+        follow_redirects = kwargs.pop("follow_redirects", self.follow_redirects)
+        request = self.client.build_request(method, url, **kwargs)
+        cache = self.pool.cache if self.use_cache and method.upper() == "GET" else None
+        if cache is None:
+            return self._send(request, follow_redirects)
+
+        key = cache_key(request, self.identity)
+        entry = cache.get(key)
+        if entry is not None:
+            if entry.is_fresh():
+                cache.count("hits")
+                return entry.to_response(request)
+            request.headers.update(entry.validators())
+        response = self._send(request, follow_redirects)
+        if entry is not None and response.status_code == 304:
+            cache.count("revalidated")
+            cache.refresh(key, response, cache_ttl)
+            return entry.to_response(request)
+        cache.count("misses")
+        if cache.cacheable(response, cache_ttl):
+            cache.put(key, response, cache_ttl)
+        return response
+
+    def get(self, url, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+    @contextmanager
+    def stream(self, method, url, **kwargs):
+        kwargs.setdefault("follow_redirects", self.follow_redirects)
+        if self.limiter is not None:
+            self.limiter.acquire()
+        host_limiter = self.pool.host_limiter(url)
+        host_limiter.acquire()
+        with self.pool.host_slot(url):
+            with self.client.stream(method, url, **kwargs) as response:
+                host_limiter.update(response)
+                yield response
+
+    def close(self):
+        """归还客户端(不关闭连接)"""
+        self.client = None
+
+
+class ClientPool:
+    """
+    进程级客户端注册表
+    以(代理, cookies指纹)为键缓存httpx.Client, 连接池参数可通过configure调整.
+    """
+    max_connections = 100           # 单个客户端最大连接数
+    max_keepalive_connections = 40  # 单个客户端最大保持连接数
+    keepalive_expiry = 30.0         # 空闲连接保持时间(秒)
+    max_per_host = 8                # 单个主机最大并发连接数
+    http2 = True                    # 服务端支持时使用HTTP/2(需要安装h2)
+    host_rate = 8.0                 # 单个主机初始请求速率(次/秒), 之后按响应自适应调整
+    host_min_rate = 0.5             # 单个主机最低请求速率
+    host_max_rate = 100.0           # 单个主机最高请求速率
+    cache = None                    # 共享HTTP缓存(HttpCache), 为None时不使用缓存
+
+    _lock = threading.Lock()
+    _clients = {}
+    _host_slots = {}
+    _host_limiters = {}
+
+    @classmethod
+    def configure(cls, **kwargs):
+        """调整连接池参数, 只影响之后创建的客户端"""
+        for key, value in kwargs.items():
+            if not hasattr(cls, key) or key.startswith("_"):
+                raise AttributeError(key)
+            setattr(cls, key, value)
+        with cls._lock:
+            cls._host_slots.clear()
+            cls._host_limiters.clear()
+
+    @classmethod
+    def limits(cls) -> httpx.Limits:
+        return httpx.Limits(max_connections=cls.max_connections,
+                            max_keepalive_connections=cls.max_keepalive_connections,
+                            keepalive_expiry=cls.keepalive_expiry)
+
+    @classmethod
+    def use_http2(cls) -> bool:
+        return cls.http2 and find_spec("h2") is not None
+
+    @classmethod
+    def borrow(cls,
+               cookies: CookieJar = None,
+               proxies: [str, None] = None,
+               follow_redirects: bool = False,
+               limiter: RateLimiter = None,
+               cache: bool = False) -> SharedClient:
+        """
+        借用客户端
+        :param cache: GET请求是否使用HTTP缓存(解析页面及接口使用, 图片下载不使用)
+        """
+        key = client_key(cookies, proxies)
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.Client(headers=HEADERS,
+                                      cookies=cookies,
+                                      proxies=proxies,
+                                      limits=cls.limits(),
+                                      http2=cls.use_http2())
+                cls._clients[key] = client
+                logger.debug("新建共享客户端: proxies=%s, clients=%s", proxies, len(cls._clients))
+        return SharedClient(cls, client,
+                            follow_redirects=follow_redirects,
+                            limiter=limiter,
+                            use_cache=cache,
+                            identity=key[1])
+
+    @classmethod
+    @contextmanager
+    def host_slot(cls, url):
+        """占用目标主机的一个并发连接名额"""
+        host = urlparse(str(url)).hostname or ""
+        with cls._lock:
+            slot = cls._host_slots.get(host)
+            if slot is None:
+                slot = cls._host_slots[host] = threading.BoundedSemaphore(cls.max_per_host)
+        with slot:
+            yield
+
+    @classmethod
+    def host_limiter(cls, url) -> AdaptiveLimiter:
+        """获取目标主机的自适应限速器, 线程下载, 异步下载及解析请求共享"""
+        host = urlparse(str(url)).hostname or ""
+        with cls._lock:
+            limiter = cls._host_limiters.get(host)
+            if limiter is None:
+                limiter = cls._host_limiters[host] = AdaptiveLimiter(cls.host_rate,
+                                                                     burst=cls.max_per_host,
+                                                                     min_rate=cls.host_min_rate,
+                                                                     max_rate=cls.host_max_rate)
+        return limiter
+
+    @classmethod
+    def close_all(cls):
+        """关闭全部客户端(程序退出时调用)"""
+        with cls._lock:
+            for client in cls._clients.values():
+                client.close()
+            cls._clients.clear()
+            if cls.cache is not None:
+                stats = cls.cache.get_stats()
+                logger.info("HTTP缓存统计: 命中%s次, 重新验证%s次, 未命中%s次, 缓存容量%s字节",
+                            stats["hits"], stats["revalidated"], stats["misses"], stats["bytes"])
+                cls.cache.close()
+                cls.cache = None
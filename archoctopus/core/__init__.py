@@ -0,0 +1,10 @@
+"""
+ArchOctopus 核心引擎接口
+
+解析(archoctopus.plugins), 下载(archoctopus.download), 任务(archoctopus.task)及同步(archoctopus.sync)模块
+不依赖wxPython, 运行所需的配置, 数据库及事件回调通过运行环境(Context)注入, 导入时不会导入wx:
+    -- GUI前端(archoctopus.main)启动时调用setup注入wx.FileConfig, AoDatabase及WxEvents(回调在主线程中执行);
+    -- 无界面运行(archoctopus.core.runner)时使用DictConfig及默认的Events, 任务事件由TaskListener接收.
+"""
+
+from .context import Context, DictConfig, Events, TaskListener, setup, get_context
@@ -0,0 +1,147 @@
+"""
+ArchOctopus 运行环境
+    Context -- 运行环境: 配置对象, 数据库连接, 事件分发器, 安装目录
+    DictConfig -- 字典配置, 提供与wx.FileConfig相同的Read/ReadInt/ReadBool/ReadFloat接口
+    Events -- 事件分发器
+    TaskListener -- 任务事件接收者
+    setup / get_context -- 设置 / 获取全局运行环境
+
+GUI前端在启动时调用setup注入wx.FileConfig, AoDatabase及在主线程中执行回调的事件分发器;
+未调用setup时(无界面运行), get_context返回使用默认配置, 内存数据库及直接回调的运行环境.
+"""
+
+import os
+import threading
+import logging
+
+from archoctopus.constants import APP_NAME
+from archoctopus.database import AoDatabase
+
+INSTALL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))   # archoctopus包目录(含plugins)
+
+logger = logging.getLogger(APP_NAME)
+
+_context = None
+_lock = threading.Lock()
+
+
+class DictConfig:
+    """
+    字典配置: 无界面运行时代替wx.FileConfig
+    键为"/分组/名称"形式的路径, 如 {"/General/download_dir": "/data/images"}
+    """
+
+    def __init__(self, values: dict = None):
+        self.values = dict(values or {})
+
+    def Read(self, key: str, defaultVal: str = "") -> str:
+        return str(self.values.get(key, defaultVal))
+
+    def ReadInt(self, key: str, defaultVal: int = 0) -> int:
+        return int(self.values.get(key, defaultVal))
+
+    def ReadFloat(self, key: str, defaultVal: float = 0.0) -> float:
+        return float(self.values.get(key, defaultVal))
+
+    def ReadBool(self, key: str, defaultVal: bool = False) -> bool:
+        value = self.values.get(key, defaultVal)
+        if isinstance(value, str):
+            return value.strip().lower() in ("1", "true", "yes", "on")
+        return bool(value)
+
+    def Write(self, key: str, value: str) -> bool:
+        self.values[key] = value
+        return True
+
+    WriteInt = WriteFloat = WriteBool = Write
+
+    def Flush(self) -> bool:
+        return True
+
+
+class Events:
+    """
+    事件分发器
+    引擎线程通过post通知前端, 默认在调用线程中直接执行回调(回调需自行保证线程安全), 回调异常只记录日志;
+    GUI前端使用WxEvents(archoctopus.main), 回调在主线程中执行.
+    """
+
+    def post(self, callback, *args, **kwargs):
+        """执行回调"""
+        try:
+            callback(*args, **kwargs)
+        except Exception as e:
+            logger.error("事件回调错误: %s - %s", e, getattr(callback, "__name__", callback))
+
+    def post_later(self, delay: float, callback, *args, **kwargs):
+        """延时delay秒后执行回调"""
+        timer = threading.Timer(delay, self.post, (callback, *args), kwargs)
+        timer.daemon = True
+        timer.start()
+
+
+class TaskListener:
+    """
+    任务事件接收者: 解析线程及下载线程通过Events.post调用以下方法通知任务进度
+    GUI中由任务面板(AoTaskPanel)实现同名方法; 无界面运行时继承本类.
+    """
+
+    def __init__(self, task_info: dict):
+        self.task_info = task_info      # 任务信息, 至少包括"id"及"url"
+        self.gauge_value = task_info.get("download_count", 0)   # 已完成的条目数
+
+    def call_task_name(self, task_dir: str):
+        """解析得到任务名称及下载目录"""
+        self.task_info["name"] = os.path.basename(task_dir)
+        self.task_info["dir"] = task_dir
+
+    def call_imgs_sum(self, imgs_sum: int):
+        """解析完成, 条目总数"""
+        self.task_info["total_count"] = imgs_sum
+
+    def call_abort(self, msg: str):
+        """任务主动中止"""
+        logger.info("任务中止: %s", msg)
+
+    def call_refresh_gauge(self, download_count: int):
+        """下载进度(由进度汇总线程合并后定期通知)"""
+        self.gauge_value = download_count
+
+    def call_thread_done(self):
+        """一个下载线程(协程)结束"""
+
+
+class Context:
+    """运行环境"""
+
+    def __init__(self, cfg=None, con: AoDatabase = None, events: Events = None, install_dir: str = None):
+        self.cfg = cfg if cfg is not None else DictConfig()     # 配置对象(wx.FileConfig或DictConfig)
+        self.events = events or Events()                        # 事件分发器
+        self.install_dir = install_dir or INSTALL_DIR           # 安装目录(解析插件目录的上级目录)
+        self._con = con
+        self._con_lock = threading.Lock()
+
+    @property
+    def con(self) -> AoDatabase:
+        """数据库连接, 未提供时使用内存数据库"""
+        with self._con_lock:
+            if self._con is None:
+                self._con = AoDatabase()
+            return self._con
+
+
+def setup(cfg=None, con: AoDatabase = None, events: Events = None, install_dir: str = None) -> Context:
+    """设置全局运行环境"""
+    global _context
+    with _lock:
+        _context = Context(cfg=cfg, con=con, events=events, install_dir=install_dir)
+    return _context
+
+
+def get_context() -> Context:
+    """获取全局运行环境, 未设置时使用默认环境"""
+    global _context
+    with _lock:
+        if _context is None:
+            _context = Context()
+        return _context
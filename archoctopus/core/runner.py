@@ -0,0 +1,227 @@
+"""
+ArchOctopus 无界面运行
+    HeadlessTask -- 无界面任务: 实现任务调度器要求的任务接口及任务事件
+    Collector -- 批量收集: 通过任务调度器运行多个任务, 等待全部完成
+
+命令行用法:
+    python -m archoctopus.core.runner [-d 下载目录] [--db 数据库文件] [-w 下载线程数] url [url ...]
+指定数据库文件时, 中断的任务再次运行时从中断的位置继续, 已完成的网址跳过.
+"""
+
+import os
+import sys
+import threading
+import argparse
+import logging
+
+from archoctopus.constants import APP_NAME
+from archoctopus.client import ClientPool
+from archoctopus.core.context import TaskListener, get_context, setup, DictConfig
+from archoctopus.database import AoDatabase
+from archoctopus.journal import TaskJournal
+from archoctopus.progress import ProgressAggregator
+from archoctopus.store import ContentStore
+from archoctopus.task import TaskItem, TaskScheduler
+from archoctopus.utils import format_bytes
+
+logger = logging.getLogger(APP_NAME)
+
+
+class HeadlessTask(TaskListener):
+    """无界面任务, 事件在解析线程及下载线程中直接执行"""
+
+    def __init__(self, collector, task_info: dict):
+        super(HeadlessTask, self).__init__(task_info)
+        self.collector = collector
+        self.con = collector.context.con
+        self.task = None
+        self.worker_limit = 0
+        self.download_thread_count = 0
+        self.done_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, workers: int = None):
+        """启动任务(由任务调度器调用)"""
+        self.task_info["status"] = 0
+        cfg = self.collector.context.cfg
+        use_async = cfg.ReadBool("/General/async_download", defaultVal=False)
+        if use_async:
+            self.download_thread_count = cfg.ReadInt("/General/async_concurrency", defaultVal=64)
+        else:
+            self.worker_limit = cfg.ReadInt("/General/download_thread_count", defaultVal=5)
+            self.download_thread_count = min(self.worker_limit, workers) if workers else self.worker_limit
+        self.task = TaskItem(parent=self, download_thread_count=self.download_thread_count, use_async=use_async,
+                             proxies=self.collector.proxies)
+        self.task.run()
+
+    def resize_workers(self, workers: int):
+        """任务调度器重新分配下载线程数"""
+        if self.task:
+            # 新线程可能在计数更新前就已退出并调用call_thread_done, 持有锁直到计数更新完成
+            with self._lock:
+                self.download_thread_count += self.task.resize(min(self.worker_limit, workers))
+
+    def call_queued(self):
+        logger.info("任务等待中: %s", self.task_info["url"])
+
+    def call_task_name(self, task_dir: str):
+        super(HeadlessTask, self).call_task_name(task_dir)
+        sql = "UPDATE history SET name=?, domain=?, dir=? WHERE id=?"
+        self.con.execute(sql, (self.task_info["name"], self.task_info.get("domain"), task_dir, self.task_info["id"]))
+
+    def call_imgs_sum(self, imgs_sum: int):
+        super(HeadlessTask, self).call_imgs_sum(imgs_sum)
+        logger.info("解析完成: %s, 条目数: %s", self.task_info["url"], imgs_sum)
+        sql = "UPDATE history SET status=?, total_count=? WHERE id=?"
+        self.con.execute(sql, (1, imgs_sum, self.task_info["id"]))
+
+    def call_thread_done(self):
+        """所有下载线程结束后通知收集器"""
+        with self._lock:
+            self.download_thread_count -= 1
+            if self.download_thread_count != 0:
+                return
+        ProgressAggregator.instance().unregister(self.task.progress)
+        # 任务正常结束(未被停止且解析完成), 清除进度记录
+        if self.task.running_event.is_set() and self.task.journal.parsed:
+            self.task.journal.close()
+        self.task_info["download_count"] = self.gauge_value
+        self.task_info["saved_bytes"] = self.task.progress.saved_bytes
+        logger.info("任务结束: %s, 已完成: %s/%s, 图片库节省: %s",
+                    self.task_info["url"], self.gauge_value, self.task_info.get("total_count", 0),
+                    format_bytes(self.task_info["saved_bytes"]))
+        self.collector.done(self)
+        self.done_event.set()
+
+    def stop(self):
+        if self.task:
+            self.task.stop()
+
+
+class Collector:
+    """
+    批量收集
+    使用全局运行环境(get_context), 配置对象, 数据库及事件分发器在创建前通过core.setup注入.
+    """
+
+    def __init__(self, proxies=None):
+        self.context = get_context()
+        self.proxies = proxies
+        cfg = self.context.cfg
+        self.scheduler = TaskScheduler(max_tasks=cfg.ReadInt("/General/max_running_tasks", defaultVal=3),
+                                       max_workers=cfg.ReadInt("/General/max_download_workers", defaultVal=16))
+        self.tasks = []
+        self._lock = threading.RLock()      # 任务调度器不是线程安全的, 任务结束事件来自下载线程
+        # 解析插件以"plugins.<name>"形式导入
+        if self.context.install_dir not in sys.path:
+            sys.path.append(self.context.install_dir)
+
+    def add(self, url: str, redownload: bool = False) -> [HeadlessTask, None]:
+        """
+        添加任务: 未完成的任务从中断的位置继续; 已下载过的网址跳过(redownload为True时重新下载)
+        :return: 任务对象, 跳过时返回None
+        """
+        con = self.context.con
+        row = con.select_one("SELECT id, name, dir FROM history WHERE url=?", (url,))
+        if row is None:
+            con.execute("INSERT INTO history (url) VALUES (?)", (url,))
+            task_info = {"id": con.select_one("SELECT id FROM history WHERE url=?", (url,))[0], "url": url}
+        else:
+            task_id = row[0]
+            journal = TaskJournal(con, task_id)
+            if con.select_one("SELECT 1 FROM task_journal WHERE task_id=?", (task_id,)):
+                total, done = journal.sync_counts()
+                task_info = {"id": task_id, "url": url, "name": row[1], "dir": row[2],
+                             "total_count": total, "download_count": done}
+                logger.info("继续任务: %s, 已完成: %s/%s", url, done, total)
+            elif redownload:
+                con.execute("DELETE FROM urls WHERE task_id=?", (task_id,))
+                journal.close()
+                con.execute("UPDATE history SET total_count=0, download_count=0 WHERE id=?", (task_id,))
+                task_info = {"id": task_id, "url": url}
+            else:
+                logger.info("跳过已下载的网址: %s", url)
+                return None
+
+        task = HeadlessTask(self, task_info)
+        with self._lock:
+            self.tasks.append(task)
+            self.scheduler.submit(task)
+        return task
+
+    def done(self, task: HeadlessTask):
+        """任务结束, 启动等待中的任务"""
+        with self._lock:
+            self.scheduler.done(task)
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待所有任务结束, 超时返回False"""
+        with self._lock:
+            tasks = list(self.tasks)
+        return all(task.done_event.wait(timeout) for task in tasks)
+
+    def stop(self):
+        """停止所有任务"""
+        with self._lock:
+            for task in self.tasks:
+                if self.scheduler.is_pending(task):
+                    self.scheduler.cancel(task)
+                    task.done_event.set()
+                else:
+                    task.stop()
+
+    def collect(self, urls: list, redownload: bool = False) -> list:
+        """下载网址列表, 返回各任务信息"""
+        tasks = [task for task in (self.add(url, redownload) for url in urls) if task]
+        self.wait()
+        self.context.con.barrier()      # 返回时下载结果已写入数据库
+        logger.info("图片库累计节省: %s", format_bytes(self.saved_bytes()))
+        return [task.task_info for task in tasks]
+
+    def saved_bytes(self) -> int:
+        """图片库累计节省的下载流量及磁盘空间(字节)"""
+        return ContentStore(self.context.con).saved_bytes()
+
+
+def main(argv: list = None):
+    arg_parser = argparse.ArgumentParser(prog="archoctopus.core.runner", description="无界面批量下载网页图片")
+    arg_parser.add_argument("urls", nargs="+", help="任务网址")
+    arg_parser.add_argument("-d", "--dir", help="下载根目录")
+    arg_parser.add_argument("--db", help="数据库文件, 用于记录历史及继续中断的任务(默认使用内存数据库)")
+    arg_parser.add_argument("-w", "--workers", type=int, default=5, help="每个任务的下载线程数")
+    arg_parser.add_argument("-t", "--tasks", type=int, default=3, help="同时运行的任务数")
+    arg_parser.add_argument("--redownload", action="store_true", help="重新下载已完成的网址")
+    arg_parser.add_argument("-v", "--verbose", action="store_true", help="输出调试日志")
+    args = arg_parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s: %(message)s")
+    values = {
+        "/General/download_thread_count": args.workers,
+        "/General/max_running_tasks": args.tasks,
+    }
+    if args.dir:
+        values["/General/download_dir"] = os.path.abspath(args.dir)
+    con = AoDatabase(args.db) if args.db else None
+    setup(cfg=DictConfig(values), con=con)
+
+    collector = Collector()
+    try:
+        results = collector.collect(args.urls, redownload=args.redownload)
+        saved = collector.saved_bytes()
+    except KeyboardInterrupt:
+        collector.stop()
+        collector.wait(timeout=10)
+        return 1
+    finally:
+        ClientPool.close_all()
+        get_context().con.on_close()
+    for info in results:
+        print("{}\t{}/{}\t{}\t{}".format(info["url"], info.get("download_count", 0), info.get("total_count", 0),
+                                         format_bytes(info.get("saved_bytes", 0)), info.get("dir", "")))
+    print("图片库累计节省: {}".format(format_bytes(saved)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
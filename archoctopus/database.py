@@ -5,7 +5,8 @@ AO数据库类
 2. tags -- 标签分类表
 3. account -- 同步账户表
 4. urls -- 历史图片表
-5. ...
+5. blobs, blob_urls -- 内容寻址图片库
+6. ...
 """
 
 
@@ -13,7 +14,10 @@ import threading
 import sqlite3
 import logging
 import os
-from queue import Queue
+import time
+from queue import Queue, Empty, Full
+from itertools import groupby
+from operator import itemgetter
 
 from archoctopus.constants import APP_NAME
 
@@ -61,9 +65,20 @@ CREATE TABLE IF NOT EXISTS urls (
     "width"	    INTEGER,
     "height"	INTEGER,
     "bytes"	    INTEGER,
+    "item"	    TEXT,
     PRIMARY KEY("task_id","url")
 )"""
 
+# 任务进度记录: 翻页游标(JSON)及解析完成标识, 用于程序中断后继续任务; 待下载条目数据保存在urls.item中
+INIT_TASK_JOURNAL_SQL = """
+CREATE TABLE IF NOT EXISTS "task_journal" (
+    "task_id"	INTEGER NOT NULL,
+    "cursors"	TEXT,
+    "parsed"	INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY("task_id")
+)
+"""
+
 # ----------------------------------------------------------------------
 INIT_ACCOUNT_SQL = """
 CREATE TABLE IF NOT EXISTS "sync_account" (
@@ -93,6 +108,9 @@ CREATE TABLE IF NOT EXISTS "sync_boards" (
     "total"	INTEGER,
     "created_t"	INTEGER,
     "updated_t"	INTEGER,
+    "sync_total"	INTEGER,
+    "sync_updated_t"	INTEGER,
+    "sync_head"	TEXT,
     PRIMARY KEY("board_id","site")
 )
 """
@@ -110,14 +128,117 @@ CREATE TABLE IF NOT EXISTS "sync_items" (
     "width"	INTEGER,
     "height"	INTEGER,
     "bytes"	INTEGER,
+    "attempts"	INTEGER NOT NULL DEFAULT 0,
+    "next_try"	INTEGER NOT NULL DEFAULT 0,
     PRIMARY KEY("url","board_id")
 )
 """
 
+# ----------------------------------------------------------------------
+# 内容寻址图片库: 按文件内容的SHA-256登记已下载的图片, 相同内容只保存一份(其他位置为硬链接或副本)
+INIT_BLOBS_SQL = """
+CREATE TABLE IF NOT EXISTS "blobs" (
+    "sha256"	TEXT NOT NULL,
+    "path"	TEXT NOT NULL,
+    "bytes"	INTEGER,
+    "type"	TEXT,
+    "width"	INTEGER,
+    "height"	INTEGER,
+    "hits"	INTEGER NOT NULL DEFAULT 0,
+    "created_t"	TEXT NOT NULL DEFAULT (datetime(CURRENT_TIMESTAMP, 'localtime')),
+    PRIMARY KEY("sha256")
+)
+"""
+
+INIT_BLOB_URLS_SQL = """
+CREATE TABLE IF NOT EXISTS "blob_urls" (
+    "url"	TEXT NOT NULL,
+    "sha256"	TEXT NOT NULL,
+    PRIMARY KEY("url")
+)
+"""
+
+# Archdaily收藏页面同步完成标记: 页面内的全部图片写入sync_items后记录
+INIT_SYNC_FAVS_SQL = """
+CREATE TABLE IF NOT EXISTS "sync_favs" (
+    "board_id"	INTEGER NOT NULL,
+    "site"	TEXT NOT NULL,
+    "url"	TEXT NOT NULL,
+    PRIMARY KEY("board_id", "site", "url")
+)
+"""
+
+# 同步下载队列索引: 待下载条目按rowid分批领取(索引隐含rowid列, 可直接用于state=0 AND rowid>?范围查询)
+INIT_SYNC_PENDING_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS "sync_items_pending" ON "sync_items" ("state")
+"""
+
+# 旧版本数据库升级: 新增的数据表
+MIGRATE_TABLES = (INIT_BLOBS_SQL, INIT_BLOB_URLS_SQL, INIT_TASK_JOURNAL_SQL, INIT_SYNC_FAVS_SQL)
+
+# 旧版本数据库升级: (表名, 字段名, 字段定义)
+MIGRATE_COLUMNS = (
+    ("sync_items", "attempts", "INTEGER NOT NULL DEFAULT 0"),      # 下载失败次数
+    ("sync_items", "next_try", "INTEGER NOT NULL DEFAULT 0"),      # 下次允许重试的时间戳
+    ("sync_boards", "sync_total", "INTEGER"),           # 上次完整同步时的条目数
+    ("sync_boards", "sync_updated_t", "INTEGER"),       # 上次完整同步时的更新时间
+    ("sync_boards", "sync_head", "TEXT"),               # 上次完整同步时最新条目的url
+    ("urls", "item", "TEXT"),                           # 待下载条目数据(JSON)
+)
+
+
+def _to_columns(rows: list, width: int) -> list:
+    """行列表转为列列表"""
+    if not width:
+        return []
+    return [list(column) for column in zip(*rows)]
+
+
+class ResultStream:
+    """
+    分块查询结果队列
+    容量有限, 数据库线程写入时队列已满则等待消费者; 消费者放弃读取后写入立即返回False.
+    """
+
+    def __init__(self, maxsize: int, chunk_size: int, columnar: bool = False):
+        self.queue = Queue(maxsize=maxsize)
+        self.chunk_size = chunk_size
+        self.columnar = columnar
+        self.cancelled = threading.Event()
+
+    def put(self, chunk) -> bool:
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(chunk, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def get(self):
+        return self.queue.get()
+
+    def cancel(self):
+        self.cancelled.set()
+
 
 class AoDatabase(threading.Thread):
+    """
+    AO数据库线程
+    写入语句通过队列交由数据库线程执行, 并在数据库线程中合并为批次,
+    批次大小与时间窗口由batch_size和batch_window控制, 每个批次在一个事务(BEGIN/COMMIT)中执行,
+    连续的相同语句使用cursor.executemany执行.
+
+    数据库文件以WAL模式打开, 查询语句(select/select_one)在调用线程中使用只读连接池直接执行,
+    不再排在写入语句之后. 调用线程自己入队的写入语句会在其后续查询之前提交(read-your-writes).
+    内存数据库无法在多个连接间共享, 查询仍通过队列交由数据库线程执行.
 
-    def __init__(self, db=":memory:"):
+    大结果集使用iter_select分块读取: 每次fetchmany取出chunk_size行,
+    经数据库线程执行时通过容量为stream_buffer的有界队列传递, 消费者未取走时生产者暂停.
+    """
+
+    def __init__(self, db=":memory:", batch_size=500, batch_window=0.05, read_pool_size=3,
+                 chunk_size=256, stream_buffer=4):
         super(AoDatabase, self).__init__()
         self.logger = logging.getLogger(APP_NAME)
 
@@ -125,6 +246,34 @@ class AoDatabase(threading.Thread):
         self.autocommit = True
         self.reqs = Queue()  # 查询语句队列
 
+        self.batch_size = batch_size        # 单个批次最大语句数
+        self.batch_window = batch_window    # 批次时间窗口(秒): 从批次中第一条语句入队开始计时
+        self.stats = {
+            "batches": 0,           # 已提交批次数
+            "statements": 0,        # 已执行写入语句数
+            "errors": 0,            # 执行错误数
+            "max_batch": 0,         # 最大批次语句数
+            "last_batch": 0,        # 最近一次批次语句数
+            "last_commit_time": 0.0,    # 最近一次批次执行耗时(秒)
+        }
+        self._stats_lock = threading.Lock()
+
+        # 写入序号: 用于查询前等待调用线程自己入队的写入语句提交
+        self._seq_lock = threading.Lock()
+        self._committed = threading.Condition()
+        self._write_seq = 0         # 最近入队的写入序号
+        self._committed_seq = 0     # 最近提交的写入序号
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+
+        # 只读连接池(内存数据库为None)
+        self.read_pool_size = read_pool_size
+        self.read_pool = None if self.db == ":memory:" else Queue()
+        self._read_cons = []
+
+        self.chunk_size = chunk_size            # 分块查询每块行数
+        self.stream_buffer = stream_buffer      # 分块查询结果队列容量(块)
+
         if os.path.exists(self.db) and os.path.isfile(self.db):
             self.con = sqlite3.connect(self.db,
                                        isolation_level=None,
@@ -147,62 +296,300 @@ class AoDatabase(threading.Thread):
             self.cur.execute(INIT_SYNC_BOARDS_SQL)
             self.cur.execute(INIT_SYNC_URLS_SQL)
 
+        self._migrate()
+
+        if self.read_pool is not None:
+            self.cur.execute("PRAGMA journal_mode=WAL").fetchall()
+
         self.setDaemon(True)
         self.start()
 
+    def _migrate(self):
+        """为旧版本数据库补充新增数据表, 字段和索引"""
+        for sql in MIGRATE_TABLES:
+            self.cur.execute(sql)
+        for table, column, definition in MIGRATE_COLUMNS:
+            columns = [row[1] for row in self.cur.execute(f'PRAGMA table_info("{table}")')]
+            if columns and column not in columns:
+                self.cur.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {definition}')
+                self.logger.info("数据库升级: %s.%s", table, column)
+        self.cur.execute(INIT_SYNC_PENDING_INDEX_SQL)
+
+    def _execute_group(self, cursor, req, args) -> int:
+        """
+        执行一组相同的写入语句, 批量执行出错时回退为逐条执行, 避免单条错误影响整组
+        :return: 出错的语句数
+        """
+        errors = 0
+        try:
+            cursor.execute("SAVEPOINT ao_group")
+            if len(args) == 1:
+                cursor.execute(req, args[0])
+            else:
+                cursor.executemany(req, args)
+        except (sqlite3.OperationalError, sqlite3.IntegrityError, sqlite3.ProgrammingError, ValueError) as e:
+            cursor.execute("ROLLBACK TO ao_group")
+            if len(args) == 1:
+                self.logger.error("数据库错误: %s", e)
+                errors += 1
+            else:
+                for arg in args:
+                    try:
+                        cursor.execute(req, arg)
+                    except (sqlite3.OperationalError, sqlite3.IntegrityError,
+                            sqlite3.ProgrammingError, ValueError) as err:
+                        self.logger.error("数据库错误: %s", err)
+                        errors += 1
+        finally:
+            cursor.execute("RELEASE ao_group")
+        return errors
+
+    def _commit_batch(self, cursor, batch: list):
+        """在一个事务中执行批次内的全部写入语句"""
+        if not batch:
+            return
+        start = time.perf_counter()
+        count = errors = 0
+        cursor.execute("BEGIN")
+        try:
+            for req, group in groupby(batch, key=itemgetter(0)):
+                args = []
+                for _req, arg, _res, many, _seq in group:
+                    if many:
+                        args.extend(arg)
+                    else:
+                        args.append(arg)
+                if args:
+                    errors += self._execute_group(cursor, req, args)
+                    count += len(args)
+        finally:
+            cursor.execute("COMMIT")
+        self._mark_committed(batch[-1][4])
+        with self._stats_lock:
+            self.stats["batches"] += 1
+            self.stats["statements"] += count
+            self.stats["errors"] += errors
+            self.stats["last_batch"] = count
+            self.stats["max_batch"] = max(self.stats["max_batch"], count)
+            self.stats["last_commit_time"] = time.perf_counter() - start
+
     def run(self):
         cursor = self.con.cursor()
         cursor.execute('PRAGMA synchronous=OFF')
+        batch = []
+        deadline = 0
         while True:
-            req, arg, res = self.reqs.get()
+            try:
+                if batch:
+                    item = self.reqs.get(timeout=max(deadline - time.monotonic(), 0))
+                else:
+                    item = self.reqs.get()
+            except Empty:
+                # 时间窗口结束, 提交批次
+                self._commit_batch(cursor, batch)
+                batch = []
+                continue
+
+            req, arg, res, many, _seq = item
             if req == '--close--':
+                self._commit_batch(cursor, batch)
                 break
             elif req == '--commit--':
-                self.con.commit()
+                self._commit_batch(cursor, batch)
+                batch = []
+            elif res is None:
+                # 写入语句: 加入批次
+                if not batch:
+                    deadline = time.monotonic() + self.batch_window
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._commit_batch(cursor, batch)
+                    batch = []
             else:
+                # 查询语句: 先提交已入队的写入语句, 保证查询结果与入队顺序一致
+                self._commit_batch(cursor, batch)
+                batch = []
+                if isinstance(res, ResultStream):
+                    self._stream_rows(cursor, req, arg, res)
+                    continue
                 try:
                     cursor.execute(req, arg)
                 except (sqlite3.OperationalError, sqlite3.IntegrityError, sqlite3.ProgrammingError, ValueError) as e:
                     self.logger.error("数据库错误: %s", e)
-                    if res:
-                        res.put(tuple())
-                        res.put('--no more--')
+                    res.put(tuple())
+                    res.put('--no more--')
                 else:
-                    if res:
-                        for rec in cursor:
-                            res.put(rec)
-                        res.put('--no more--')
+                    for rec in cursor:
+                        res.put(rec)
+                    res.put('--no more--')
         self.con.close()
+        for con in self._read_cons:
+            con.close()
+
+    def _fetch_chunks(self, cursor, req, arg, chunk_size, columnar):
+        """执行查询并按块生成结果, 出错时生成一个只含空行的块(与select一致)"""
+        try:
+            cursor.execute(req, arg)
+            width = len(cursor.description or ())
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield _to_columns(rows, width) if columnar else rows
+        except (sqlite3.OperationalError, sqlite3.IntegrityError, sqlite3.ProgrammingError, ValueError) as e:
+            self.logger.error("数据库错误: %s", e)
+            yield [] if columnar else [tuple()]
+
+    def _stream_rows(self, cursor, req, arg, stream):
+        """在数据库线程中执行分块查询, 结果块写入有界队列, 消费者放弃读取时中止"""
+        for chunk in self._fetch_chunks(cursor, req, arg, stream.chunk_size, stream.columnar):
+            if not stream.put(chunk):
+                break
+        stream.put('--no more--')
+
+    def _mark_committed(self, seq):
+        with self._committed:
+            if seq > self._committed_seq:
+                self._committed_seq = seq
+                self._committed.notify_all()
+
+    def _enqueue_write(self, req, arg, many):
+        with self._seq_lock:
+            self._write_seq += 1
+            seq = self._write_seq
+            self.reqs.put((req, arg, None, many, seq))
+        self._local.seq = seq
+
+    def _wait_committed(self, seq):
+        """等待指定序号之前的写入语句全部提交"""
+        with self._committed:
+            if self._committed_seq >= seq:
+                return
+        self.reqs.put(('--commit--', tuple(), None, False, 0))     # 立即提交当前批次, 不等待时间窗口
+        with self._committed:
+            self._committed.wait_for(lambda: self._committed_seq >= seq)
+
+    def barrier(self):
+        """等待所有线程已入队的写入语句提交"""
+        self._wait_committed(self._write_seq)
 
     def execute(self, req, arg=None, res=None):
         """
         `execute` calls are non-blocking: just queue up the request and return immediately.
         """
-        self.reqs.put((req, arg or tuple(), res))
+        if req in ('--commit--', '--close--'):
+            # 控制消息不是写入语句, 不分配写入序号(否则该序号永远不会被标记为已提交)
+            self.reqs.put((req, tuple(), None, False, 0))
+        elif res is None:
+            self._enqueue_write(req, arg or tuple(), False)
+        else:
+            self.reqs.put((req, arg or tuple(), res, False, 0))
 
     def executemany(self, req, items):
-        for item in items:
-            self.execute(req, item)
+        """Queue up a homogeneous statement, executed with `cursor.executemany` in one batch."""
+        self._enqueue_write(req, [tuple(item) for item in items], True)
+
+    def _get_read_con(self) -> sqlite3.Connection:
+        """从只读连接池中取出连接, 连接数未达上限时新建"""
+        try:
+            return self.read_pool.get_nowait()
+        except Empty:
+            pass
+        with self._pool_lock:
+            if len(self._read_cons) < self.read_pool_size:
+                con = sqlite3.connect(self.db,
+                                      check_same_thread=False,
+                                      detect_types=sqlite3.PARSE_DECLTYPES)
+                con.execute("PRAGMA query_only=ON")
+                self._read_cons.append(con)
+                return con
+        return self.read_pool.get()
+
+    def _read(self, req, arg, fetch_one=False) -> list:
+        """在调用线程中使用只读连接执行查询"""
+        self._wait_committed(getattr(self._local, "seq", 0))
+        con = self._get_read_con()
+        try:
+            cursor = con.execute(req, arg or tuple())
+            if fetch_one:
+                row = cursor.fetchone()
+                return [row] if row is not None else []
+            return cursor.fetchall()
+        except (sqlite3.OperationalError, sqlite3.IntegrityError, sqlite3.ProgrammingError, ValueError) as e:
+            self.logger.error("数据库错误: %s", e)
+            return [tuple()]
+        finally:
+            self.read_pool.put(con)
+
+    def iter_select(self, req, arg=None, chunk_size=None, columnar=False):
+        """
+        分块读取查询结果, 每次生成最多chunk_size行组成的列表, 整个结果集不会同时驻留在内存中.
+        columnar=True时每块按列返回: [第1列值列表, 第2列值列表, ...].
+
+        文件数据库在调用线程中使用只读连接按需fetchmany, 迭代结束(或生成器关闭)时归还连接;
+        内存数据库由数据库线程通过有界队列传递结果块.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        arg = arg or tuple()
+        if self.read_pool is not None:
+            self._wait_committed(getattr(self._local, "seq", 0))
+            con = self._get_read_con()
+            try:
+                yield from self._fetch_chunks(con.cursor(), req, arg, chunk_size, columnar)
+            finally:
+                self.read_pool.put(con)
+            return
+
+        stream = ResultStream(self.stream_buffer, chunk_size, columnar)
+        self.execute(req, arg, stream)
+        try:
+            while True:
+                chunk = stream.get()
+                if chunk == '--no more--':
+                    break
+                yield chunk
+        finally:
+            stream.cancel()
+
+    def select_columns(self, req, arg=None) -> list:
+        """按列返回全部查询结果: [第1列值列表, 第2列值列表, ...], 无结果时返回空列表"""
+        columns = []
+        for chunk in self.iter_select(req, arg, columnar=True):
+            if not columns:
+                columns = chunk
+            else:
+                for column, values in zip(columns, chunk):
+                    column.extend(values)
+        return columns
+
+    def get_stats(self) -> dict:
+        """Return the write batch counters together with the current batch settings and queue size."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update(batch_size=self.batch_size, batch_window=self.batch_window, queue_size=self.reqs.qsize())
+        return stats
 
     def select(self, req, arg=None):
         """
         Unlike sqlite's native select, this select doesn't handle iteration efficiently.
 
-        The result of `select` starts filling up with values as soon as the
-        request is dequeued, and although you can iterate over the result normally
-        (`for res in self.select(): ...`), the entire result will be in memory.
+        For file databases the query runs in the caller's thread on a pooled read-only
+        connection and the entire result will be in memory; for the in-memory database
+        it is queued to the worker thread and rows arrive in chunks (see `iter_select`).
 
         """
-        res = Queue()   # results of the select will appear as items in this queue
-        self.execute(req, arg, res)
-        while True:
-            rec = res.get()
-            if rec == '--no more--':
-                break
-            yield rec
+        if self.read_pool is not None:
+            yield from self._read(req, arg)
+            return
+
+        for chunk in self.iter_select(req, arg):
+            yield from chunk
 
     def select_one(self, req, arg=None):
         """Return only the first row of the SELECT, or None if there are no matching rows."""
+        if self.read_pool is not None:
+            rows = self._read(req, arg, fetch_one=True)
+            return rows[0] if rows else None
         try:
             return next(self.select(req, arg))
         except StopIteration:
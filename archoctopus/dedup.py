@@ -0,0 +1,96 @@
+"""
+ArchOctopus url去重索引模块
+    BloomFilter -- 布隆过滤器
+    UrlIndex -- 任务url去重索引
+
+解析任务启动时从数据库urls表一次性载入该任务已有的url, 之后的去重判断均在进程内完成,
+新url通过数据库队列异步写回, 解析过程不再为每个条目等待数据库查询结果.
+条目数较少时使用8字节摘要组成的集合; 超过bloom_threshold时改用布隆过滤器, 命中时再查询数据库确认.
+"""
+
+import hashlib
+import logging
+import math
+import typing
+
+from archoctopus.constants import APP_NAME
+
+
+def url_digest(url: str) -> bytes:
+    """url的8字节摘要, 比直接保存url字符串更节省内存"""
+    return hashlib.blake2b(url.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+
+
+class BloomFilter:
+    """布隆过滤器"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)     # 位数组长度
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)            # 哈希函数个数
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest: bytes):
+        # 双重哈希: h1 + i*h2
+        h1 = int.from_bytes(digest[:4], "little")
+        h2 = int.from_bytes(digest[4:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, digest: bytes):
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest: bytes):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+class UrlIndex:
+    """任务url去重索引"""
+
+    def __init__(self, con, task_id: int, bloom_threshold: int = 500000):
+        self.logger = logging.getLogger(APP_NAME)
+        self.con = con
+        self.task_id = task_id
+
+        self.digests = set()    # 摘要集合: 小任务保存全部url, 大任务只保存本次新增的url
+        self.bloom = None       # 布隆过滤器: 仅用于大任务
+        self.fallback_count = 0     # 布隆过滤器命中后查询数据库的次数
+
+        self._load(bloom_threshold)
+
+    def _load(self, bloom_threshold: int):
+        """从urls表一次性载入任务已有的url"""
+        # 等待其他线程已入队的写入语句提交, 如重新下载时清除的urls记录
+        self.con.barrier()
+        total = self.con.select_one("SELECT COUNT(*) FROM urls WHERE task_id=?", (self.task_id,))
+        total = total[0] if total else 0
+        if total > bloom_threshold:
+            self.bloom = BloomFilter(capacity=total * 2)
+        sql = "SELECT url FROM urls WHERE task_id=?"
+        for chunk in self.con.iter_select(sql, (self.task_id,), columnar=True):
+            if not chunk:
+                continue
+            if self.bloom is not None:
+                for url in chunk[0]:
+                    self.bloom.add(url_digest(str(url)))
+            else:
+                self.digests.update(url_digest(str(url)) for url in chunk[0])
+        self.logger.debug("载入去重索引: task_id=%s, count=%s, bloom=%s", self.task_id, total, self.bloom is not None)
+
+    def __contains__(self, url: str):
+        digest = url_digest(url)
+        if digest in self.digests:
+            return True
+        if self.bloom is None or digest not in self.bloom:
+            return False
+        # 布隆过滤器可能误判, 查询数据库确认
+        self.fallback_count += 1
+        sql = "SELECT 1 FROM urls WHERE task_id=? AND url=?"
+        return self.con.select_one(sql, (self.task_id, url)) is not None
+
+    def add(self, url: str, sub_dir: typing.Union[str, None] = None):
+        """登记新url, 并通过数据库队列异步写回urls表"""
+        self.digests.add(url_digest(url))
+        sql = "INSERT INTO urls (task_id, url, sub_dir) VALUES (?, ?, ?)"
+        self.con.execute(sql, (self.task_id, url, sub_dir))
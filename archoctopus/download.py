@@ -1,19 +1,32 @@
 """
 ArchOctopus 下载模块
+    Downloader -- 线程下载器(默认)
+    AsyncEngine -- 全局异步事件循环(可选)
+    AsyncDownloader -- 异步下载器(可选)
+
+线程下载器在服务端支持Range请求时, 对超过"/Network/segment_threshold"的文件使用多连接分段下载(archoctopus.segment).
+
+异步下载通过配置项"/General/async_download"开启. 开启后, 整个应用只运行一个事件循环线程(AsyncEngine),
+每个任务在该事件循环中启动"/General/async_concurrency"个下载协程, 不再为每个任务创建多个下载线程.
 """
 
 import threading
+import asyncio
 import os
 import re
+import hashlib
+import functools
 from queue import Queue
 import logging
+from contextlib import asynccontextmanager
 from http.cookiejar import CookieJar
+from urllib.parse import urlparse
 
-import wx
-from httpx import Client
+from httpx import AsyncClient
 
 from archoctopus.utils import \
     retry, \
+    async_retry, \
     get_name_from_url, \
     get_img_format, \
     get_file_type, \
@@ -21,45 +34,79 @@ from archoctopus.utils import \
     get_file_size, \
     is_downloaded
 
+from archoctopus.imageinfo import ImageInfo, probe, probe_file
+from archoctopus.store import ContentStore, file_sha256
+from archoctopus.segment import PartsJournal, SegmentedDownload, SegmentError, segment_total, range_validator
+from archoctopus.writer import ChunkWriter, ReusableBuffer, response_length
 from archoctopus.constants import APP_NAME
+from archoctopus.client import HEADERS, RETRY_STATUS_CODES, ClientPool, client_key
+from archoctopus.core import get_context
+
 
+PROBE_LIMIT = 64 * 1024     # 下载过程中最多用于解析文件头的字节数
 
-class Downloader(threading.Thread):
+
+class HeaderSniffer:
     """
-    ArchOctopus 下载器
+    文件头过滤器
+    下载过程中缓存响应开头的数据, 解析出图片格式和尺寸后立即按过滤条件判断, 不必等待整个文件下载完成.
     """
 
-    def __init__(self,
-                 window,
-                 download_queue: Queue,
-                 pause_event: threading.Event,
-                 running_event: threading.Event,
-                 cookies: CookieJar = None,
-                 proxies: [str, None] = None,):
-        super(Downloader, self).__init__()
+    def __init__(self, downloader, head: bytes = b""):
+        self.downloader = downloader
+        self.buffer = bytearray(head)
+        self.info = None        # 解析结果: ImageInfo
+        self.done = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        写入下载数据
+        :return: True表示图片不符合过滤条件, 应放弃下载
+        """
+        if self.done:
+            return False
+        self.buffer += chunk
+        info = probe(self.buffer)
+        if info is None:
+            if len(self.buffer) >= PROBE_LIMIT:     # 无法识别的格式, 下载完成后再判断
+                self.done = True
+                self.buffer = None
+            return False
+        self.done = True
+        self.buffer = None
+        self.info = info
+        return self.downloader._reject_info(info)
+
+
+class BaseDownloader:
+    """
+    下载器基类: 读取过滤配置, 提供文件命名及过滤方法
+    """
 
+    def __init__(self, window, progress=None):
         self.window = window
-        self.queue = download_queue
-        self.pause_event = pause_event  # 用于暂停线程的标识
-        self.running_event = running_event  # 用于停止线程的标识
+        self.progress = progress    # 任务下载进度(TaskProgress)
 
         # ---- logger ----
         self.logger = logging.getLogger(APP_NAME)
 
-        # ---- request ----
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:58.0) Gecko/20100101 Firefox/58.0',
-        }
-        self.session = Client(headers=headers, cookies=cookies, proxies=proxies)
-
         # ------ cfg ------
-        cfg = wx.GetApp().cfg
+        context = get_context()
+        cfg = context.cfg
+        self.events = context.events    # 事件分发器
         self.cfg_size = (cfg.ReadInt("/Filter/min_width", defaultVal=0),
                          cfg.ReadInt("/Filter/min_height", defaultVal=0))
         self.cfg_bytes = (cfg.ReadInt("/Filter/min_size", defaultVal=0),
                           cfg.ReadInt("/Filter/max_size", defaultVal=0))
         self.cfg_type = cfg.Read("/Filter/type", defaultVal="")
 
+        # 内容寻址图片库: 已下载过的url直接生成链接或副本
+        self.store = ContentStore(context.con) if cfg.ReadBool("/General/content_store", defaultVal=True) else None
+
+        # 大文件分段下载: 分段数(小于2时不分段)及文件大小阈值
+        self.segments = cfg.ReadInt("/Network/segments", defaultVal=4)
+        self.segment_threshold = cfg.ReadInt("/Network/segment_threshold", defaultVal=8 * 1024 * 1024)
+
     def _filter_size(self, file_size: tuple):
         """过滤图片尺寸"""
         if file_size is None:
@@ -87,16 +134,17 @@ class Downloader(threading.Thread):
         """
         ArchOctopus 过滤器
         过滤图片尺寸, 类型以及文件大小。
-        :param result:
+        :param result: tuple(tmp_file, file, info, digest)
         :return:
         """
         if not result:
             return
         else:
-            tmp_file, file = result
+            tmp_file, file, info, _digest = result
 
         file_type: tuple = get_file_type(file)
-        file_size: tuple = get_file_size(tmp_file)
+        # 下载过程中已解析出尺寸时不再解码整张图片
+        file_size: tuple = info.size if info is not None else get_file_size(tmp_file)
         file_bytes = get_file_bytes(tmp_file)
 
         try:
@@ -111,13 +159,91 @@ class Downloader(threading.Thread):
 
         return file_type, file_size, file_bytes
 
-    @ retry(times=3)
-    def _download(self, **kwargs):
+    def _done(self, url: str, filter_result: [tuple, None]):
+        """条目处理完成: 登记下载结果, 由进度汇总线程批量写入数据库并刷新任务面板"""
+        if self.progress is not None:
+            self.progress.add(url, filter_result)
+
+    def _saved(self, saved: int):
+        """登记图片库节省的字节数"""
+        if saved and self.progress is not None:
+            self.progress.add_saved(saved)
+
+    def _exit(self):
+        """下载线程(协程)退出: 先送出剩余的进度, 再更新任务线程计数"""
+        if self.progress is not None:
+            self.progress.flush()
+        self.events.post(self.window.call_thread_done)
+
+    def _prefilter(self, data: dict):
+        """下载前过滤: 根据解析阶段获得的尺寸和大小信息判断"""
+        return self._filter_size(data.get("size")) or self._filter_bytes(data.get("bytes"))
+
+    def _fetch_from_store(self, url: str, tmp_file: str) -> [tuple, None]:
         """
-        下载函数
-        :param path:
-        :param url:
-        :return: tuple(file_type, file_bytes, file_size, tmp_file)
+        图片库中已有该url的图片时, 在临时文件位置生成副本
+        :return: tuple(tmp_file, file, info, None), 未命中时返回None
+        """
+        blob = self.store.fetch(url, tmp_file) if self.store is not None else None
+        if blob is None:
+            return None
+        self._saved(blob.bytes)
+        info = probe_file(tmp_file)
+        suffix = info.suffix if info is not None else get_img_format(tmp_file)
+        return tmp_file, re.sub("\\.tmp$", suffix, tmp_file), info, None
+
+    @staticmethod
+    def _new_digest(mode: str, tmp_file: str):
+        """流式计算文件SHA-256, 断点续传时先计算已下载部分"""
+        return file_sha256(tmp_file) if mode == "ab" else hashlib.sha256()
+
+    def _register(self, url: str, result: [tuple, None]):
+        """下载完成且未被过滤的图片登记到图片库"""
+        if self.store is None or not result:
+            return
+        tmp_file, file, info, digest = result
+        if digest is None or os.path.exists(tmp_file) or not os.path.isfile(file):
+            return
+        try:
+            if info is not None:
+                self._saved(self.store.add(url, digest, file, info.suffix, info.size))
+            else:
+                self._saved(self.store.add(url, digest, file))
+        except OSError as e:
+            self.logger.error("图片库登记失败: %s, %s", e, file)
+
+    def _reject_info(self, info: ImageInfo) -> bool:
+        """根据文件头信息判断是否过滤"""
+        return bool(self._filter_type(info.suffix) or self._filter_size(info.size))
+
+    def _reject_length(self, response, tmp_file: str) -> bool:
+        """根据响应头中的文件总大小判断是否过滤"""
+        if not any(self.cfg_bytes) or response.headers.get("Content-Encoding", "identity") != "identity":
+            return False
+        content_range = response.headers.get("Content-Range", "")
+        total = content_range.rpartition("/")[2] if response.status_code == 206 else response.headers.get("Content-Length")
+        if not total or not total.isdigit():
+            return False
+        return bool(self._filter_bytes(int(total)))
+
+    def _make_sniffer(self, mode: str, tmp_file: str) -> HeaderSniffer:
+        """创建文件头过滤器, 断点续传时先读取已下载部分的文件头"""
+        head = b""
+        if mode == "ab":
+            with open(tmp_file, "rb") as f:
+                head = f.read(PROBE_LIMIT)
+        return HeaderSniffer(self, head)
+
+    def _abort(self, tmp_file: str, url: str):
+        """放弃下载并删除临时文件"""
+        self.logger.debug("下载中过滤文件: %s", url)
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    def _get_tmp_file(self, **kwargs):
+        """
+        根据条目信息生成临时文件路径及断点续传请求头
+        :return: tuple(tmp_file, headers) 或 None(无需下载)
         """
         url = kwargs["item_url"]
         # 链接内嵌图片 data:image, 暂做忽略处理。
@@ -152,30 +278,161 @@ class Downloader(threading.Thread):
             headers = {'Range': f"bytes={tmp_file_size}-"}
         else:
             headers = None
+        return tmp_file, headers
+
+    def _get_write_mode(self, status_code: int, url: str, tmp_file: str):
+        """根据响应码获取文件写入模式, 返回None时放弃下载"""
+        if status_code == 200:
+            return "wb"
+        elif status_code == 206:
+            return "ab"
+        elif status_code == 416:
+            self.logger.error("416 错误 – 所请求的范围无法满足: %s", url)
+            os.remove(tmp_file)
+        else:
+            self.logger.error("响应码错误: %s, %s", status_code, url)
+
+
+class WorkerQuota:
+    """
+    任务下载线程配额
+    由调度器调整目标线程数: 增加时由任务启动新线程, 减少时多余的线程在完成当前条目后退出.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.target = 0     # 目标线程数
+        self.active = 0     # 运行中的线程数
+
+    def resize(self, target: int) -> int:
+        """设置目标线程数, 返回需要新启动的线程数"""
+        with self._lock:
+            self.target = target
+            spawn = max(0, target - self.active)
+            self.active += spawn
+            return spawn
+
+    def retire(self) -> bool:
+        """线程数超出目标时, 调用线程退出"""
+        with self._lock:
+            if self.active > self.target:
+                self.active -= 1
+                return True
+            return False
+
+    def leave(self):
+        """线程正常退出"""
+        with self._lock:
+            self.active -= 1
+
+
+class Downloader(BaseDownloader, threading.Thread):
+    """
+    ArchOctopus 下载器
+    """
+
+    def __init__(self,
+                 window,
+                 download_queue: Queue,
+                 pause_event: threading.Event,
+                 running_event: threading.Event,
+                 cookies: CookieJar = None,
+                 proxies: [str, None] = None,
+                 quota: WorkerQuota = None,
+                 progress=None):
+        threading.Thread.__init__(self)
+        BaseDownloader.__init__(self, window, progress)
+
+        self.queue = download_queue
+        self.pause_event = pause_event  # 用于暂停线程的标识
+        self.running_event = running_event  # 用于停止线程的标识
+        self.quota = quota  # 任务下载线程配额
+
+        # ---- request ----
+        self.session = ClientPool.borrow(cookies=cookies, proxies=proxies)
+
+    def _write_stream(self, response, mode: str, tmp_file: str) -> [tuple, None]:
+        """
+        单连接下载: 将响应内容写入临时文件
+        :return: tuple(info, digest), 文件头不符合过滤条件时返回None
+        """
+        sniffer = self._make_sniffer(mode, tmp_file)
+        digest = self._new_digest(mode, tmp_file)
+        with ChunkWriter(tmp_file, mode, length=response_length(response), digest=digest) as writer:
+            for chunk in response.iter_bytes():
+                if sniffer.feed(chunk):
+                    return None
+                writer.write(chunk)
+        return sniffer.info, digest.hexdigest()
+
+    def _write_segments(self, url: str, journal: PartsJournal) -> [tuple, None]:
+        """
+        分段下载: 多个连接并发下载各段, 进度记录在.parts文件中
+        :return: tuple(info, digest), 文件头不符合过滤条件时返回None
+        """
+        sniffer = HeaderSniffer(self)
+        if not SegmentedDownload(self.session, url, journal).run(sniffer=sniffer):
+            return None
+        return sniffer.info or probe_file(journal.tmp_file), file_sha256(journal.tmp_file).hexdigest()
+
+    @ retry(times=3)
+    def _download(self, segmented=True, **kwargs):
+        """
+        下载函数
+        :param segmented: 是否允许分段下载
+        :return: tuple(tmp_file, file, info, digest)
+        """
+        url = kwargs["item_url"]
+        prepared = self._get_tmp_file(**kwargs)
+        if prepared is None:
+            return
+        tmp_file, headers = prepared
+
+        stored = self._fetch_from_store(url, tmp_file)
+        if stored is not None:
+            return stored
+
+        # 上次中断的分段下载
+        segmented = segmented and self.segments > 1
+        journal = PartsJournal.load(tmp_file, url) if segmented else None
+        restart = False
         try:
-            with self.session.stream("GET", url, headers=headers) as s:
-                self.logger.debug("请求状态 : %s, %s", s.status_code, url)
-                if s.status_code == 200:
-                    mode = "wb"
-                elif s.status_code == 206:
-                    mode = "ab"
-                elif s.status_code == 416:
-                    self.logger.error("416 错误 – 所请求的范围无法满足: %s", url)
-                    os.remove(tmp_file)
-                    return
-                else:
-                    self.logger.error("响应码错误: %s, %s", s.status_code, url)
-                    return
-
-                with open(tmp_file, mode) as f:
-                    for chunk in s.iter_bytes(chunk_size=10240):
-                        if chunk:
-                            f.write(chunk)
-                    f.flush()
-
-                # 获取正确的后缀名
-                suffix = get_img_format(tmp_file)
-                file = re.sub("\\.tmp$", suffix, tmp_file)
+            if journal is None:
+                with self.session.stream("GET", url, headers=headers) as s:
+                    self.logger.debug("请求状态 : %s, %s", s.status_code, url)
+                    if s.status_code in RETRY_STATUS_CODES:
+                        s.raise_for_status()    # 交由retry退避重试
+                    mode = self._get_write_mode(s.status_code, url, tmp_file)
+                    if mode is None:
+                        # 416: 临时文件长度不小于文件总长度(如预先分配后程序中断), 临时文件已删除, 重新下载
+                        if s.status_code != 416 or headers is None:
+                            return
+                        restart = True
+                    elif self._reject_length(s, tmp_file):
+                        self._abort(tmp_file, url)
+                        return
+                    elif segmented and segment_total(s, self.segment_threshold):
+                        # 大文件: 关闭当前响应, 改为分段下载
+                        total = segment_total(s, self.segment_threshold)
+                        self.logger.debug("分段下载: %s, %s bytes", url, total)
+                        journal = PartsJournal.create(tmp_file, url, total, range_validator(s), self.segments)
+                    else:
+                        written = self._write_stream(s, mode, tmp_file)
+            if restart:
+                return self._download(segmented=segmented, **kwargs)
+            if journal is not None:
+                written = self._write_segments(url, journal)
+            if written is None:     # 文件头不符合过滤条件, 中止下载
+                self._abort(tmp_file, url)
+                return
+
+            # 获取正确的后缀名
+            suffix = get_img_format(tmp_file)
+            file = re.sub("\\.tmp$", suffix, tmp_file)
+        except SegmentError as e:
+            self.logger.error("%s, 改为单连接下载: %s", e, url)
+            journal.discard()
+            return self._download(segmented=False, **kwargs)
         except FileExistsError as e:
             self.logger.error("文件已存在: %s", e)
             os.remove(tmp_file)
@@ -184,40 +441,308 @@ class Downloader(threading.Thread):
         except AttributeError as e:
             self.logger.error("AttributeError错误: %s", e)
         else:
-            return tmp_file, file
+            info, digest = written
+            return tmp_file, file, info, digest
 
     def run(self):
+        retired = False
         while self.running_event.is_set():
             self.pause_event.wait()  # 为True时立即返回, 为False时阻塞直到内部的标识位为True后返回
+            # 调度器减少了任务的下载线程数, 多余的线程退出
+            if self.quota and self.quota.retire():
+                self.logger.debug("下载线程退出: 线程数调整")
+                retired = True
+                break
+
             data = self.queue.get()
 
             # 下载线程接受到退出信号,正常退出.
             if data is None:
                 self.logger.info("download completed: 队列完成")
+                self.queue.put(None)    # 放回退出信号, 使同一任务的其他线程(包括后续新增的线程)也能退出
                 self.queue.task_done()
                 break
 
             # 下载前过滤
-            item_size = data.get("size")
-            item_bytes = data.get("bytes")
-
-            if self._filter_size(item_size) or self._filter_bytes(item_bytes):
+            if self._prefilter(data):
                 self.queue.task_done()
                 self.logger.info("download completed: %s", data["item_url"])
-                wx.CallAfter(self.window.call_refresh_gauge, data["item_url"], None)  # 更新面板信息
+                self._done(data["item_url"], None)
                 continue
 
             # 下载
-            result = self._download(**data)
+            try:
+                result = self._download(**data)
+            except Exception as e:
+                self.logger.error("下载错误: %s - %s", e, data["item_url"])
+                result = None
 
             # 下载后过滤
             filter_result = self.filter(result)
-            wx.CallAfter(self.window.call_refresh_gauge, data["item_url"], filter_result)  # 更新面板信息
+            self._register(data["item_url"], result)
+            self._done(data["item_url"], filter_result)
 
             self.queue.task_done()
             self.logger.info("download completed: %s", data["item_url"])
 
-        # 退出时关闭请求连接
+        # 退出时归还请求连接
         self.session.close()
+        if self.quota and not retired:
+            self.quota.leave()
         # 更新任务线程计数
-        wx.CallAfter(self.window.call_thread_done)
+        self._exit()
+
+
+class AsyncQueue:
+    """
+    解析线程与事件循环之间的队列桥接
+    解析线程调用put(与queue.Queue接口一致), 下载协程在事件循环中await get.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._queue = None   # asyncio.Queue需在事件循环线程中创建
+
+    def _ensure(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def put(self, item):
+        """线程安全: 可在任意线程中调用"""
+        self.loop.call_soon_threadsafe(lambda: self._ensure().put_nowait(item))
+
+    async def get(self):
+        return await self._ensure().get()
+
+
+class AsyncEngine(threading.Thread):
+    """
+    全局异步下载引擎
+    整个应用只运行一个事件循环线程, 所有异步下载任务的协程均在此循环中调度.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, max_connections: int = 256):
+        super(AsyncEngine, self).__init__(name="async_download_engine")
+        self.setDaemon(True)
+
+        self.logger = logging.getLogger(APP_NAME)
+        self.loop = asyncio.new_event_loop()
+        self.max_connections = max_connections  # 全局最大并发请求数
+        self.semaphore = None       # 在事件循环线程中创建
+        self.ready = threading.Event()
+
+        self.clients = {}           # 共享异步客户端: {(代理, cookies指纹): AsyncClient}
+        self.host_slots = {}        # 主机并发连接限制: {host: asyncio.Semaphore}
+
+    @classmethod
+    def instance(cls):
+        """获取(必要时启动)全局唯一的引擎实例"""
+        with cls._lock:
+            if cls._instance is None or not cls._instance.is_alive():
+                cfg = get_context().cfg
+                max_connections = cfg.ReadInt("/General/async_max_connections", defaultVal=256)
+                cls._instance = cls(max_connections=max_connections)
+                cls._instance.start()
+                cls._instance.ready.wait()
+        return cls._instance
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.semaphore = asyncio.Semaphore(self.max_connections)
+        self.loop.call_soon(self.ready.set)
+        self.logger.info("异步下载引擎启动: max_connections=%s", self.max_connections)
+        self.loop.run_forever()
+
+    def borrow_client(self, cookies: CookieJar = None, proxies: [str, None] = None) -> AsyncClient:
+        """借用共享异步客户端(只能在事件循环线程中调用)"""
+        key = client_key(cookies, proxies)
+        client = self.clients.get(key)
+        if client is None or client.is_closed:
+            client = AsyncClient(headers=HEADERS,
+                                 cookies=cookies,
+                                 proxies=proxies,
+                                 limits=ClientPool.limits(),
+                                 http2=ClientPool.use_http2())
+            self.clients[key] = client
+        return client
+
+    @asynccontextmanager
+    async def host_slot(self, url):
+        """占用目标主机的一个并发连接名额, 同时受全局并发数及主机自适应限速器限制"""
+        wait = ClientPool.host_limiter(url).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        host = urlparse(str(url)).hostname or ""
+        slot = self.host_slots.get(host)
+        if slot is None:
+            slot = self.host_slots[host] = asyncio.Semaphore(ClientPool.max_per_host)
+        async with self.semaphore, slot:
+            yield
+
+    def make_queue(self) -> AsyncQueue:
+        return AsyncQueue(self.loop)
+
+    def submit(self, coro):
+        """
+        在事件循环中调度协程
+        :return: concurrent.futures.Future
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+class AsyncDownloader(BaseDownloader):
+    """
+    ArchOctopus 异步下载器
+    下载协程共享AsyncEngine中的异步客户端, 并受全局及单个主机的并发数限制.
+    """
+
+    def __init__(self,
+                 window,
+                 engine: AsyncEngine,
+                 download_queue: AsyncQueue,
+                 pause_event: threading.Event,
+                 running_event: threading.Event,
+                 workers: int,
+                 cookies: CookieJar = None,
+                 proxies: [str, None] = None,
+                 progress=None):
+        super(AsyncDownloader, self).__init__(window, progress)
+
+        self.engine = engine
+        self.queue = download_queue
+        self.pause_event = pause_event  # 用于暂停协程的标识
+        self.running_event = running_event  # 用于停止协程的标识
+        self.workers = workers      # 下载协程数
+
+        self.cookies = cookies
+        self.proxies = proxies
+
+    async def _wait_resume(self):
+        """暂停时挂起协程, 不阻塞事件循环"""
+        while not self.pause_event.is_set():
+            await asyncio.sleep(0.2)
+
+    def _open_stream(self, mode: str, tmp_file: str, length: [int, None], buffer: ReusableBuffer) -> tuple:
+        """
+        准备写入: 续传时读取已下载部分(文件头及摘要), 打开(预先分配)临时文件
+        :return: tuple(sniffer, digest, writer)
+        """
+        sniffer = self._make_sniffer(mode, tmp_file)
+        digest = self._new_digest(mode, tmp_file)
+        writer = ChunkWriter(tmp_file, mode, length=length, digest=digest, buffer=buffer)
+        return sniffer, digest, writer
+
+    def _finish(self, url: str, result: [tuple, None]):
+        """下载后处理(在线程池中执行): 过滤, 登记到图片库, 登记下载结果"""
+        filter_result = self.filter(result)
+        self._register(url, result)
+        self._done(url, filter_result)
+
+    @async_retry(times=3)
+    async def _download(self, session: AsyncClient, buffer: ReusableBuffer, **kwargs):
+        """
+        异步下载函数
+        :param buffer: 下载协程的写入缓冲区
+        :return: tuple(tmp_file, file, info, digest)
+        """
+        url = kwargs["item_url"]
+        loop = asyncio.get_event_loop()
+        # 文件系统及图片库操作在默认线程池中执行, 避免阻塞事件循环
+        prepared = await loop.run_in_executor(None, functools.partial(self._get_tmp_file, **kwargs))
+        if prepared is None:
+            return
+        tmp_file, headers = prepared
+
+        stored = await loop.run_in_executor(None, self._fetch_from_store, url, tmp_file)
+        if stored is not None:
+            return stored
+
+        restart = False
+        try:
+            async with self.engine.host_slot(url):
+                async with session.stream("GET", url, headers=headers) as s:
+                    self.logger.debug("请求状态 : %s, %s", s.status_code, url)
+                    ClientPool.host_limiter(url).update(s)
+                    if s.status_code in RETRY_STATUS_CODES:
+                        s.raise_for_status()    # 交由async_retry退避重试
+                    mode = await loop.run_in_executor(None, self._get_write_mode, s.status_code, url, tmp_file)
+                    if mode is None:
+                        # 416: 临时文件长度不小于文件总长度(如预先分配后程序中断), 临时文件已删除, 重新下载
+                        if s.status_code != 416 or headers is None:
+                            return
+                        restart = True
+                    elif self._reject_length(s, tmp_file):
+                        await loop.run_in_executor(None, self._abort, tmp_file, url)
+                        return
+                    else:
+                        sniffer, digest, writer = await loop.run_in_executor(
+                            None, self._open_stream, mode, tmp_file, response_length(s), buffer)
+                        rejected = False
+                        try:
+                            async for chunk in s.aiter_bytes():
+                                if sniffer.feed(chunk):
+                                    rejected = True
+                                    break
+                                # 缓冲区已满时写入文件(及计算摘要)在线程池中执行
+                                if not writer.try_buffer(chunk):
+                                    await loop.run_in_executor(None, writer.write, chunk)
+                        finally:
+                            await loop.run_in_executor(None, writer.close)
+                        if rejected:    # 文件头不符合过滤条件, 中止下载
+                            await loop.run_in_executor(None, self._abort, tmp_file, url)
+                            return
+            if restart:     # 释放连接名额后重新请求
+                return await self._download(session, buffer, **kwargs)
+
+            # 获取正确的后缀名
+            suffix = await loop.run_in_executor(None, get_img_format, tmp_file)
+            file = re.sub("\\.tmp$", suffix, tmp_file)
+        except FileExistsError as e:
+            self.logger.error("文件已存在: %s", e)
+            await loop.run_in_executor(None, os.remove, tmp_file)
+        except FileNotFoundError as e:  # windows默认256个字符路径限制(MAX_PATH)
+            self.logger.error("FileNotFoundError错误: %s", e)
+        except AttributeError as e:
+            self.logger.error("AttributeError错误: %s", e)
+        else:
+            return tmp_file, file, sniffer.info, digest.hexdigest()
+
+    async def _worker(self, session: AsyncClient):
+        loop = asyncio.get_event_loop()
+        buffer = ReusableBuffer()   # 协程之间不能共享写入缓冲区
+        while self.running_event.is_set():
+            await self._wait_resume()
+            data = await self.queue.get()
+
+            # 下载协程接受到退出信号,正常退出.
+            if data is None:
+                self.logger.info("download completed: 队列完成")
+                self.queue.put(None)    # 放回退出信号, 使其他协程也能退出
+                break
+
+            # 下载前过滤
+            if self._prefilter(data):
+                self.logger.info("download completed: %s", data["item_url"])
+                await loop.run_in_executor(None, self._done, data["item_url"], None)
+                continue
+
+            # 下载
+            try:
+                result = await self._download(session, buffer, **data)
+            except Exception as e:
+                self.logger.error("下载错误: %s - %s", e, data["item_url"])
+                result = None
+
+            # 下载后过滤, 登记到图片库及登记下载结果(图片解码及文件操作在默认线程池中执行, 避免阻塞事件循环)
+            await loop.run_in_executor(None, self._finish, data["item_url"], result)
+            self.logger.info("download completed: %s", data["item_url"])
+
+        # 送出剩余的进度, 更新任务下载协程计数
+        await loop.run_in_executor(None, self._exit)
+
+    async def run(self):
+        session = self.engine.borrow_client(cookies=self.cookies, proxies=self.proxies)
+        await asyncio.gather(*(self._worker(session) for _ in range(self.workers)))
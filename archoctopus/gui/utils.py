@@ -0,0 +1,139 @@
+"""
+ArchOctopus GUI工具
+    get_bitmap_from_embedded -- 从字节码中获取wx.Bitmap图片对象
+    gen_cover_image -- 生成同步面板中Board封面图片
+    UpdateCover -- 异步更新board封面
+"""
+
+import os
+import threading
+import base64
+from io import BytesIO
+
+import wx
+
+from archoctopus.normalize import cleanup
+
+
+def get_bitmap_from_embedded(data: bytes, scale: tuple = tuple(), isBase64: bool = True) -> wx.Bitmap:
+    """
+    从字节码中获取wx.Bitmap图片对象
+    :param data:
+    :param scale:
+    :param isBase64:
+    :return:
+    """
+    if isBase64:
+        data = base64.b64decode(data)
+    stream = BytesIO(data)
+    image = wx.Image()
+    image.SetLoadFlags(0)       # 忽略 'iCCP: known incorrect sRGB profile' 警告
+    image.LoadFile(stream)
+    if scale:
+        image = image.Scale(*scale, quality=wx.IMAGE_QUALITY_BOX_AVERAGE)
+    return wx.Bitmap(image)
+
+
+def gen_match_image(image: wx.Image, width: int, height: int) -> wx.Image:
+    """
+    居中缩放图片到指定尺寸
+    :param image:
+    :param width:
+    :param height:
+    :return:
+    """
+    raw_size = image.GetSize().Get()
+
+    x_scale_factor = width / raw_size[0]
+    y_scale_factor = height / raw_size[1]
+
+    if raw_size[1] * x_scale_factor > height:
+        new_size = (width, int(raw_size[1] * x_scale_factor))
+        rect = wx.Rect(0, (new_size[1] - height)//2, width, height)
+    elif raw_size[1] * x_scale_factor < height:
+        new_size = (int(raw_size[0] * y_scale_factor), height)
+        rect = wx.Rect((new_size[0] - width)//2, 0, width, height)
+    else:
+        new_size = (width, height)
+        rect = wx.Rect(0, 0, width, height)
+    scaled_image = image.Scale(*new_size, quality=wx.IMAGE_QUALITY_BOX_AVERAGE)
+    match_image = scaled_image.GetSubImage(rect)
+    return match_image
+
+
+def gen_cover_image(files: tuple):
+    """
+    生成同步面板中Board封面图片
+    :param files:
+    :return:
+    """
+    if not tuple:
+        return None
+
+    # # GUI board_cover组件尺寸计算
+    # gap = 2
+    # size = (176, 126)
+    #
+    # part_01 = (size[0]*2//3 - gap, size[1], 0, 0)
+    # part_02 = (size[0] - size[0]*2//3, (size[1]-gap)//2, size[0]*2//3, 0)
+    # part_03 = (part_02[0], size[1]-part_02[1]-gap, part_02[2], part_02[1]+gap)
+
+    part_01 = (115, 126, 0, 0)
+    part_02 = (59, 62, 117, 0)
+    part_03 = (59, 62, 117, 64)
+
+    cover_img = wx.Image(176, 126)
+    cover_img.Replace(0, 0, 0, 255, 255, 255)
+
+    new_files = [None, None, None]
+    for i, f in enumerate(files):
+        new_files[i] = f
+
+    for part, file in zip((part_01, part_02, part_03), new_files):
+        if file is None or not os.path.isfile(file):
+            match_image = wx.Image(*part[:2])
+            match_image.Replace(0, 0, 0, 220, 220, 220)
+        else:
+            raw_img = wx.Image(file, wx.BITMAP_TYPE_ANY)
+            if raw_img.IsOk():
+                match_image = gen_match_image(raw_img, *part[:2])
+            else:
+                match_image = wx.Image(*part[:2])
+                match_image.Replace(0, 0, 0, 200, 200, 200)
+        cover_img.Paste(match_image, *part[2:])
+
+    return wx.Bitmap(cover_img)
+
+
+class UpdateCover(threading.Thread):
+    """异步更新board封面,避免GUI载入时间过长和卡顿"""
+
+    def __init__(self, parent, queue, con):
+        super(UpdateCover, self).__init__()
+
+        self.parent = parent
+        self.queue = queue
+        self.con = con
+
+    def load_conver_files(self, board_id: int, site: str) -> tuple:
+        sql = "SELECT sub_dir, name " \
+              "From sync_items " \
+              "WHERE board_id = ? AND site = ? AND state = 1 AND type IN ('.jpeg', '.png') " \
+              "LIMIT 3"
+        result = self.con.select_columns(sql, (board_id, site))
+        return tuple(result) if result else ([], [])
+
+    def run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            board_panel_id, board_info = data
+            sub_dirs, names = self.load_conver_files(board_info[0], board_info[1])
+            board_dir = os.path.join(self.parent.sync_dir, board_info[1], cleanup(board_info[2]))
+            cover_files = tuple(os.path.join(board_dir, sub_dir or "", name)
+                                for sub_dir, name in zip(sub_dirs, names))
+            cover_bitmap = gen_cover_image(cover_files)
+            if cover_bitmap is None:
+                continue
+            wx.CallAfter(self.parent.call_update_cover, board_panel_id, cover_bitmap, (board_info[0], board_info[1]))
@@ -0,0 +1,234 @@
+"""
+ArchOctopus HTTP缓存模块
+    HttpCache -- 本地磁盘HTTP缓存(sqlite), 支持条件请求及按容量淘汰
+
+解析线程和同步模块会反复请求相同的页面和接口(画板列表, 收藏夹接口, 分类查询等).
+缓存保存响应内容及ETag/Last-Modified, 再次请求时发出条件请求(If-None-Match/If-Modified-Since),
+服务端返回304时直接使用本地内容. 没有验证字段的接口可以指定ttl, 在有效期内不发出请求.
+缓存总容量超过max_bytes时, 按最近访问时间淘汰(LRU). 命中时的访问时间先记录在内存中, 写入新内容或关闭时批量更新.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+import hashlib
+import time
+import zlib
+import logging
+import typing
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import httpx
+
+from archoctopus.constants import APP_NAME
+
+logger = logging.getLogger(APP_NAME)
+
+INIT_CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS cache (
+    key             TEXT PRIMARY KEY,
+    url             TEXT NOT NULL,
+    headers         TEXT NOT NULL,
+    body            BLOB NOT NULL,
+    etag            TEXT,
+    last_modified   TEXT,
+    fresh_until     REAL DEFAULT 0,
+    size            INTEGER NOT NULL,
+    accessed_t      REAL NOT NULL
+);
+"""
+
+INIT_CACHE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_t);"
+
+# 防缓存参数(时间戳), 不参与缓存键计算
+IGNORED_PARAMS = frozenset(("_", "_t", "timestamp"))
+
+# 参与缓存键计算的请求头: 同一url以不同方式请求时返回的内容可能不同(如html/json)
+KEY_HEADERS = ("accept", "x-requested-with", "authorization")
+
+# 本地保存的内容已解压, 不保存以下响应头
+SKIP_HEADERS = frozenset(("content-encoding", "content-length", "transfer-encoding", "set-cookie", "connection"))
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class CacheEntry(typing.NamedTuple):
+    url: str
+    headers: list
+    body: bytes
+    etag: str
+    last_modified: str
+    fresh_until: float
+
+    def is_fresh(self) -> bool:
+        return self.fresh_until > time.time()
+
+    def validators(self) -> dict:
+        """条件请求头"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        """由缓存内容构造响应对象, 请求被重定向时使用最终地址"""
+        if str(request.url) != self.url:
+            request = httpx.Request(request.method, self.url, headers=request.headers)
+        return httpx.Response(200, headers=self.headers, content=self.body, request=request)
+
+
+def strip_params(url: str) -> str:
+    """去除url中的防缓存参数, 并按参数名排序"""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in IGNORED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def cache_key(request: httpx.Request, identity: str = "") -> str:
+    """
+    计算缓存键
+    :param request: 请求对象
+    :param identity: 客户端身份(cookies指纹), 不同账号的内容互不共享
+    """
+    parts = [request.method, strip_params(str(request.url)), identity]
+    parts.extend(request.headers.get(name, "") for name in KEY_HEADERS)
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class HttpCache:
+    """
+    本地磁盘HTTP缓存
+    只缓存GET请求的200响应, 响应内容压缩保存. 多线程共享同一个实例.
+    """
+
+    def __init__(self, db: str, max_bytes: int = 64 * 1024 * 1024):
+        self.db = db
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.con = sqlite3.connect(db, check_same_thread=False)
+        with self.lock:
+            try:
+                self.con.execute(INIT_CACHE_SQL)
+                self.con.execute(INIT_CACHE_INDEX_SQL)
+                self.con.execute("PRAGMA journal_mode=WAL").fetchall()
+                self.con.execute("PRAGMA synchronous=NORMAL")
+            except sqlite3.DatabaseError as e:      # 缓存文件损坏时重建
+                logger.error("HTTP缓存文件损坏, 重建: %s", e)
+                self.con.close()
+                os.remove(db)
+                self.con = sqlite3.connect(db, check_same_thread=False)
+                self.con.execute(INIT_CACHE_SQL)
+                self.con.execute(INIT_CACHE_INDEX_SQL)
+            self.con.commit()
+            self.total = self.con.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        self._accessed = {}     # 待写入的访问时间 key: accessed_t
+        self.hits = 0           # 有效期内直接使用缓存
+        self.revalidated = 0    # 条件请求返回304
+        self.misses = 0         # 未命中
+
+    def get(self, key: str) -> [CacheEntry, None]:
+        with self.lock:
+            row = self.con.execute("SELECT url, headers, body, etag, last_modified, fresh_until "
+                                   "FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+        url, headers, body, etag, last_modified, fresh_until = row
+        return CacheEntry(url, json.loads(headers), zlib.decompress(body), etag, last_modified, fresh_until)
+
+    def refresh(self, key: str, response: httpx.Response, ttl: [float, None] = None):
+        """收到304响应: 更新有效期及验证字段"""
+        fresh_until = self._fresh_until(response, ttl)
+        with self.lock:
+            self.con.execute("UPDATE cache SET fresh_until = ?, "
+                             "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+                             "WHERE key = ?",
+                             (fresh_until, response.headers.get("ETag"), response.headers.get("Last-Modified"), key))
+            self.con.commit()
+
+    @staticmethod
+    def _fresh_until(response: httpx.Response, ttl: [float, None]) -> float:
+        """有效期: 优先使用调用方指定的ttl, 其次为Cache-Control: max-age"""
+        if ttl:
+            return time.time() + ttl
+        max_age = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        return time.time() + int(max_age.group(1)) if max_age else 0
+
+    @staticmethod
+    def cacheable(response: httpx.Response, ttl: [float, None] = None) -> bool:
+        """有验证字段或有效期的200响应才缓存"""
+        if response.status_code != 200:
+            return False
+        cache_control = response.headers.get("Cache-Control", "")
+        if "no-store" in cache_control:
+            return False
+        return bool(ttl or response.headers.get("ETag") or response.headers.get("Last-Modified")
+                    or _MAX_AGE.search(cache_control))
+
+    def put(self, key: str, response: httpx.Response, ttl: [float, None] = None):
+        """保存响应内容"""
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in SKIP_HEADERS]
+        body = zlib.compress(response.content, 6)
+        headers_text = json.dumps(headers)
+        size = len(body) + len(headers_text)
+        if size > self.max_bytes // 4:     # 单个响应过大时不缓存
+            return
+        with self.lock:
+            self._flush_accessed()
+            old = self.con.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            self.con.execute("INSERT OR REPLACE INTO cache "
+                             "(key, url, headers, body, etag, last_modified, fresh_until, size, accessed_t) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             (key, str(response.url), headers_text, body,
+                              response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                              self._fresh_until(response, ttl), size, time.time()))
+            self.total += size - (old[0] if old else 0)
+            if self.total > self.max_bytes:
+                self._evict()
+            self.con.commit()
+
+    def _flush_accessed(self):
+        """批量写入命中时记录的访问时间(调用方持有锁并提交)"""
+        if self._accessed:
+            self.con.executemany("UPDATE cache SET accessed_t = ? WHERE key = ?",
+                                 [(t, key) for key, t in self._accessed.items()])
+            self._accessed.clear()
+
+    def _evict(self):
+        """按最近访问时间淘汰, 直到总容量降到max_bytes的90%以下"""
+        target = self.max_bytes * 0.9
+        evicted = 0
+        rows = self.con.execute("SELECT key, size FROM cache ORDER BY accessed_t").fetchall()
+        for key, size in rows:
+            if self.total <= target:
+                break
+            self.con.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.total -= size
+            evicted += 1
+        logger.debug("HTTP缓存淘汰: %s条, 当前容量: %s", evicted, self.total)
+
+    def clear(self):
+        with self.lock:
+            self.con.execute("DELETE FROM cache")
+            self.con.commit()
+            self.total = 0
+            self._accessed.clear()
+
+    def count(self, kind: str):
+        """统计请求结果(多个解析及下载线程共用), kind: hits/revalidated/misses"""
+        with self.lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses, "bytes": self.total}
+
+    def close(self):
+        with self.lock:
+            self._flush_accessed()
+            self.con.commit()
+            self.con.close()
@@ -0,0 +1,231 @@
+"""
+ArchOctopus 图片头信息解析模块
+    what -- 根据文件头识别图片格式(代替imghdr)
+    probe -- 从文件开头的字节数据中解析图片格式和尺寸
+    probe_file -- 从图片文件中解析图片格式和尺寸
+
+只读取文件头部(通常不超过几KB), 不解码整张图片, 也不依赖wx, 可在下载线程中使用.
+支持格式: JPEG(SOF), PNG(IHDR), GIF, WebP(VP8/VP8L/VP8X), BMP, TIFF(IFD), AVIF/HEIF(ispe).
+"""
+
+import typing
+
+
+class ImageInfo(typing.NamedTuple):
+    format: str     # 与imghdr一致的格式名: jpeg, png, gif, webp, bmp, tiff; 以及avif, heic
+    width: int
+    height: int
+
+    @property
+    def suffix(self) -> str:
+        return "." + self.format
+
+    @property
+    def size(self) -> tuple:
+        return self.width, self.height
+
+
+# JPEG帧起始标记(SOF0-SOF15, 不包括DHT(C4), JPG(C8), DAC(CC))
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg(data: bytes) -> [ImageInfo, None]:
+    i = 2
+    size = len(data)
+    while i + 4 <= size:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:      # 填充字节
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:     # 无长度字段的标记
+            i += 2
+            continue
+        if marker in _JPEG_SOF:
+            if i + 9 > size:
+                return None
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return ImageInfo("jpeg", width, height)
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def _png(data: bytes) -> [ImageInfo, None]:
+    if len(data) < 24 or data[12:16] != b"IHDR":
+        return None
+    width = int.from_bytes(data[16:20], "big")
+    height = int.from_bytes(data[20:24], "big")
+    return ImageInfo("png", width, height)
+
+
+def _gif(data: bytes) -> [ImageInfo, None]:
+    if len(data) < 10:
+        return None
+    width = int.from_bytes(data[6:8], "little")
+    height = int.from_bytes(data[8:10], "little")
+    return ImageInfo("gif", width, height)
+
+
+def _webp(data: bytes) -> [ImageInfo, None]:
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        # 有损格式: 帧头起始码(9D 01 2A)之后为14位宽高
+        if data[23:26] != b"\x9d\x01\x2a":
+            return None
+        width = int.from_bytes(data[26:28], "little") & 0x3FFF
+        height = int.from_bytes(data[28:30], "little") & 0x3FFF
+    elif chunk == b"VP8L":
+        # 无损格式: 签名0x2F之后为14位(宽-1), 14位(高-1)
+        if data[20] != 0x2F:
+            return None
+        bits = int.from_bytes(data[21:25], "little")
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+    elif chunk == b"VP8X":
+        # 扩展格式: 24位(宽-1), 24位(高-1)
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+    else:
+        return None
+    return ImageInfo("webp", width, height)
+
+
+def _bmp(data: bytes) -> [ImageInfo, None]:
+    if len(data) < 26:
+        return None
+    header_size = int.from_bytes(data[14:18], "little")
+    if header_size == 12:      # OS/2 BITMAPCOREHEADER
+        width = int.from_bytes(data[18:20], "little")
+        height = int.from_bytes(data[20:22], "little")
+    else:
+        width = int.from_bytes(data[18:22], "little", signed=True)
+        height = abs(int.from_bytes(data[22:26], "little", signed=True))    # 负值表示自上而下存储
+    return ImageInfo("bmp", width, height)
+
+
+def _tiff(data: bytes) -> [ImageInfo, None]:
+    order = "little" if data[:2] == b"II" else "big"
+    offset = int.from_bytes(data[4:8], order)     # 第一个IFD的偏移量
+    if offset + 2 > len(data):
+        return None
+    count = int.from_bytes(data[offset:offset + 2], order)
+    width = height = None
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(data):
+            return None
+        tag = int.from_bytes(data[entry:entry + 2], order)
+        if tag not in (256, 257):       # ImageWidth, ImageLength
+            continue
+        field_type = int.from_bytes(data[entry + 2:entry + 4], order)
+        value_size = 2 if field_type == 3 else 4    # SHORT / LONG
+        value = int.from_bytes(data[entry + 8:entry + 8 + value_size], order)
+        if tag == 256:
+            width = value
+        else:
+            height = value
+        if width is not None and height is not None:
+            return ImageInfo("tiff", width, height)
+    return None
+
+
+_AVIF_BRANDS = (b"avif", b"avis")
+_HEIF_BRANDS = (b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1")
+
+
+def _heif_format(data: bytes) -> [str, None]:
+    """根据ftyp盒的主品牌及兼容品牌判断AVIF/HEIF"""
+    box_size = int.from_bytes(data[:4], "big")
+    brands = [data[8:12]] + [data[i:i + 4] for i in range(16, min(box_size, len(data)), 4)]
+    if any(brand in _AVIF_BRANDS for brand in brands):
+        return "avif"
+    if any(brand in _HEIF_BRANDS for brand in brands):
+        return "heic"
+    return None
+
+
+def _heif(data: bytes, fmt: str) -> [ImageInfo, None]:
+    # 图像尺寸保存在meta/iprp/ipco中的ispe盒里; 缩略图和网格分块各有自己的ispe, 主图通常是其中最大的一个
+    best = None
+    pos = data.find(b"ispe")
+    while pos != -1 and pos + 16 <= len(data):
+        width = int.from_bytes(data[pos + 8:pos + 12], "big")
+        height = int.from_bytes(data[pos + 12:pos + 16], "big")
+        if best is None or width * height > best[0] * best[1]:
+            best = (width, height)
+        pos = data.find(b"ispe", pos + 4)
+    if best is None:
+        return None
+    return ImageInfo(fmt, *best)
+
+
+def what(data: bytes) -> [str, None]:
+    """
+    根据文件头识别图片格式(只检查格式标识, 不要求数据中包含尺寸信息)
+    :return: 格式名, 无法识别时返回None
+    """
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:2] == b"BM":
+        return "bmp"
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if data[4:8] == b"ftyp":
+        return _heif_format(data)
+    return None
+
+
+_PARSERS = {
+    "jpeg": _jpeg,
+    "png": _png,
+    "gif": _gif,
+    "webp": _webp,
+    "bmp": _bmp,
+    "tiff": _tiff,
+    "avif": lambda data: _heif(data, "avif"),
+    "heic": lambda data: _heif(data, "heic"),
+}
+
+
+def probe(data: bytes) -> [ImageInfo, None]:
+    """
+    从文件开头的字节数据中解析图片格式和尺寸
+    :param data: 文件开头的字节数据
+    :return: ImageInfo, 格式不支持或数据不足时返回None
+    """
+    fmt = what(data)
+    if fmt is None:
+        return None
+    return _PARSERS[fmt](data)
+
+
+def probe_file(file: str, limit: int = 1024 * 1024) -> [ImageInfo, None]:
+    """
+    从图片文件中解析图片格式和尺寸
+    先读取文件开头4KB, 数据不足时(如JPEG的EXIF/ICC数据较大)逐步加倍读取, 最多读取limit字节.
+    :return: ImageInfo, 文件不存在, 格式不支持或在limit内无法解析时返回None
+    """
+    size = 4096
+    try:
+        with open(file, "rb") as f:
+            data = f.read(size)
+            while True:
+                if what(data) is None:
+                    return None
+                info = probe(data)
+                if info is not None or len(data) < size or size >= limit:
+                    return info
+                data += f.read(size)
+                size *= 2
+    except OSError:
+        return None
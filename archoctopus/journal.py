@@ -0,0 +1,157 @@
+"""
+ArchOctopus 任务记录模块
+    TaskJournal -- 可恢复的任务进度记录
+
+任务运行时在数据库中记录解析及下载进度, 程序异常退出或关闭后再次启动时从中断的位置继续:
+    -- 解析游标: task_journal.cursors, 翻页接口(BaseParser.paginate)每处理完一页后保存下一页游标,
+       继续任务时从保存的游标开始请求, 已处理的列表页面不再请求;
+    -- 待下载条目: 加入下载队列的条目数据保存在urls.item中, 继续任务时status=0的条目直接重新加入下载队列;
+    -- 已完成条目: urls.status由进度汇总线程(archoctopus.progress)批量写入(不再经由GUI线程), 继续任务时跳过;
+    -- 解析完成: task_journal.parsed, 解析已完成的任务继续时不再请求任务页面.
+所有记录通过数据库队列按顺序写入, 游标总在该页条目之后提交, 中断时最多重新解析未保存游标的一页.
+任务下载完成或被删除时清除记录.
+"""
+
+import json
+import threading
+import logging
+
+from archoctopus.constants import APP_NAME
+
+logger = logging.getLogger(APP_NAME)
+
+
+class TaskJournal:
+    """
+    任务进度记录
+    cursors: 翻页游标 {key: {"cursor": 下一页游标, "pages": 已请求页数}}, 翻页结束时为{key: None}
+    """
+
+    def __init__(self, con, task_id: int):
+        self.con = con
+        self.task_id = task_id
+        self.cursors = {}
+        self.parsed = False     # 解析已完成
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        sql = "SELECT cursors, parsed FROM task_journal WHERE task_id=?"
+        row = self.con.select_one(sql, (self.task_id,))
+        if row is None:
+            return
+        try:
+            self.cursors = json.loads(row[0]) if row[0] else {}
+        except ValueError as e:
+            logger.error("任务记录读取失败: %s, task_id=%s", e, self.task_id)
+        self.parsed = bool(row[1])
+
+    @staticmethod
+    def unfinished(con) -> list:
+        """未完成的任务: list[(task_id, url)]"""
+        sql = "SELECT j.task_id, h.url FROM task_journal AS j " \
+              "JOIN history AS h ON h.id = j.task_id " \
+              "WHERE h.is_show = 1 ORDER BY j.task_id"
+        return [tuple(row) for row in con.select(sql)]
+
+    def begin(self):
+        """任务开始解析, 建立记录"""
+        sql = "INSERT OR IGNORE INTO task_journal (task_id) VALUES (?)"
+        self.con.execute(sql, (self.task_id,))
+
+    def restore(self) -> list:
+        """
+        继续任务: 返回未下载的条目数据.
+        已登记但未保存条目数据的url(中断时所在页面尚未处理完)从urls表中删除, 重新解析该页时再次登记.
+        """
+        sql = "DELETE FROM urls WHERE task_id=? AND status=0 AND item IS NULL"
+        self.con.execute(sql, (self.task_id,))
+        sql = "SELECT item FROM urls WHERE task_id=? AND status=0 AND item IS NOT NULL ORDER BY rowid"
+        items = []
+        for row in self.con.select(sql, (self.task_id,)):
+            try:
+                items.append(json.loads(row[0]))
+            except ValueError as e:
+                logger.error("条目记录读取失败: %s, task_id=%s", e, self.task_id)
+        return items
+
+    def cursor(self, key: str) -> tuple:
+        """
+        读取翻页游标
+        :return: tuple(found, cursor, pages), found为False时表示没有记录; cursor为None时表示该翻页已结束
+        """
+        with self._lock:
+            if key not in self.cursors:
+                return False, None, 0
+            state = self.cursors[key]
+        if state is None:
+            return True, None, 0
+        return True, state["cursor"], state["pages"]
+
+    def save_cursor(self, key: str, cursor, pages: int = 0):
+        """保存下一页游标(该页条目均已入队), cursor为None时表示翻页结束"""
+        with self._lock:
+            self.cursors[key] = None if cursor is None else {"cursor": cursor, "pages": pages}
+            data = json.dumps(self.cursors)
+        sql = "UPDATE task_journal SET cursors=? WHERE task_id=?"
+        self.con.execute(sql, (data, self.task_id))
+
+    def queue(self, item_data: dict):
+        """记录加入下载队列的条目数据"""
+        sql = "UPDATE urls SET item=? WHERE task_id=? AND url=?"
+        self.con.execute(sql, (json.dumps(item_data, default=str), self.task_id, item_data["item_url"]))
+
+    def finish(self):
+        """解析完成"""
+        self.parsed = True
+        sql = "UPDATE task_journal SET parsed=1 WHERE task_id=?"
+        self.con.execute(sql, (self.task_id,))
+
+    def complete(self, url: str, prop: [tuple, None]):
+        """
+        记录条目下载结果
+        :param prop: 过滤器返回值 tuple(file_type, file_size, file_bytes), None表示被过滤或下载失败
+        """
+        self.complete_many([(url, prop)])
+
+    def complete_many(self, rows: list, download_count: int = None):
+        """
+        批量记录条目下载结果(由进度汇总线程调用)
+        :param rows: list[(url, prop)]
+        :param download_count: 同时更新history表中的下载数
+        """
+        downloaded = [(*prop[0], *prop[1], prop[2], self.task_id, url) for url, prop in rows if prop]
+        filtered = [(self.task_id, url) for url, prop in rows if not prop]
+        if downloaded:
+            sql = "UPDATE urls SET status=1, name=?, type=?, width=?, height=?, bytes=? " \
+                  "WHERE task_id=? AND url=?"
+            self.con.executemany(sql, downloaded)
+        if filtered:
+            sql = "UPDATE urls SET status=2 WHERE task_id=? AND url=?"
+            self.con.executemany(sql, filtered)
+        if download_count is not None:
+            sql = "UPDATE history SET download_count=? WHERE id=?"
+            self.con.execute(sql, (download_count, self.task_id))
+
+    def counts(self) -> tuple:
+        """根据urls表统计: tuple(条目总数, 已完成数)"""
+        sql = "SELECT COUNT(*), TOTAL(status != 0) FROM urls WHERE task_id=?"
+        row = self.con.select_one(sql, (self.task_id,))
+        return (row[0], int(row[1])) if row else (0, 0)
+
+    def sync_counts(self) -> tuple:
+        """按urls表修正history表中的解析总数及下载数(异常退出时可能未及时写入)"""
+        total, done = self.counts()
+        sql = "UPDATE history SET total_count=?, download_count=? WHERE id=?"
+        self.con.execute(sql, (total, done, self.task_id))
+        return total, done
+
+    def close(self):
+        """任务完成或删除: 清除进度记录"""
+        with self._lock:
+            self.cursors = {}
+        self.parsed = False
+        sql = "UPDATE urls SET item=NULL WHERE task_id=? AND item IS NOT NULL"
+        self.con.execute(sql, (self.task_id,))
+        sql = "DELETE FROM task_journal WHERE task_id=?"
+        self.con.execute(sql, (self.task_id,))
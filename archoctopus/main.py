@@ -16,6 +16,7 @@ import wx.lib.newevent
 
 from archoctopus import version
 from archoctopus import constants
+from archoctopus import core
 
 if wx.Platform == '__WXMSW__':
     from archoctopus.gui import msw_gui as wx_gui
@@ -23,11 +24,16 @@ else:
     from archoctopus.gui import mac_gui as wx_gui
 
 from archoctopus.gui import custom_outlinebtn, MyBitmap, svg_bitmap, SYNC, SYNC_DISABLE, PAUSE, RESTART
-from archoctopus.task import TaskItem
+from archoctopus.task import TaskItem, TaskScheduler
+from archoctopus.journal import TaskJournal
+from archoctopus.progress import ProgressAggregator
 from archoctopus.database import AoDatabase
+from archoctopus.client import ClientPool
+from archoctopus.httpcache import HttpCache
 from archoctopus.update import Update, PluginUpdate
 from archoctopus.sync import AoSync
-from archoctopus.utils import get_bitmap_from_embedded, get_docs_dir, UpdateCover
+from archoctopus.utils import get_docs_dir, format_bytes
+from archoctopus.gui.utils import get_bitmap_from_embedded, UpdateCover
 from archoctopus.usage import Usage
 
 
@@ -37,6 +43,16 @@ def is_url(url: str):
     return all(result[:3])
 
 
+def parse_url_list(text: str) -> list:
+    """从文本(文件内容或剪贴板)中解析网址列表: 按空白字符分隔, 去除重复并保持顺序"""
+    urls = []
+    for word in text.split():
+        url = word.strip(" \'\"[]<>,;")
+        if url and is_url(url) and url not in urls:
+            urls.append(url)
+    return urls
+
+
 def get_data_dir():
     """Return the standard location on this platform for application data"""
     sp = wx.StandardPaths.Get()
@@ -61,6 +77,16 @@ def get_database_file():
     return database_file
 
 
+class WxEvents(core.Events):
+    """GUI事件分发器: 引擎线程的回调通过wx.CallAfter在主线程中执行"""
+
+    def post(self, callback, *args, **kwargs):
+        wx.CallAfter(callback, *args, **kwargs)
+
+    def post_later(self, delay: float, callback, *args, **kwargs):
+        wx.CallAfter(wx.CallLater, int(delay * 1000), callback, *args, **kwargs)
+
+
 class DebugFrameHandler(logging.StreamHandler):
     """"""
 
@@ -187,6 +213,7 @@ class AoMainFrame(wx_gui.MyFrame):
         self.previous_url = ""  # 用于判断系统粘贴板中的url是否已使用过
         self.running_task_count = 0  # 用于判断是否存在正在运行的Task实例
         self.proxies = None
+        self.scheduler = TaskScheduler()    # 全局任务调度器
 
         self.tbicon = TBicon(self)
         self.url_ctrl.SetHint("输入收集网址...")
@@ -194,6 +221,7 @@ class AoMainFrame(wx_gui.MyFrame):
 
         self.init_load_history()
         self.config_effect()
+        wx.CallAfter(self.resume_tasks)     # 继续上次未完成的任务
 
         # MACOS 菜单
         if wx.Platform == '__WXMAC__':
@@ -274,6 +302,14 @@ class AoMainFrame(wx_gui.MyFrame):
             task_info = dict(zip(info_key, _r))
             self.create_task_panel(1, **task_info)
 
+    def resume_tasks(self):
+        """继续上次程序退出(或异常中止)时未完成的任务"""
+        if not self.cfg.ReadBool("/General/resume_tasks", defaultVal=True):
+            return
+        for task_id, url in TaskJournal.unfinished(self.con):
+            self.logger.info("继续未完成的任务: %s", url)
+            self.start_task(task_id, url, priority=TaskScheduler.PRIORITY_BATCH, resume=True)
+
     def refresh_logo(self, update: int):
         self.running_task_count += update
         self.running_task_count = 0 if self.running_task_count < 0 else self.running_task_count
@@ -388,6 +424,9 @@ class AoMainFrame(wx_gui.MyFrame):
                 self.proxies = f"http://{proxy_user}:{proxy_password}@{proxy_host}:{proxy_port}"
             else:
                 self.proxies = f"http://{proxy_host}:{proxy_port}"
+        # 任务调度: 同时运行的任务数及下载线程总数
+        self.scheduler.configure(self.cfg.ReadInt("/General/max_running_tasks", defaultVal=3),
+                                 self.cfg.ReadInt("/General/max_download_workers", defaultVal=16))
 
     def build_menu_bar(self):
         main_menu = wx.MenuBar()
@@ -407,6 +446,14 @@ class AoMainFrame(wx_gui.MyFrame):
         menu.Append(history_item)
         self.Bind(wx.EVT_MENU, self.on_open_history_dlg, history_item)
 
+        import_item = wx.MenuItem(menu, 102, '&从文件导入网址...', '从文本文件批量添加任务')
+        menu.Append(import_item)
+        self.Bind(wx.EVT_MENU, self.on_import_file, import_item)
+
+        import_item = wx.MenuItem(menu, 103, '&从剪贴板导入网址', '从剪贴板批量添加任务')
+        menu.Append(import_item)
+        self.Bind(wx.EVT_MENU, self.on_import_clipboard, import_item)
+
         if wx.Platform == '__WXMSW__':
             menu.AppendSeparator()
 
@@ -525,8 +572,14 @@ class AoMainFrame(wx_gui.MyFrame):
 
     def on_start(self, event):
         """启动新项目"""
-        raw_url = self.url_ctrl.GetValue().strip(" \'\"[]<>")
+        text = self.url_ctrl.GetValue()
         self.url_ctrl.Clear()
+        urls = parse_url_list(text)
+        if len(urls) > 1:   # 输入框中粘贴了多个网址时, 按批量导入处理
+            self.import_urls(urls)
+            return
+
+        raw_url = text.strip(" \'\"[]<>")
         if not (raw_url and is_url(raw_url)):
             wx.MessageBox("错误的网址格式！", "输入错误", wx.OK | wx.ICON_ERROR, parent=self)
             return
@@ -547,6 +600,7 @@ class AoMainFrame(wx_gui.MyFrame):
                 # 重新下载时, 清除url表中的下载记录, 用于后续解析过程中的去重操作.
                 sql = "DELETE FROM urls WHERE task_id=?"
                 self.con.execute(sql, (result[0],))
+                TaskJournal(self.con, result[0]).close()
                 # 重新下载时, 初始化history表中的total_count, download_count字段
                 sql = "UPDATE history SET total_count=0, download_count=0, is_show=1 WHERE id=?"
                 self.con.execute(sql, (result[0],))
@@ -561,33 +615,108 @@ class AoMainFrame(wx_gui.MyFrame):
                 ask_dlg.Destroy()
                 return
         else:
-            sql = "INSERT INTO history (url) VALUES (?)"
-            self.con.execute(sql, (raw_url,))
-            sql = "SELECT id FROM history WHERE url=?"
-            task_id = self.con.select_one(sql, (raw_url,))[0]
-
-            netloc = urlparse(raw_url).netloc
-            if netloc in self.netloc:
-                self.netloc[netloc] += 1
-            else:
-                self.netloc[netloc] = 1
+            task_id = self.add_history(raw_url)
+
+        self.start_task(task_id, raw_url)
+
+    def add_history(self, url: str) -> int:
+        """新建历史记录, 返回任务id"""
+        sql = "INSERT INTO history (url) VALUES (?)"
+        self.con.execute(sql, (url,))
+        sql = "SELECT id FROM history WHERE url=?"
+        task_id = self.con.select_one(sql, (url,))[0]
+
+        netloc = urlparse(url).netloc
+        if netloc in self.netloc:
+            self.netloc[netloc] += 1
+        else:
+            self.netloc[netloc] = 1
+        return task_id
 
+    def start_task(self, task_id: int, url: str, priority: int = TaskScheduler.PRIORITY_NORMAL,
+                   resume: bool = False):
+        """
+        创建或复用任务面板, 提交给任务调度器
+        :param resume: 继续未完成的任务, 进度从urls表中已完成的条目数开始
+        """
+        # 继续任务时按urls表修正进度
+        total, done = TaskJournal(self.con, task_id).sync_counts() if resume else (0, 0)
         # 判断重复下载时, 任务面板是否已创建
         for _item in self.sizer_8.GetChildren():
             _task_panel = _item.GetWindow()
             if _task_panel.task_info["id"] == task_id:
+                if self.scheduler.is_active(_task_panel):
+                    self.logger.debug("任务正在运行或等待中: %s", task_id)
+                    return
                 self.logger.debug("复用任务_id: %s", task_id)
                 # 重新下载时, 初始化进度条
                 _task_panel.gauge.SetBarColor(wx.Colour(0, 174, 239))
-                _task_panel.gauge_value = 0
-                _task_panel.gauge.SetValue(0)
-                _task_panel.run()
+                if total:
+                    _task_panel.gauge.SetRange(total)
+                _task_panel.gauge_value = done
+                _task_panel.gauge.SetValue(done)
                 break
         # 创建任务面板
         else:
             self.logger.debug("创建任务_id: %s", task_id)
-            _task_panel = self.create_task_panel(0, id=task_id, url=raw_url)
-            _task_panel.run()
+            if resume:
+                sql = "SELECT name, dir FROM history WHERE id=?"
+                name, task_dir = self.con.select_one(sql, (task_id,))
+                _task_panel = self.create_task_panel(0, id=task_id, url=url, name=name, dir=task_dir,
+                                                     total_count=total, download_count=done)
+            else:
+                _task_panel = self.create_task_panel(0, id=task_id, url=url)
+        self.scheduler.submit(_task_panel, priority)
+
+    def import_urls(self, urls: list):
+        """批量添加任务: 已下载过的网址跳过, 其余任务以较低优先级进入调度队列"""
+        added = skipped = 0
+        self.Freeze()
+        try:
+            for url in urls:
+                sql = "SELECT id FROM history WHERE url = ?"
+                if self.con.select_one(sql, (url,)):
+                    skipped += 1
+                    continue
+                self.start_task(self.add_history(url), url, priority=TaskScheduler.PRIORITY_BATCH)
+                added += 1
+        finally:
+            self.Thaw()
+        self.logger.info("批量导入: 添加%s个任务, 跳过%s个已下载网址", added, skipped)
+        wx.MessageBox(f"已添加 {added} 个任务, 跳过 {skipped} 个已下载的网址.", "批量导入",
+                      wx.OK | wx.ICON_INFORMATION, parent=self)
+
+    def on_import_file(self, event):
+        """从文本文件批量导入网址(每行一个)"""
+        with wx.FileDialog(self, "选择网址列表文件", wildcard="文本文件 (*.txt)|*.txt|所有文件 (*.*)|*.*",
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as file_dlg:
+            if file_dlg.ShowModal() != wx.ID_OK:
+                return
+            path = file_dlg.GetPath()
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                urls = parse_url_list(f.read())
+        except OSError as e:
+            self.logger.error("网址列表读取失败: %s", e)
+            wx.MessageBox("网址列表文件读取失败！", "批量导入", wx.OK | wx.ICON_ERROR, parent=self)
+            return
+        if not urls:
+            wx.MessageBox("文件中没有找到网址！", "批量导入", wx.OK | wx.ICON_ERROR, parent=self)
+            return
+        self.import_urls(urls)
+
+    def on_import_clipboard(self, event):
+        """从剪贴板批量导入网址"""
+        text_data = wx.TextDataObject()
+        data = None
+        if wx.TheClipboard.Open():
+            data = wx.TheClipboard.GetData(text_data)
+            wx.TheClipboard.Close()
+        urls = parse_url_list(text_data.GetText()) if data else []
+        if not urls:
+            wx.MessageBox("剪贴板中没有找到网址！", "批量导入", wx.OK | wx.ICON_ERROR, parent=self)
+            return
+        self.import_urls(urls)
 
     def on_sync_timer(self, event):
         """同步定时"""
@@ -1344,6 +1473,7 @@ class AoTaskPanel(wx_gui.TaskPanel):
 
         self.is_range_set = False  # 判断进度条Range是否已设置
         self.download_thread_count = 0
+        self.worker_limit = 0  # 设置的下载线程数(调度器分配的线程数不超过此值)
 
         # 任务对象
         self.task = None
@@ -1376,18 +1506,38 @@ class AoTaskPanel(wx_gui.TaskPanel):
         # 事件绑定
         self.Bind(wx.EVT_SIZE, self.on_size)
 
-    def run(self):
+    def run(self, workers: int = None):
+        """
+        启动任务(由任务调度器调用)
+        :param workers: 调度器分配的下载线程数上限, 异步模式下不限制
+        """
         self.task_info["status"] = 0
 
         # GUI更新
         self.pause_btn.Enable()
         self.GetTopLevelParent().refresh_logo(update=1)
-        self.imgs_sum.SetLabel("[0 / 解析中...]")
+        self.imgs_sum.SetLabel("[{} / 解析中...]".format(self.gauge_value))
 
-        self.download_thread_count = wx.GetApp().cfg.ReadInt("/General/download_thread_count", defaultVal=5)
-        self.task = TaskItem(parent=self, download_thread_count=self.download_thread_count)
+        cfg = wx.GetApp().cfg
+        use_async = cfg.ReadBool("/General/async_download", defaultVal=False)
+        if use_async:
+            self.download_thread_count = cfg.ReadInt("/General/async_concurrency", defaultVal=64)
+        else:
+            self.worker_limit = cfg.ReadInt("/General/download_thread_count", defaultVal=5)
+            self.download_thread_count = min(self.worker_limit, workers) if workers else self.worker_limit
+        self.task = TaskItem(parent=self, download_thread_count=self.download_thread_count, use_async=use_async,
+                             proxies=self.GetTopLevelParent().proxies)
         self.task.run()
 
+    def resize_workers(self, workers: int):
+        """任务调度器重新分配下载线程数"""
+        if self.task:
+            self.download_thread_count += self.task.resize(min(self.worker_limit, workers))
+
+    def call_queued(self):
+        """任务进入调度器等待队列"""
+        self.imgs_sum.SetLabel("[等待中...]")
+
     def call_imgs_sum(self, imgs_sum: int):
         """注册解析后得到的图像总数"""
         self.imgs_sum.SetLabel("[{} / {}]".format(self.gauge_value, imgs_sum))
@@ -1426,28 +1576,30 @@ class AoTaskPanel(wx_gui.TaskPanel):
         """注册所有download线程正常结束事件"""
         self.download_thread_count -= 1
         if self.download_thread_count == 0:
+            self.GetTopLevelParent().scheduler.done(self)
+            ProgressAggregator.instance().unregister(self.task.progress)
             if self.task_info.get("is_delete"):
                 self.Destroy()
                 return
+            # 任务正常结束(未被停止且解析完成), 清除进度记录
+            if self.task.running_event.is_set() and self.task.journal.parsed:
+                self.task.journal.close()
+            # 图片库节省的下载流量及磁盘空间
+            saved = self.task.progress.saved_bytes
+            if saved:
+                self.imgs_sum.SetToolTip("图片库节省: {}".format(format_bytes(saved)))
+                self.GetTopLevelParent().logger.info("图片库节省: %s - %s", format_bytes(saved), self.task_info["url"])
             if self.gauge_value != self.gauge.GetRange():
                 self.gauge.SetBarColor(wx.Colour(244, 84, 63))
             self.pause_btn.Disable()
             self.GetTopLevelParent().refresh_logo(update=-1)
 
-    def call_refresh_gauge(self, url: str, prop: tuple):
-        """注册刷新进度条"""
-        self.gauge_value += 1
-
-        if prop:
-            sql = "UPDATE urls SET status=1, name=?, type=?, width=?, height=?, bytes=? " \
-                  "WHERE task_id=? AND url=?"
-            self.con.execute(sql, (*prop[0], *prop[1], prop[2], self.task_info["id"], url))
-        else:
-            sql = "UPDATE urls SET status=2 WHERE task_id=? AND url=?"
-            self.con.execute(sql, (self.task_info["id"], url))
-
-        sql = "UPDATE history SET download_count=? WHERE url=?"
-        self.con.execute(sql, (self.gauge_value, self.task_info["url"]))
+    def call_refresh_gauge(self, download_count: int):
+        """
+        注册刷新进度条
+        由进度汇总线程(ProgressAggregator)合并后定期调用, 下载结果及history.download_count已由汇总线程写入数据库.
+        """
+        self.gauge_value = download_count
 
         if self.is_range_set:
             self.gauge.SetValue(self.gauge_value)
@@ -1480,7 +1632,10 @@ class AoTaskPanel(wx_gui.TaskPanel):
         # 更新数据库history表is_show字段
         sql = "UPDATE history SET is_show=0 WHERE id=?"
         self.con.execute(sql, (self.task_info["id"],))
+        # 删除的任务不再继续
+        TaskJournal(self.con, self.task_info["id"]).close()
         # 中止任务并更新运行任务计数: -1
+        self.GetTopLevelParent().scheduler.cancel(self)
         # if hasattr(self, "task") and self.task.is_running():
         if self.task and self.task.is_running():
             self.task.stop()
@@ -1558,6 +1713,8 @@ class AoTaskPanel(wx_gui.TaskPanel):
 
 class TBicon(wx.adv.TaskBarIcon):
     TBMENU_SETUP = wx.NewIdRef()
+    TBMENU_IMPORT_FILE = wx.NewIdRef()
+    TBMENU_IMPORT_CLIP = wx.NewIdRef()
     TBMENU_BUG = wx.NewIdRef()
     TBMENU_DONATE = wx.NewIdRef()
     TBMENU_HELP = wx.NewIdRef()
@@ -1575,6 +1732,8 @@ class TBicon(wx.adv.TaskBarIcon):
         self.SetIcon(_icon, f'{constants.APP_DISPLAY_NAME}\n发行版本: {version.VERSION}')
 
         self.Bind(wx.EVT_MENU, self.on_taskbar_setup, id=self.TBMENU_SETUP)
+        self.Bind(wx.EVT_MENU, self.frame.on_import_file, id=self.TBMENU_IMPORT_FILE)
+        self.Bind(wx.EVT_MENU, self.frame.on_import_clipboard, id=self.TBMENU_IMPORT_CLIP)
         self.Bind(wx.EVT_MENU, self.on_open_url, id=self.TBMENU_HELP)
         self.Bind(wx.EVT_MENU, self.on_open_url, id=self.TBMENU_BUG)
         self.Bind(wx.EVT_MENU, self.on_taskbar_donate, id=self.TBMENU_DONATE)
@@ -1587,6 +1746,9 @@ class TBicon(wx.adv.TaskBarIcon):
         menu = wx.Menu()
         menu.Append(self.TBMENU_SETUP, "设置")
         menu.AppendSeparator()
+        menu.Append(self.TBMENU_IMPORT_FILE, "从文件导入网址...")
+        menu.Append(self.TBMENU_IMPORT_CLIP, "从剪贴板导入网址")
+        menu.AppendSeparator()
         menu.Append(self.TBMENU_HELP, "获取帮助")
         menu.Append(self.TBMENU_BUG, "提交Bug")
         menu.Append(self.TBMENU_ABOUT, "关于")
@@ -1664,6 +1826,26 @@ class AoApp(wx_gui.MyApp):
         self.con = AoDatabase(db=get_database_file())
         # self.con = AoDatabase()
 
+        # 核心引擎运行环境: 配置, 数据库及事件回调(在主线程中执行)
+        core.setup(cfg=self.cfg, con=self.con, events=WxEvents(), install_dir=self.install_dir)
+
+        # 共享网络连接池
+        ClientPool.configure(
+            max_connections=self.cfg.ReadInt("/Network/max_connections", defaultVal=100),
+            max_keepalive_connections=self.cfg.ReadInt("/Network/max_keepalive", defaultVal=40),
+            keepalive_expiry=self.cfg.ReadFloat("/Network/keepalive_expiry", defaultVal=30.0),
+            max_per_host=self.cfg.ReadInt("/Network/max_per_host", defaultVal=8),
+            http2=self.cfg.ReadBool("/Network/http2", defaultVal=True),
+            host_rate=self.cfg.ReadFloat("/Network/host_rate", defaultVal=8.0),
+            host_max_rate=self.cfg.ReadFloat("/Network/host_max_rate", defaultVal=100.0),
+        )
+        # 解析页面及接口的HTTP缓存
+        if self.cfg.ReadBool("/Network/http_cache", defaultVal=True):
+            ClientPool.configure(cache=HttpCache(
+                db=os.path.join(get_data_dir(), "http_cache.db"),
+                max_bytes=self.cfg.ReadInt("/Network/http_cache_size", defaultVal=64) * 1024 * 1024,
+            ))
+
         self.netloc = {}
 
         mainFrame = AoMainFrame(None, wx.ID_ANY, constants.APP_DISPLAY_NAME)
@@ -1677,6 +1859,7 @@ class AoApp(wx_gui.MyApp):
             usage_thread = Usage(self)
             usage_thread.start()
             usage_thread.join()
+        ClientPool.close_all()
         self.con.on_close()
         return True
 
@@ -0,0 +1,101 @@
+"""
+ArchOctopus 文本及url规范化模块
+    cleanup -- 替换标题中的html实体及非法字符, 生成符合windows目录命名要求的名称
+    site_name -- 由主机名生成站点显示名称(任务目录名)
+    plugin_name -- 由主机名生成解析插件模块名
+    get_title -- 获取页面标题
+
+这些函数在解析及下载的每个条目上都会调用, 正则表达式全部预先编译;
+cleanup按字符替换的部分使用str.translate一次完成, 并与主机名转换一起使用有界LRU缓存.
+转换结果与原来逐条re.sub的实现完全一致.
+"""
+
+import re
+from functools import lru_cache
+
+# ---- cleanup ----
+ENTITY_PAT = re.compile("&#34;|&quot;|&#39;|&apos;|&#60;|&lt;|&#62;|&gt;|&#38;|&amp;")
+ENTITIES = {
+    "&#34;": "'", "&quot;": "'", "&#39;": "'", "&apos;": "'",
+    "&#60;": "'", "&lt;": "'", "&#62;": "'", "&gt;": "'",
+    "&#38;": "&", "&amp;": "&",
+}
+ILLEGAL_CHARS = str.maketrans(dict.fromkeys('/:*?"<>|\\', "_"))    # windows目录名非法字符
+REPEAT_PAT = re.compile("_{2,}|\\s{2,}")
+
+# ---- 主机名 ----
+SITE_PAT = re.compile("www\\.|\\.com|\\.cn")
+PLUGIN_ALIASES = {
+    "archdaily": re.compile("(my|www).(archdaily|plataformaarquitectura)", re.I),
+}
+PLUGIN_WWW_PAT = re.compile("www\\.")
+PLUGIN_TLD_PAT = re.compile("(\\.com|\\.org|\\.info|\\.net|\\.biz|"
+                            "\\.com\\.cn|\\.cn|\\.jp|\\.tw|\\.hk|\\.us|\\.es|\\.br|\\.fr|\\.it|\\.sg)$")   # 常见顶级域名
+
+# ---- 页面标题 ----
+TITLE_PAT = re.compile("<title.*?>(.*?)</title>", re.S)
+OG_TITLE_PAT = re.compile("property=[\"\']og:title[\"\']\\s+content=[\"\'](.*?)[\"\']|"
+                          "content=[\"\'](.*?)[\"\']\\s+property=[\"\']og:title[\"\']")
+
+
+def _repeat(match) -> str:
+    return "_" if match.group().startswith("_") else " "
+
+
+@lru_cache(maxsize=4096)
+def _cleanup(title: str) -> str:
+    title = title.strip()
+    if "&" in title:
+        title = ENTITY_PAT.sub(lambda m: ENTITIES[m.group()], title)
+        title = title.replace("&#8211;", "–")     # 在"&amp;"替换之后, 如"&amp;#8211;"
+    title = title.translate(ILLEGAL_CHARS)
+    return REPEAT_PAT.sub(_repeat, title)
+
+
+def cleanup(title):
+    """
+    替换非法字符
+    :param title: 初始输入标题
+    :return: 符合windows目录命名要求的标题
+    """
+    if not title:
+        return title
+    return _cleanup(title)
+
+
+@lru_cache(maxsize=1024)
+def site_name(hostname: str) -> str:
+    """站点显示名称: www.archdaily.cn -> Archdaily"""
+    return SITE_PAT.sub("", hostname).replace(".", "_").capitalize()
+
+
+@lru_cache(maxsize=1024)
+def plugin_name(hostname: str) -> str:
+    """解析插件模块名: www.archdaily.cn -> archdaily, shows.vogue.com.cn -> shows_vogue"""
+    for name, pat in PLUGIN_ALIASES.items():
+        if pat.match(hostname):
+            return name
+    hostname = PLUGIN_WWW_PAT.sub("", hostname)
+    hostname = PLUGIN_TLD_PAT.sub("", hostname)
+    return hostname.replace(".", "_")
+
+
+def get_title(html: str) -> str:
+    """
+    获取页面标题: 优先使用<title>, 其次为og:title
+    :return: 经过cleanup的标题, 未找到时返回"No_Title"
+    """
+    title = TITLE_PAT.search(html)
+    if title and title.group(1):
+        task_name = cleanup(title.group(1))
+        if task_name:
+            return task_name
+
+    title = OG_TITLE_PAT.search(html)
+    if title:
+        name = title.group(1) or title.group(2)
+        if name:
+            task_name = cleanup(name)
+            return task_name
+
+    return "No_Title"
@@ -10,20 +10,23 @@ ArchOctopus页面对象解析模块
 import threading
 import re
 import os
-import shutil
 import logging
 from queue import Queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, unquote, parse_qs, urlunparse, urljoin, parse_qsl
 
 import typing
 from http.cookiejar import CookieJar
 
-import wx
-import httpx
-from bs4 import BeautifulSoup
-
 from archoctopus.utils import retry, get_docs_dir
+from archoctopus.client import ClientPool
+from archoctopus.dedup import UrlIndex
+from archoctopus.journal import TaskJournal
+from archoctopus.extract import extract_image_uris
+from archoctopus.normalize import cleanup, get_title, site_name
 from archoctopus.constants import APP_NAME
+from archoctopus.core import get_context
 # from archoctopus.pdf import PDF
 
 
@@ -33,11 +36,12 @@ HEADERS = {
 
 
 def get_domain_from_url(url: str):
-    domain = unquote(urlparse(url).hostname)
-    replacements = [('www\\.|\\.com|\\.cn', ''), ('\\.', '_')]
-    for _old, _new in replacements:
-        domain = re.sub(_old, _new, domain)
-    return domain.capitalize()
+    return site_name(unquote(urlparse(url).hostname))
+
+
+def next_page(page, cur_page: int) -> [int, None]:
+    """按页码翻页的游标: 本页不为空时请求下一页"""
+    return cur_page + 1 if page else None
 
 
 def filter_duplicate(func):
@@ -59,7 +63,7 @@ def filter_duplicate(func):
                 item_index = 1
             parse_result["item_index"] = item_index
 
-            # 读取数据库urls表, 根据(task_id, url)字段判断是否重复
+            # 查询任务url去重索引, 根据(task_id, url)判断是否重复
             # 不用"INSERT OR IGNORE", 而是分为查询和插入两步是为了判断item_index值是否需要累加
             _item_url = parse_result["item_url"]
             is_duplicate = self.url_dedup(_item_url)
@@ -102,11 +106,7 @@ class UrlParser:
         return self.parser.path
 
     def get_domain(self) -> str:
-        domain = unquote(str(self.parser.hostname))
-        replacements = [('www\\.|\\.com|\\.cn', ''), ('\\.', '_')]
-        for _old, _new in replacements:
-            domain = re.sub(_old, _new, domain)
-        return domain.capitalize()
+        return site_name(unquote(str(self.parser.hostname)))
 
     def get_path_list(self) -> list:
         path = self.get_path()
@@ -131,7 +131,7 @@ class UrlParser:
         return urlunparse(("", "", self.get_path(), "", self.get_query(), ""))
 
     def get_base_url(self):
-        return urlunparse((self.parser.scheme, self.parser.hostname, "", "", "", ""))
+        return urlunparse((self.parser.scheme, self.parser.netloc, "", "", "", ""))
 
     def get_join_url(self, href):
         return urljoin(self.get_base_url(), href)
@@ -149,19 +149,22 @@ class BaseParser(threading.Thread):
                  running_event: threading.Event,
                  threads_count: int,
                  cookies: CookieJar = None,
-                 proxies: [str, None] = None):
+                 proxies: [str, None] = None,
+                 journal: TaskJournal = None):
 
         super().__init__()
         self.url = url  # 解析地址
         self.task_id = task_id
         self.queue = parse_queue    # 解析队列
-        self.parent = parent    # GUI对象
+        self.parent = parent    # 任务事件接收者(GUI中为任务面板)
 
+        context = get_context()
         if self.parent is None:
             from archoctopus.database import AoDatabase
             self.con = AoDatabase()
         else:
-            self.con = wx.GetApp().con  # 数据库连接
+            self.con = context.con  # 数据库连接
+        self.events = context.events    # 事件分发器
 
         self.pause_event = pause_event  # 用于暂停线程的标识
         self.running_event = running_event  # 用于停止线程的标识
@@ -172,12 +175,14 @@ class BaseParser(threading.Thread):
         self.friend_name = get_domain_from_url(url)
 
         self.url_parser = UrlParser(self.url)   # url解析
+        self._url_index = None  # url去重索引
+        self.journal = journal or TaskJournal(self.con, task_id)  # 任务进度记录
 
         # ---- logger ----
         self.logger = logging.getLogger(APP_NAME)
         
         # ---- request ----
-        self.session = httpx.Client(headers=HEADERS, cookies=cookies, proxies=proxies, follow_redirects=True)
+        self.session = ClientPool.borrow(cookies=cookies, proxies=proxies, follow_redirects=True, cache=True)
 
         # ------ cfg ------
         if self.parent is None:
@@ -186,13 +191,15 @@ class BaseParser(threading.Thread):
             self.root_dir = ""
             self.is_index = True
             self.is_pdf = False
+            self.prefetch_window = 4
         else:
-            cfg = wx.GetApp().cfg
+            cfg = context.cfg
             self.loop_max = cfg.ReadInt("/General/loop_max", defaultVal=3)  # 异步加载页面加载最大次数
             self.is_page = cfg.ReadBool("/General/is_page", defaultVal=False)  # 自动加载下一页
             self.root_dir = cfg.Read("/General/download_dir", defaultVal=get_docs_dir())  # 下载根目录
             self.is_index = cfg.ReadBool("/Filter/is_index", defaultVal=True)  # 判断是否给图片添加序号的信号量
             self.is_pdf = cfg.ReadBool("/General/pdf_output", defaultVal=False)  # 判断是否输出页面PDF
+            self.prefetch_window = cfg.ReadInt("/General/prefetch", defaultVal=4)  # 详情页预取窗口
 
     def get_json_headers(self, **kwargs):
         headers = {
@@ -203,9 +210,13 @@ class BaseParser(threading.Thread):
         return headers
 
     @retry(times=3)
-    def request(self, method, url, headers=None, params=None, data=None):
-        """网络请求"""
-        response = self.session.request(method, url, headers=headers, params=params, data=data)
+    def request(self, method, url, headers=None, params=None, data=None, ttl=None):
+        """
+        网络请求
+        GET请求使用HTTP缓存: 有ETag/Last-Modified的响应发出条件请求验证;
+        ttl: 缓存有效期(秒), 用于内容基本不变但没有验证字段的接口(如分类查询)
+        """
+        response = self.session.request(method, url, headers=headers, params=params, data=data, cache_ttl=ttl)
         response.raise_for_status()
         return response
 
@@ -264,6 +275,110 @@ class BaseParser(threading.Thread):
         result = func(*args, **kwargs)
         return result
 
+    def prefetch(self, func: typing.Callable, jobs: typing.Iterable, window: int = None) -> typing.Generator:
+        """
+        预取: 在线程池中提前执行后续任务(请求页面并解析), 按任务原顺序返回结果.
+        等待当前结果被处理时, 后续最多window个页面已在并发请求和解析, 页面延迟相互重叠.
+        用法:
+
+        def fetch(url, title):
+            return list(self.parse_article(self.request("GET", url), title=title))
+
+        for _job, items in self.prefetch(fetch, ((url, title) for ...)):
+            yield from items
+
+        :param func: 任务函数, 须返回完整结果(如列表), 不能返回生成器
+        :param jobs: 任务参数元组的可迭代对象, 可以是惰性生成器(如逐页请求的列表接口)
+        :param window: 预取窗口(同时执行的任务数), 默认使用配置值, 不大于1时顺序执行
+        :return: 生成器 yield (job, result); 任务异常在轮到该任务时抛出
+        """
+        window = window or self.prefetch_window
+        if window <= 1:
+            for job in jobs:
+                yield job, func(*job)
+            return
+
+        jobs = iter(jobs)
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix="prefetch")
+
+        def submit():
+            job = next(jobs, None)
+            if job is not None and (self.running_event is None or self.running_event.is_set()):
+                pending.append((job, executor.submit(func, *job)))
+
+        try:
+            for _ in range(window):
+                submit()
+            while pending:
+                job, future = pending.popleft()
+                result = future.result()
+                submit()
+                yield job, result
+        finally:
+            # 任务停止, 出错或调用方不再读取时, 取消尚未开始的预取
+            for _job, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def paginate(self,
+                 fetch: typing.Callable,
+                 next_cursor: typing.Callable,
+                 cursor=None,
+                 max_pages: int = None,
+                 key: str = None) -> typing.Generator:
+        """
+        流水线翻页: 每页返回后立即取得下一页游标, 在后台请求下一页,
+        网络延迟与当前页条目的去重, 入队处理相互重叠.
+        每页条目处理完后在任务记录中保存下一页游标, 继续中断的任务时从保存的游标开始, 已结束的翻页不再请求.
+        用法:
+
+        def fetch(_max):
+            return self.request("GET", url, params={"limit": 20, "max": _max}).json()["pins"]
+
+        def next_cursor(pins, _max):
+            return pins[-1]["pin_id"] if pins else None
+
+        for pins in self.paginate(fetch, next_cursor):
+            ...
+
+        :param fetch: fetch(cursor) -> page, 请求并解码一页(在后台线程中执行)
+        :param next_cursor: next_cursor(page, cursor) -> 下一页游标, 返回None时结束翻页
+        :param cursor: 第一页游标
+        :param max_pages: 最多请求页数, 默认不限制
+        :param key: 游标记录的键, 默认为fetch的限定名; 同一任务中多次调用同一fetch(如逐个画板翻页)时须指定
+        :return: 生成器 yield page; 请求异常在读取该页时抛出
+        """
+        key = key or fetch.__qualname__
+        found, saved_cursor, pages = self.journal.cursor(key)
+        if found:
+            if saved_cursor is None:
+                self.logger.debug("翻页已完成, 跳过: %s", key)
+                return
+            self.logger.debug("继续翻页: %s, 已请求%s页", key, pages)
+            cursor = saved_cursor
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="paginate")
+        future = executor.submit(fetch, cursor)
+        try:
+            while future is not None:
+                page = future.result()
+                pages += 1
+                cursor = next_cursor(page, cursor)
+                finished = cursor is None or (max_pages is not None and pages >= max_pages)
+                if finished or (self.running_event is not None and not self.running_event.is_set()):
+                    future = None
+                else:
+                    future = executor.submit(fetch, cursor)
+                yield page
+                # 本页条目已全部入队
+                self.journal.save_cursor(key, None if finished else cursor, pages)
+        finally:
+            # 调用方提前结束(中止, 出错)时取消已预取的下一页
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False)
+
     @staticmethod
     def cleanup(title):
         """
@@ -271,15 +386,7 @@ class BaseParser(threading.Thread):
         :param title: 初始输入标题
         :return: 符合windows目录命名要求的标题
         """
-        if not title:
-            return title
-        title = title.strip()
-        replacements = [("&#34;|&quot;|&#39;|&apos;|&#60;|&lt;|&#62;|&gt;", "\'"), ("&#38;|&amp;", "&"),
-                        ("&#8211;", "–"),
-                        ('[/:*?"<>|\\\\]', '_'), ('_{2,}', '_'), ('\\s{2,}', ' ')]
-        for _old, _new in replacements:
-            title = re.sub(_old, _new, title)
-        return title
+        return cleanup(title)
 
     def get_title(self, html):
         """
@@ -287,62 +394,40 @@ class BaseParser(threading.Thread):
         :param html:        页面html源码
         :return:            解析页面标题
         """
-        title = re.search("<title.*?>(.*?)</title>", html, flags=re.S)
-        if title and title.group(1):
-            task_name = self.cleanup(title.group(1))
-            if task_name:
-                return task_name
-
-        title = re.search("property=[\"\']og:title[\"\']\\s+content=[\"\'](.*?)[\"\']|"
-                          "content=[\"\'](.*?)[\"\']\\s+property=[\"\']og:title[\"\']", html)
-        if title:
-            name = title.group(1) or title.group(2)
-            if name:
-                task_name = self.cleanup(name)
-                return task_name
-
-        task_name = "No_Title"
-        return task_name
-
-    def is_url_exist(self, url):
-        """通过查询数据库urls表判断url是否已存在"""
-        sql = "SELECT * FROM urls WHERE task_id!=? AND url=?"
-        result = self.con.select_one(sql, (self.task_id, url))
-        return result
+        return get_title(html)
 
-    def copy_local_exist_file(self, item_path, item_url, index=None):
-        """直接拷贝本机已下载过的文件"""
-        # 联合查询获取文件目录
-        sql = "SELECT history.dir, urls.name, urls.type, urls.width, urls.height, urls.bytes " \
-              "FROM urls " \
-              "INNER JOIN history ON urls.task_id=history.id " \
-              "WHERE urls.task_id!=? AND urls.url=?"
-        result = self.con.select_one(sql, (self.task_id, item_url))
-        if index:
-            name = f"{index}_{result[1]}"
-        else:
-            name = result[1]
-        exist_file = os.path.join(result[0], result[1])
-        item_file = os.path.join(item_path, name)
-        shutil.copyfile(exist_file, item_file)
-        # 更新面板信息
-        filter_result = (result[1:3], result[3:5], result[5])
-        wx.CallAfter(self.parent.call_refresh_gauge, 1, item_url, filter_result)
+    @property
+    def url_index(self) -> UrlIndex:
+        """任务url去重索引, 首次使用时从数据库urls表载入"""
+        if self._url_index is None:
+            self._url_index = UrlIndex(self.con, self.task_id)
+        return self._url_index
 
     def url_dedup(self, url):
         """
-        通过查询数据库urls表进行url去重.
+        通过任务url去重索引进行url去重.
         :param url:
         :return:
         """
-        sql = "SELECT * FROM urls WHERE task_id=? AND url=?"
-        result = self.con.select_one(sql, (self.task_id, url))
-        return result
+        return url in self.url_index
 
     def update_urls_db(self, url: str, sub_dir: typing.Union[str, None]):
         """注册更新数据库urls表函数"""
-        sql = "INSERT INTO urls (task_id, url, sub_dir) VALUES (?, ?, ?)"
-        self.con.execute(sql, (self.task_id, url, sub_dir))
+        self.url_index.add(url, sub_dir)
+
+    def resume(self) -> bool:
+        """
+        继续上次中断的任务: 未下载的条目直接加入下载队列(解析时作为重复条目跳过)
+        :return: True表示解析已完成, 无需再请求任务页面
+        """
+        self.journal.begin()
+        pending = self.journal.restore()
+        for item_data in pending:
+            self.queue.put(item_data)
+        self.count = self.journal.counts()[0]
+        if self.count:
+            self.logger.info("继续任务: %s, 已解析: %s, 待下载: %s", self.url, self.count, len(pending))
+        return self.journal.parsed
 
     @staticmethod
     def abort(msg):
@@ -363,7 +448,12 @@ class BaseParser(threading.Thread):
 
     def run(self):
         self.logger.info("解析开始: %s --> %s", self.friend_name, self.url)
+        finished = False    # 解析结果全部处理或主动中止
         try:
+            if self.resume():
+                self.logger.info("解析已完成, 继续下载: %s", self.url)
+                return
+
             response = self.request("GET", self.url)
             # 判断是否时图片链接
             content_type = response.headers.get('content-type')
@@ -399,7 +489,7 @@ class BaseParser(threading.Thread):
             if self.parent is not None and parse_results is not None:
                 os.makedirs(task_dir, exist_ok=True)
             if self.parent is not None:
-                wx.CallAfter(self.parent.call_task_name, task_dir)
+                self.events.post(self.parent.call_task_name, task_dir)
 
             # 解析结果加入下载任务队列
             if parse_results is None:
@@ -411,7 +501,7 @@ class BaseParser(threading.Thread):
                     msg = item_data.get("abort_msg", "")
                     self.logger.debug("任务中止: %s", msg)
                     if self.parent is not None:
-                        wx.CallAfter(self.parent.call_abort, msg)
+                        self.events.post(self.parent.call_abort, msg)
                     break
                 # 判断是否含子文件夹:
                 _sub_dir = item_data.get("sub_dir")
@@ -427,29 +517,25 @@ class BaseParser(threading.Thread):
 
                 self.logger.debug("解析项目: %s", item_data["item_url"])
 
-                # # 通过查询urls表, 判断该条目是否已下载过, True:直接从之前下载的本地位置复制一份副本到新目录下.
-                # is_exist_result = self.is_url_exist(_item_url)
-                # if is_exist_result:     # 直接拷贝已下载的非相同task_id的url
-                #     copyfile_thread = threading.Thread(target=self.copy_local_exist_file, args=item)
-                #     copyfile_thread.setDaemon(True)
-                #     copyfile_thread.run()
-                # else:
-                #     self.queue.put(item)
-
+                self.journal.queue(item_data)
                 self.queue.put(item_data)
                 self.count += 1
                 self.logger.debug("解析计数: %s", self.count)
+            finished = True
         except Exception as e:
             # self.logger.error("解析错误: %s - %s", e, self.url, exc_info=True)
             self.logger.error("解析错误: %s - %s", e, self.url)
         finally:
+            # 解析正常结束或主动中止时记录完成; 解析出错或任务停止时保留游标记录, 下次从中断的位置继续
+            if finished and (self.running_event is None or self.running_event.is_set()):
+                self.journal.finish()
             # 更新面板信息
             if self.parent is not None:
-                wx.CallAfter(self.parent.call_imgs_sum, self.count)
+                self.events.post(self.parent.call_imgs_sum, self.count)
             # 向任务队列中添加下载线程结束信号
             for _i in range(self.download_thread_count):
                 self.queue.put(None)
-            # 关闭请求连接
+            # 归还请求连接
             self.session.close()
 
         self.logger.info('解析完成: %s', self.url)
@@ -463,7 +549,6 @@ class GeneralParser(BaseParser):
         self.logger.info(self.friend_name)
 
         self.regexps = {
-            'srcset_urls': re.compile("(\\S+)(\\s+([\\d.]+)[xw])?(\\s*(?:,|$))"),
             'raw_url': re.compile("[-_]\\d+x\\d+")
         }
 
@@ -484,31 +569,10 @@ class GeneralParser(BaseParser):
         return url
 
     def parse_general(self, response):
-        html = response.text
-        html_bs = BeautifulSoup(html, 'lxml')
-        images = html_bs.find_all(["img", "picture"])
-        for image in images:
-            src = image.get("src")
-            srcset = image.get("srcset")
-            data_src = image.get("data-src")
-            data_original = image.get("data-original")
-            data_original_src = image.get("data-original-src")
-
-            if data_original:
-                uri = data_original
-            elif data_original_src:
-                uri = data_original_src
-            elif data_src:
-                uri = data_src
-            elif srcset:
-                result = self.regexps["srcset_urls"].findall(srcset)
-                result.sort(key=lambda x: int(x[2]) if x[2] else 0)
-                uri = result[-1][0]
-            elif src:
-                uri = src
-            else:
-                continue
-
+        """
+        通用页面解析: 流式提取img/picture/source, og:image及CSS背景图地址, 不构建文档树
+        """
+        for uri in extract_image_uris(response.text):
             url = self.get_absolute_url(uri)
             raw_url = self.get_raw_url(url)
             yield {"item_url": raw_url}
@@ -101,6 +101,13 @@ class Parser(BaseParser):
             if index_start_flag:
                 index_start_flag = False
 
+    def fetch_page(self, url, meta_type, title):
+        """请求并解析收藏/文章页面(在预取线程中执行), 返回解析结果列表"""
+        response = self.request("GET", url)
+        if meta_type == "Photo":
+            return list(self.parse_gallery(response, title=title))
+        return list(self.parse_article(response, title=title))
+
     def parse_common(self, response):
         """首页"""
         html = response.text
@@ -110,40 +117,41 @@ class Parser(BaseParser):
         if not articles:
             articles = html_bs.find_all("li", class_="afd-search-list__item")
 
-        for _article in articles:
-            _a = _article.find("a")
-            _article_url = self.url_parser.get_join_url(href=_a["href"])
-            _article_title = self.cleanup(_a.get_text())
-            response = self.request("GET", _article_url)
-            yield from self.parse_article(response, title=_article_title)
+        def jobs():
+            for _article in articles:
+                _a = _article.find("a")
+                _article_url = self.url_parser.get_join_url(href=_a["href"])
+                _article_title = self.cleanup(_a.get_text())
+                yield _article_url, "Article", _article_title
+
+        for _job, items in self.prefetch(self.fetch_page, jobs()):
+            yield from items
 
     def parse_folders(self, response):
         path = re.search("/@[^/]*?/folders/?$", self.url_parser.get_path()).group()
         api_url = self.url_parser.get_join_url(path)
         token = self.get_token(response)
 
-        page = 0
-        while True:
-            page += 1
-            params = {"page_info": True, "per_page": 14, "page": page}
-            response = self.request("GET", api_url, headers=self.get_headers(token=token), params=params)
-            response_json = response.json()
-
-            page_json = response_json["data"]
-            for folder in page_json:
-                folder_name = folder["name"]
-                for fav in folder["favs"]:
-                    title = self.cleanup(fav["title"])
-                    fav_sub_dir = os.path.join(folder_name, title)
-                    fav_response = self.request("GET", fav["url"])
-                    if fav["meta_type"] == "Photo":
-                        yield from self.parse_gallery(fav_response, title=fav_sub_dir)
-                    else:
-                        yield from self.parse_article(fav_response, title=fav_sub_dir)
-            # 退出条件
-            is_last_page = response_json["pagination"]["last_page"]
-            if is_last_page:
-                break
+        def jobs():
+            page = 0
+            while True:
+                page += 1
+                params = {"page_info": True, "per_page": 14, "page": page}
+                response_json = self.request("GET", api_url, headers=self.get_headers(token=token), params=params).json()
+
+                page_json = response_json["data"]
+                for folder in page_json:
+                    folder_name = folder["name"]
+                    for fav in folder["favs"]:
+                        title = self.cleanup(fav["title"])
+                        yield fav["url"], fav["meta_type"], os.path.join(folder_name, title)
+                # 退出条件
+                is_last_page = response_json["pagination"]["last_page"]
+                if is_last_page:
+                    break
+
+        for _job, items in self.prefetch(self.fetch_page, jobs()):
+            yield from items
 
     def parse_bookmarks(self, response):
         user_slug = re.search("@([^/]*)", self.url_parser.get_path()).group(1)
@@ -151,25 +159,23 @@ class Parser(BaseParser):
         token = self.get_token(response)
         folder_id = self.get_folder_id(response)
 
-        page = 0
-        while True:
-            page += 1
-            params = {"user_slug": user_slug, "folder_id": folder_id, "page": page}
-            response = self.request("GET", api_url, headers=self.get_headers(token=token), params=params)
-            response_json = response.json()
-
-            page_json = response_json["bookmarks"]
-            for bookmark in page_json:
-                title = self.cleanup(bookmark["title"])
-                fav_response = self.request("GET", bookmark["url"])
-                if bookmark["meta_type"] == "Photo":
-                    yield from self.parse_gallery(fav_response, title=title)
-                else:
-                    yield from self.parse_article(fav_response, title=title)
-            # 退出条件
-            next_page = response_json["pagination"]["next_page"]
-            if not next_page:
-                break
+        def jobs():
+            page = 0
+            while True:
+                page += 1
+                params = {"user_slug": user_slug, "folder_id": folder_id, "page": page}
+                response_json = self.request("GET", api_url, headers=self.get_headers(token=token), params=params).json()
+
+                page_json = response_json["bookmarks"]
+                for bookmark in page_json:
+                    yield bookmark["url"], bookmark["meta_type"], self.cleanup(bookmark["title"])
+                # 退出条件
+                next_page = response_json["pagination"]["next_page"]
+                if not next_page:
+                    break
+
+        for _job, items in self.prefetch(self.fetch_page, jobs()):
+            yield from items
 
     def parse_search(self):
         path_match = re.match("/search/?((cl|us|mx|br|cn|co|pe|)/((all|projects|folders|articles|products)/?.*$))",
@@ -186,21 +192,22 @@ class Parser(BaseParser):
         else:
             search_title = f"Search-{path_match.group(4)}"
 
-        page = 0
-        while True:
-            params = {"q": q, "page": page}
-            response = self.request("GET", api_url, params=params)
-            response_json = response.json()
-            page_json = response_json["results"]
-            for project in page_json:
-                title = self.cleanup(project["title"])
-                fav_sub_dir = os.path.join(search_title, title)
-                project_response = self.request("GET", project["url"])
-                yield from self.parse_article(project_response, title=fav_sub_dir)
-            # 退出条件
-            page += 1
-            if page > 2 or not page_json:
-                break
+        def jobs():
+            page = 0
+            while True:
+                params = {"q": q, "page": page}
+                response_json = self.request("GET", api_url, params=params).json()
+                page_json = response_json["results"]
+                for project in page_json:
+                    title = self.cleanup(project["title"])
+                    yield project["url"], "Article", os.path.join(search_title, title)
+                # 退出条件
+                page += 1
+                if page > 2 or not page_json:
+                    break
+
+        for _job, items in self.prefetch(self.fetch_page, jobs()):
+            yield from items
 
     def parse_tag(self, response):
         pass
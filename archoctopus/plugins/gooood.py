@@ -13,6 +13,7 @@ from archoctopus.plugins import BaseParser
 
 
 API_URL = "https://dashboard.gooood.cn/api/wp/v2/{}"
+CATEGORY_TTL = 24 * 3600    # 分类/筛选条件查询结果缓存一天
 
 
 class Parser(BaseParser):
@@ -33,7 +34,7 @@ class Parser(BaseParser):
             if k != "page" and v != "all":
                 url = API_URL.format(k)
                 params = {"slug": v}
-                response = self.request("GET", url, params=params)
+                response = self.request("GET", url, params=params, ttl=CATEGORY_TTL)
                 response_json = response.json()
                 _id = response_json[0]["id"]
                 posts_params[k] = _id
@@ -150,14 +151,14 @@ class Parser(BaseParser):
         page = int(result.group(3)) if result.group(3) else 1
         url = API_URL.format("categories")
         params = {"slug": slug}
-        response = self.request("GET", url, params=params)
+        response = self.request("GET", url, params=params, ttl=CATEGORY_TTL)
         response_json = response.json()
         _id = response_json[0]["id"]
         _parent_id = response_json[0]["parent"]
 
         if not _parent_id:
             params = {"parent": _id, "per_page": 100}
-            response = self.request("GET", url, params=params)
+            response = self.request("GET", url, params=params, ttl=CATEGORY_TTL)
             response_json = response.json()
             all_id = [str(_id), ]
             for _child in response_json:
@@ -11,7 +11,7 @@ url: https://www.huaban.com
 import re
 import json
 
-from archoctopus.plugins import BaseParser, UrlParser
+from archoctopus.plugins import BaseParser, UrlParser, next_page
 
 PIN_RECOMMEND = "https://huaban.com/pins/{_id}/recommendweb/"
 PIN_RECOMMEND_V2 = "https://api.huaban.com/pins/{_id}/recommendweb/"
@@ -28,6 +28,11 @@ def get_pin_url(pin):
     return pin_url
 
 
+def next_pin_id(pins, _max):
+    """翻页游标: 本页最后一个pin_id, 本页为空时结束"""
+    return pins[-1]["pin_id"] if pins else None
+
+
 def get_page_json(html, contain):
     """获取页面指定部分的json数据"""
     pat = r'app.page\["{}"] = (.*);'.format(contain)
@@ -99,30 +104,24 @@ class Parser(BaseParser):
         board_url = kwargs.get("board_url", self.url)
         url_parser = UrlParser(board_url)
         url = API_URL + url_parser.get_path() + "/pins"
-        _max = None
 
-        while True:
+        def fetch(_max):
             params = {"limit": 20, "max": _max}
-            response = self.request("GET", url, headers=self.get_json_headers(), params=params)
-            page_json = response.json()['pins']
+            return self.request("GET", url, headers=self.get_json_headers(), params=params).json()['pins']
 
-            if page_json:
-                for pin in page_json:
-                    item_data = {
-                        "sub_dir": kwargs.get("board_title", ""),
-                        "name": str(pin["pin_id"]),
-                        "size": (pin["file"]["width"], pin["file"]["height"]),
-                        "item_url": get_pin_url(pin),
-                        "item_index_reset": index_start_flag,
-                    }
-                    yield item_data
-
-                    if index_start_flag:
-                        index_start_flag = False
+        for page_json in self.paginate(fetch, next_pin_id, key=url):     # 用户画板页面中逐个画板翻页
+            for pin in page_json:
+                item_data = {
+                    "sub_dir": kwargs.get("board_title", ""),
+                    "name": str(pin["pin_id"]),
+                    "size": (pin["file"]["width"], pin["file"]["height"]),
+                    "item_url": get_pin_url(pin),
+                    "item_index_reset": index_start_flag,
+                }
+                yield item_data
 
-                _max = page_json[-1]["pin_id"]
-            else:
-                break
+                if index_start_flag:
+                    index_start_flag = False
 
     def parse_pin(self, response):
         """
@@ -185,32 +184,24 @@ class Parser(BaseParser):
         yield item_data
 
         related_url = url + "/recommendweb"
-        load_max = 0
-        while True:
-            # 退出条件
-            load_max += 1
-            if load_max > self.loop_max:
-                break
 
-            params = {"page": load_max, "per_page": 20}
-            response = self.request("GET", related_url, headers=self.get_json_headers(), params=params)
+        def fetch(page):
+            params = {"page": page, "per_page": 20}
+            return self.request("GET", related_url, headers=self.get_json_headers(), params=params).json()['pins']
 
-            page_json = response.json()['pins']
-            if page_json:
-                for pin in page_json:
-                    item_data = {
-                        "sub_dir": "related-类似图片",
-                        "name": str(pin["pin_id"]),
-                        "size": (pin["file"]["width"], pin["file"]["height"]),
-                        "item_url": get_pin_url(pin),
-                        "item_index_reset": index_start_flag,
-                    }
-                    yield item_data
+        for page_json in self.paginate(fetch, next_page, cursor=1, max_pages=self.loop_max):
+            for pin in page_json:
+                item_data = {
+                    "sub_dir": "related-类似图片",
+                    "name": str(pin["pin_id"]),
+                    "size": (pin["file"]["width"], pin["file"]["height"]),
+                    "item_url": get_pin_url(pin),
+                    "item_index_reset": index_start_flag,
+                }
+                yield item_data
 
-                    if index_start_flag:
-                        index_start_flag = False
-            else:
-                break
+                if index_start_flag:
+                    index_start_flag = False
 
     def parse_search(self, response):
         """花瓣Search页面解析"""
@@ -264,13 +255,7 @@ class Parser(BaseParser):
         color = query_dict.get("color")
         file_type = query_dict.get("file_type")
 
-        cur_page = 0
-        while True:
-            # 退出条件
-            cur_page += 1
-            if cur_page > self.loop_max:
-                break
-
+        def fetch(cur_page):
             params = {"q": query,
                       "sort": sort,
                       "colors": color,
@@ -278,18 +263,16 @@ class Parser(BaseParser):
                       "file_type": file_type,
                       "per_page": 20,
                       "page": cur_page}
-            response = self.request("GET", url, headers=self.get_json_headers(), params=params)
-            page_json = response.json()['pins']
-            if page_json:
-                for pin in page_json:
-                    item_data = {
-                        "name": str(pin["pin_id"]),
-                        "size": (pin["file"]["width"], pin["file"]["height"]),
-                        "item_url": get_pin_url(pin),
-                    }
-                    yield item_data
-            else:
-                break
+            return self.request("GET", url, headers=self.get_json_headers(), params=params).json()['pins']
+
+        for page_json in self.paginate(fetch, next_page, cursor=1, max_pages=self.loop_max):
+            for pin in page_json:
+                item_data = {
+                    "name": str(pin["pin_id"]),
+                    "size": (pin["file"]["width"], pin["file"]["height"]),
+                    "item_url": get_pin_url(pin),
+                }
+                yield item_data
 
     def parse_common(self, response):
         """
@@ -337,33 +320,26 @@ class Parser(BaseParser):
         else:
             source_url = self.url_parser.get_path()
         url = API_URL + source_url
-        _max = None
-
-        load_max = 0
-        while True:
-            # 退出条件
-            load_max += 1
-            if load_max > self.loop_max:
-                break
 
+        def fetch(_max):
             params = {"limit": 20, "max": _max}
-            response = self.request("GET", url, headers=self.get_json_headers(), params=params)
-            page_json = response.json()['pins']
-            if page_json:
-                for pin in page_json:
-                    item_data = {
-                        "name": str(pin["pin_id"]),
-                        "size": (pin["file"]["width"], pin["file"]["height"]),
-                        "item_url": get_pin_url(pin),
-                    }
-                    yield item_data
+            return self.request("GET", url, headers=self.get_json_headers(), params=params).json()['pins']
 
-                if name == "follow":  # discovery|follow 页面请求参数"max"数据不同
-                    _max = str(page_json[-1]["created_at"]) + str(page_json[-1]["file_id"])
-                else:
-                    _max = page_json[-1]["pin_id"]
-            else:
-                break
+        def next_max(page_json, _max):
+            if not page_json:
+                return None
+            if name == "follow":  # discovery|follow 页面请求参数"max"数据不同
+                return str(page_json[-1]["created_at"]) + str(page_json[-1]["file_id"])
+            return page_json[-1]["pin_id"]
+
+        for page_json in self.paginate(fetch, next_max, max_pages=self.loop_max):
+            for pin in page_json:
+                item_data = {
+                    "name": str(pin["pin_id"]),
+                    "size": (pin["file"]["width"], pin["file"]["height"]),
+                    "item_url": get_pin_url(pin),
+                }
+                yield item_data
 
     def parse_user_boards(self, response):
         """
@@ -402,21 +378,19 @@ class Parser(BaseParser):
         用户画板页面解析
         """
         url = API_URL + f"/{urlname}/boards"
-        _max = None
 
-        while True:
+        def fetch(_max):
             params = {"max": _max, "limit": 30, "order_by_updated": 0}
-            response = self.request("GET", url, headers=self.get_json_headers(), params=params)
-            page_json = response.json()['boards']
+            return self.request("GET", url, headers=self.get_json_headers(), params=params).json()['boards']
 
-            if page_json:
-                for board in page_json:
-                    board_id = board["board_id"]
-                    board_url = BOARD_URL.format(_id=board_id)
-                    yield from self.parse_board_v2(board_url=board_url, board_title=board["title"])
-                _max = page_json[-1]["board_id"]
-            else:
-                break
+        def next_board_id(page_json, _max):
+            return page_json[-1]["board_id"] if page_json else None
+
+        for page_json in self.paginate(fetch, next_board_id):
+            for board in page_json:
+                board_id = board["board_id"]
+                board_url = BOARD_URL.format(_id=board_id)
+                yield from self.parse_board_v2(board_url=board_url, board_title=board["title"])
 
     def parse_user_pins(self, response):
         """
@@ -459,24 +433,19 @@ class Parser(BaseParser):
         用户采集页面解析
         """
         url = API_URL + f"/{urlname}/pins"
-        _max = None
 
-        while True:
+        def fetch(_max):
             params = {"max": _max, "limit": 30}
-            response = self.request("GET", url, headers=self.get_json_headers(), params=params)
-            page_json = response.json()['pins']
+            return self.request("GET", url, headers=self.get_json_headers(), params=params).json()['pins']
 
-            if page_json:
-                for pin in page_json:
-                    item_data = {
-                        "name": str(pin["pin_id"]),
-                        "item_url": get_pin_url(pin),
-                        "size": (pin["file"]["width"], pin["file"]["height"]),
-                    }
-                    yield item_data
-                _max = page_json[-1]["pin_id"]
-            else:
-                break
+        for page_json in self.paginate(fetch, next_pin_id):
+            for pin in page_json:
+                item_data = {
+                    "name": str(pin["pin_id"]),
+                    "item_url": get_pin_url(pin),
+                    "size": (pin["file"]["width"], pin["file"]["height"]),
+                }
+                yield item_data
 
     def route(self, *args, **kwargs):
         html = kwargs.get("html")
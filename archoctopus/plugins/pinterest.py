@@ -66,6 +66,14 @@ def build_get_params(options, source_url="/", context=None):
     return params
 
 
+def next_bookmarks(page: tuple, _cursor: list) -> [list, None]:
+    """翻页游标: 本页不为空且未到末尾('-end-')时返回下一页的bookmarks"""
+    bookmarks, result = page
+    if not result or not bookmarks or bookmarks[0] == '-end-':
+        return None
+    return bookmarks
+
+
 def build_post_params(options, source_url="/", context=None):
     """
     合成POST请求参数
@@ -93,6 +101,31 @@ class Parser(BaseParser):
         is_auth = self.session.cookies.get("_auth", ".pinterest.com")
         self.is_auth = True if is_auth == "1" else False
 
+    def resource_pages(self, resource, options, source_url, bookmarks=None, results=False, max_pages=None):
+        """
+        按bookmarks翻页请求资源接口, 下一页在后台预取
+        :param resource: 资源接口地址
+        :param options: 请求参数, bookmarks由翻页游标填充
+        :param source_url: 来源页面路径
+        :param bookmarks: 第一页的bookmarks
+        :param results: 结果在data["results"]中(搜索类接口)
+        :param max_pages: 最多请求页数
+        :return: 生成器 yield 每页结果列表
+        """
+        if bookmarks and bookmarks[0] == '-end-':
+            return
+
+        def fetch(cursor):
+            params = build_get_params(options=dict(options, bookmarks=cursor), source_url=source_url)
+            resp = self.request("GET", resource, headers=self.get_json_headers(), params=params).json()
+            data = resp['resource_response']['data']
+            return resp['resource']['options']['bookmarks'], data["results"] if results else data
+
+        # 用户画板页面中逐个画板翻页时source_url不同, 作为游标记录的键
+        for _bookmarks, result in self.paginate(fetch, next_bookmarks, cursor=bookmarks or [], max_pages=max_pages,
+                                                key=f"{resource}:{source_url}"):
+            yield result
+
     def parse_home(self, response):
         """
         首页解析
@@ -126,43 +159,24 @@ class Parser(BaseParser):
                 yield item_data
 
         source_url = self.url_parser.get_path()
-
-        load_max = 0
-        while True:
-            # 退出条件
-            load_max += 1
-            if load_max > self.loop_max:
-                break
-            if bookmarks and bookmarks[0] == '-end-':
-                break
-
-            options = {
-                "field_set_key": "hf_grid",
-                "in_nux": False,
-                "in_news_hub": False,
-                "prependPartner": False,
-                "static_feed": False,
-                "bookmarks": bookmarks,
-                "no_fetch_context_on_resource": False
-            }
-            params = build_get_params(options=options, source_url=source_url)
-            req = self.request("GET", USER_HOME_FEED_RESOURCE, headers=self.get_json_headers(), params=params)
-            resp = req.json()
-            bookmarks = resp['resource']['options']['bookmarks']
-            result = resp['resource_response']['data']
-
-            # 循环退出条件
-            if result:
-                for pin in result:
-                    if pin["type"] == "pin" and pin["ad_match_reason"] == 0:  # 避免广告pin
-                        item_data = {
-                            "sub_dir": "",
-                            "item_url": pin["images"]["orig"]["url"],
-                            "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"])
-                        }
-                        yield item_data
-            else:
-                break
+        options = {
+            "field_set_key": "hf_grid",
+            "in_nux": False,
+            "in_news_hub": False,
+            "prependPartner": False,
+            "static_feed": False,
+            "no_fetch_context_on_resource": False
+        }
+        for result in self.resource_pages(USER_HOME_FEED_RESOURCE, options, source_url,
+                                          bookmarks=bookmarks, max_pages=self.loop_max):
+            for pin in result:
+                if pin["type"] == "pin" and pin["ad_match_reason"] == 0:  # 避免广告pin
+                    item_data = {
+                        "sub_dir": "",
+                        "item_url": pin["images"]["orig"]["url"],
+                        "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"])
+                    }
+                    yield item_data
 
     def parse_pin(self, response):
         """
@@ -196,75 +210,52 @@ class Parser(BaseParser):
         yield item_data
 
         source_url = self.url_parser.get_path()
-        bookmarks = []
-
-        load_max = 0
-        while True:
-            load_max += 1
-            if load_max > self.loop_max:
-                break
-            if bookmarks and bookmarks[0] == '-end-':
-                break
-
-            # 根据登录状态请求的api
-            # 登录状态 - RELATED_MODULES_RESOURCE
-            # 匿名状态 - RELATED_PIN_FEED_RESOURCE
-            if self.is_auth:
-                options = {
-                    "pin_id": pin_id,
-                    "context_pin_ids": [],
-                    "search_query": "",
-                    "source": "deep_linking",
-                    "top_level_source": "deep_linking",
-                    "top_level_source_depth": 1,
-                    "is_pdp": False,
-                    "bookmarks": bookmarks,
-                    "no_fetch_context_on_resource": False
-                }
-                params = build_get_params(options=options, source_url=source_url)
-                req = self.request("GET", RELATED_MODULES_RESOURCE, headers=self.get_json_headers(), params=params)
-            else:
-                options = {
-                    "field_set_key": "unauth_react",
-                    "page_size": 12,
-                    "pin": pin_id,
-                    "prepend": False,
-                    "add_vase": True,
-                    "show_seo_canonical_pins": True,
-                    "source": "unknown",
-                    "top_level_source": "unknown",
-                    "top_level_source_depth": 1,
-                    "bookmarks": bookmarks,
-                }
-                params = build_get_params(options=options, source_url=source_url)
-                req = self.request("GET", RELATED_PIN_FEED_RESOURCE, headers=self.get_json_headers(), params=params)
-            resp = req.json()
 
-            # # 调试片段
-            # with open("..\\debug\\pinterest_login.json", 'w', encoding="utf-8") as f:
-            #     f.write(str(resp))
-
-            bookmarks = resp['resource']['options']['bookmarks']
-            result = resp['resource_response']['data']
-            # 循环退出条件
-            if result:
-                for pin in result:
-                    # 避免广告pin
-                    # RELATED_MODULES_RESOURCE -> 'ad_match_reason'键 [0/"None"]
-                    # RELATED_PIN_FEED_RESOURCE -> 无'ad_match_reason'键
-                    if pin["type"] == "pin" and pin.get("ad_match_reason", 0) == 0:
-                        item_data = {
-                            "sub_dir": "related-类似图片",
-                            "item_url": pin["images"]["orig"]["url"],
-                            "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
-                            "item_index_reset": index_start_flag,
-                        }
-                        yield item_data
-
-                        if index_start_flag:
-                            index_start_flag = False
-            else:
-                break
+        # 根据登录状态请求的api
+        # 登录状态 - RELATED_MODULES_RESOURCE
+        # 匿名状态 - RELATED_PIN_FEED_RESOURCE
+        if self.is_auth:
+            resource = RELATED_MODULES_RESOURCE
+            options = {
+                "pin_id": pin_id,
+                "context_pin_ids": [],
+                "search_query": "",
+                "source": "deep_linking",
+                "top_level_source": "deep_linking",
+                "top_level_source_depth": 1,
+                "is_pdp": False,
+                "no_fetch_context_on_resource": False
+            }
+        else:
+            resource = RELATED_PIN_FEED_RESOURCE
+            options = {
+                "field_set_key": "unauth_react",
+                "page_size": 12,
+                "pin": pin_id,
+                "prepend": False,
+                "add_vase": True,
+                "show_seo_canonical_pins": True,
+                "source": "unknown",
+                "top_level_source": "unknown",
+                "top_level_source_depth": 1,
+            }
+
+        for result in self.resource_pages(resource, options, source_url, max_pages=self.loop_max):
+            for pin in result:
+                # 避免广告pin
+                # RELATED_MODULES_RESOURCE -> 'ad_match_reason'键 [0/"None"]
+                # RELATED_PIN_FEED_RESOURCE -> 无'ad_match_reason'键
+                if pin["type"] == "pin" and pin.get("ad_match_reason", 0) == 0:
+                    item_data = {
+                        "sub_dir": "related-类似图片",
+                        "item_url": pin["images"]["orig"]["url"],
+                        "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
+                        "item_index_reset": index_start_flag,
+                    }
+                    yield item_data
+
+                    if index_start_flag:
+                        index_start_flag = False
 
     def parse_visual_search(self, response):
         """
@@ -315,45 +306,27 @@ class Parser(BaseParser):
         crop_h = h / height
         pin_id = re.search("/pin/(\\d+)/?", self.url).group(1)
 
-        bookmarks = []
-        load_max = 0
-        while True:
-            # 循环退出条件
-            load_max += 1
-            if load_max > self.loop_max:
-                break
-            if bookmarks and bookmarks[0] == '-end-':
-                break
-            options = {
-                "pin_id": pin_id,
-                "image_signature": image_signature,
-                "crop": {"x": crop_x, "y": crop_y, "w": crop_w, "h": crop_h},
-                "crop_source": crop_source,
-                "bookmarks": bookmarks,
-                "no_fetch_context_on_resource": False
-            }
-            params = build_get_params(options=options, source_url=source_url)
-            req = self.request("GET", VISUAL_LIVE_SEARCH_RESOURCE, headers=self.get_json_headers(), params=params)
-            self.logger.debug("visual_url: %s", req.url)
-            resp = req.json()
-            bookmarks = resp['resource']['options']['bookmarks']
-            result = resp['resource_response']['data']["results"]
-            # 循环退出条件
-            if result:
-                for pin in result:
-                    if pin["type"] == "pin" and pin["ad_match_reason"] == 0:  # 避免广告pin
-                        item_data = {
-                            "sub_dir": "related-视觉化搜索",
-                            "item_url": pin["images"]["orig"]["url"],
-                            "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
-                            "item_index_reset": index_start_flag,
-                        }
-                        yield item_data
-
-                        if index_start_flag:
-                            index_start_flag = False
-            else:
-                break
+        options = {
+            "pin_id": pin_id,
+            "image_signature": image_signature,
+            "crop": {"x": crop_x, "y": crop_y, "w": crop_w, "h": crop_h},
+            "crop_source": crop_source,
+            "no_fetch_context_on_resource": False
+        }
+        for result in self.resource_pages(VISUAL_LIVE_SEARCH_RESOURCE, options, source_url,
+                                          results=True, max_pages=self.loop_max):
+            for pin in result:
+                if pin["type"] == "pin" and pin["ad_match_reason"] == 0:  # 避免广告pin
+                    item_data = {
+                        "sub_dir": "related-视觉化搜索",
+                        "item_url": pin["images"]["orig"]["url"],
+                        "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
+                        "item_index_reset": index_start_flag,
+                    }
+                    yield item_data
+
+                    if index_start_flag:
+                        index_start_flag = False
 
     def parse_search_pins(self):
         """
@@ -367,51 +340,29 @@ class Parser(BaseParser):
         query = query_dict.get("q")
         source_url = self.url_parser.get_source_url()
 
-        bookmarks = []
-        load_max = 0
-        while True:
-            # 循环退出条件
-            load_max += 1
-            if load_max > self.loop_max:
-                break
-            if bookmarks and bookmarks[0] == '-end-':
-                break
-
-            options = {
-                "appliedProductFilters": "---",
-                "auto_correction_disabled": False,
-                "query": query,
-                "redux_normalize_feed": True,
-                "rs": "rs",
-                "scope": scope,
-                "bookmarks": bookmarks,
-                "no_fetch_context_on_resource": False
-            }
-            params = build_get_params(options=options, source_url=source_url)
-            req = self.request("GET", BASE_SEARCH_RESOURCE, headers=self.get_json_headers(), params=params)
-            resp = req.json()
-
-            # with open(f"pinterest_{load_max}.json", "w", encoding="utf-8") as f:
-            #     json.dump(resp, f)
-
-            bookmarks = resp['resource']['options']['bookmarks']
-            result = resp['resource_response']['data']['results']
-            # 循环退出条件
-            if result:
-                for pin in result:
-                    if pin["type"] == "pin" and pin["ad_match_reason"] == 0:  # 避免广告pin
-                        item_data = {
-                            "sub_dir": "",
-                            "item_url": pin["images"]["orig"]["url"],
-                            "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
-                            "item_index_reset": index_start_flag,
-                        }
-                        yield item_data
-
-                        if index_start_flag:
-                            index_start_flag = False
-            else:
-                break
+        options = {
+            "appliedProductFilters": "---",
+            "auto_correction_disabled": False,
+            "query": query,
+            "redux_normalize_feed": True,
+            "rs": "rs",
+            "scope": scope,
+            "no_fetch_context_on_resource": False
+        }
+        for result in self.resource_pages(BASE_SEARCH_RESOURCE, options, source_url,
+                                          results=True, max_pages=self.loop_max):
+            for pin in result:
+                if pin["type"] == "pin" and pin["ad_match_reason"] == 0:  # 避免广告pin
+                    item_data = {
+                        "sub_dir": "",
+                        "item_url": pin["images"]["orig"]["url"],
+                        "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
+                        "item_index_reset": index_start_flag,
+                    }
+                    yield item_data
+
+                    if index_start_flag:
+                        index_start_flag = False
 
     def parse_search_mypins(self):
         """
@@ -425,47 +376,29 @@ class Parser(BaseParser):
         query = query_dict.get("q")
         source_url = self.url_parser.get_source_url()
 
-        bookmarks = []
-        while True:
-            # 循环退出条件, 此分类不做循环限制.
-            if bookmarks and bookmarks[0] == '-end-':
-                break
-
-            options = {
-                "appliedProductFilters": "---",
-                "auto_correction_disabled": False,
-                "query": query,
-                "redux_normalize_feed": True,
-                "rs": "ac",
-                "scope": scope,
-                "bookmarks": bookmarks,
-                "no_fetch_context_on_resource": False
-            }
-            params = build_get_params(options=options, source_url=source_url)
-            req = self.request("GET", BASE_SEARCH_RESOURCE, headers=self.get_json_headers(), params=params)
-            resp = req.json()
-
-            # with open(f"pinterest_{load_max}.json", "w", encoding="utf-8") as f:
-            #     json.dump(resp, f)
-
-            bookmarks = resp['resource']['options']['bookmarks']
-            result = resp['resource_response']['data']['results']
-            # 循环退出条件
-            if result:
-                for pin in result:
-                    if pin["type"] == "pin" and pin["ad_match_reason"] == 0:  # 避免广告pin
-                        item_data = {
-                            "sub_dir": "",
-                            "item_url": pin["images"]["orig"]["url"],
-                            "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
-                            "item_index_reset": index_start_flag,
-                        }
-                        yield item_data
-
-                        if index_start_flag:
-                            index_start_flag = False
-            else:
-                break
+        options = {
+            "appliedProductFilters": "---",
+            "auto_correction_disabled": False,
+            "query": query,
+            "redux_normalize_feed": True,
+            "rs": "ac",
+            "scope": scope,
+            "no_fetch_context_on_resource": False
+        }
+        # 此分类不做循环限制.
+        for result in self.resource_pages(BASE_SEARCH_RESOURCE, options, source_url, results=True):
+            for pin in result:
+                if pin["type"] == "pin" and pin["ad_match_reason"] == 0:  # 避免广告pin
+                    item_data = {
+                        "sub_dir": "",
+                        "item_url": pin["images"]["orig"]["url"],
+                        "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
+                        "item_index_reset": index_start_flag,
+                    }
+                    yield item_data
+
+                    if index_start_flag:
+                        index_start_flag = False
 
     def parse_board(self, **kwargs):
         """
@@ -490,42 +423,31 @@ class Parser(BaseParser):
             board_id = resp['resource_response']['data']["id"]
 
         sub_dir = kwargs.get("title", "")
-        bookmarks = []
-        while True:
-            options = {
-                "board_id": board_id,
-                "board_url": source_url,
-                "currentFilter": -1,
-                "field_set_key": "react_grid_pin",
-                "filter_section_pins": True,
-                "sort": "default",
-                "layout": "default",
-                "page_size": 25,
-                "redux_normalize_feed": True,
-                "bookmarks": bookmarks,
-                "no_fetch_context_on_resource": False,
-            }
-            params = build_get_params(options=options, source_url=source_url)
-            req = self.request("GET", BOARD_FEED_RESOURCE, headers=self.get_json_headers(), params=params)
-            resp = req.json()
-            bookmarks = resp['resource']['options']['bookmarks']
-            result = resp['resource_response']['data']
-            # 循环退出条件
-            if result:
-                for pin in result:
-                    if pin["type"] == "pin":  # 避免广告pin
-                        item_data = {
-                            "sub_dir": sub_dir,
-                            "item_url": pin["images"]["orig"]["url"],
-                            "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
-                            "item_index_reset": index_start_flag,
-                        }
-                        yield item_data
-
-                        if index_start_flag:
-                            index_start_flag = False
-            else:
-                break
+        options = {
+            "board_id": board_id,
+            "board_url": source_url,
+            "currentFilter": -1,
+            "field_set_key": "react_grid_pin",
+            "filter_section_pins": True,
+            "sort": "default",
+            "layout": "default",
+            "page_size": 25,
+            "redux_normalize_feed": True,
+            "no_fetch_context_on_resource": False,
+        }
+        for result in self.resource_pages(BOARD_FEED_RESOURCE, options, source_url):
+            for pin in result:
+                if pin["type"] == "pin":  # 避免广告pin
+                    item_data = {
+                        "sub_dir": sub_dir,
+                        "item_url": pin["images"]["orig"]["url"],
+                        "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
+                        "item_index_reset": index_start_flag,
+                    }
+                    yield item_data
+
+                    if index_start_flag:
+                        index_start_flag = False
 
     def parse_people_saved(self):
         """
@@ -535,38 +457,25 @@ class Parser(BaseParser):
         source_url = self.url_parser.get_path()
         username = self.url_parser.get_path_list()[0]
 
-        bookmarks = []
-        while True:
-            if bookmarks and bookmarks[0] == '-end-':
-                break
-            options = {
-                "privacy_filter": "all",
-                "sort": "last_pinned_to",
-                "field_set_key": "profile_grid_item",
-                "filter_stories": False,
-                "username": username,
-                "page_size": 25,
-                "group_by": "visibility",
-                "include_archived": True,
-                "redux_normalize_feed": True,
-                "bookmarks": bookmarks,
-                "no_fetch_context_on_resource": False
-            }
-            params = build_get_params(options=options, source_url=source_url)
-            req = self.request("GET", BOARDS_RESOURCE, headers=self.get_json_headers(), params=params)
-            resp = req.json()
-            bookmarks = resp['resource']['options']['bookmarks']
-            result = resp['resource_response']['data']
-            # 循环退出条件
-            if result:
-                for board in result:
-                    if board["type"] == "board":  # 排除首个"所有釘圖"画板type=story
-                        yield from self.parse_board(id=board["id"],
-                                                    url=board["url"],
-                                                    title=self.cleanup(board["name"]))
-            else:
-                # TODO 当第一次请求为空时，存在未保存到任何画板的图片时 - BoardlessPinsResource
-                break
+        options = {
+            "privacy_filter": "all",
+            "sort": "last_pinned_to",
+            "field_set_key": "profile_grid_item",
+            "filter_stories": False,
+            "username": username,
+            "page_size": 25,
+            "group_by": "visibility",
+            "include_archived": True,
+            "redux_normalize_feed": True,
+            "no_fetch_context_on_resource": False
+        }
+        # TODO 当第一次请求为空时，存在未保存到任何画板的图片时 - BoardlessPinsResource
+        for result in self.resource_pages(BOARDS_RESOURCE, options, source_url):
+            for board in result:
+                if board["type"] == "board":  # 排除首个"所有釘圖"画板type=story
+                    yield from self.parse_board(id=board["id"],
+                                                url=board["url"],
+                                                title=self.cleanup(board["name"]))
 
     def parse_boardless(self):
         """
@@ -597,43 +506,29 @@ class Parser(BaseParser):
 
         user_id = resp["resource_response"]["data"]["id"]
 
-        bookmarks = []
-        while True:
-            if bookmarks and bookmarks[0] == '-end-':
-                break
-
-            options = {
-                "data": {"filter_version": 1},
-                "exclude_add_pin_rep": True,
-                "field_set_key": "grid_item",
-                "is_own_profile_pins": False,
-                "redux_normalize_feed": True,
-                "user_id": user_id,
-                "username": username,
-                "bookmarks": bookmarks,
-                "no_fetch_context_on_resource": False
-            }
-            params = build_get_params(options=options, source_url=source_url)
-            req = self.request("GET", USER_ACTIVITY_PINS_RESOURCE, headers=self.get_json_headers(), params=params)
-            resp = req.json()
-            bookmarks = resp['resource']['options']['bookmarks']
-            result = resp['resource_response']['data']
-            # 循环退出条件
-            if result:
-                for pin in result:
-                    if pin["type"] == "pin":  # 避免广告pin
-                        item_data = {
-                            "sub_dir": "",
-                            "item_url": pin["images"]["orig"]["url"],
-                            "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
-                            "item_index_reset": index_start_flag,
-                        }
-                        yield item_data
-
-                        if index_start_flag:
-                            index_start_flag = False
-            else:
-                break
+        options = {
+            "data": {"filter_version": 1},
+            "exclude_add_pin_rep": True,
+            "field_set_key": "grid_item",
+            "is_own_profile_pins": False,
+            "redux_normalize_feed": True,
+            "user_id": user_id,
+            "username": username,
+            "no_fetch_context_on_resource": False
+        }
+        for result in self.resource_pages(USER_ACTIVITY_PINS_RESOURCE, options, source_url):
+            for pin in result:
+                if pin["type"] == "pin":  # 避免广告pin
+                    item_data = {
+                        "sub_dir": "",
+                        "item_url": pin["images"]["orig"]["url"],
+                        "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
+                        "item_index_reset": index_start_flag,
+                    }
+                    yield item_data
+
+                    if index_start_flag:
+                        index_start_flag = False
 
     def parse_section(self, response):
         """
@@ -655,43 +550,28 @@ class Parser(BaseParser):
         section_id = section_data["id"]
         source_url = self.url_parser.get_path()
 
-        bookmarks = []
-        while True:
-            if bookmarks and bookmarks[0] == '-end-':
-                break
-
-            options = {
-                "currentFilter": -1,
-                "field_set_key": "react_grid_pin",
-                "is_own_profile_pins": True,
-                "page_size": 25,
-                "redux_normalize_feed": True,
-                "section_id": section_id,
-                "bookmarks": bookmarks,
-                "no_fetch_context_on_resource": False
-            }
-
-            params = build_get_params(options=options, source_url=source_url)
-            req = self.request("GET", BOARD_SECTION_PINS_RESOURCE, headers=self.get_json_headers(), params=params)
-            resp = req.json()
-            bookmarks = resp['resource']['options']['bookmarks']
-            result = resp['resource_response']['data']
-            # 循环退出条件
-            if result:
-                for pin in result:
-                    if pin["type"] == "pin":  # 避免广告pin
-                        item_data = {
-                            "sub_dir": "",
-                            "item_url": pin["images"]["orig"]["url"],
-                            "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
-                            "item_index_reset": index_start_flag,
-                        }
-                        yield item_data
-
-                        if index_start_flag:
-                            index_start_flag = False
-            else:
-                break
+        options = {
+            "currentFilter": -1,
+            "field_set_key": "react_grid_pin",
+            "is_own_profile_pins": True,
+            "page_size": 25,
+            "redux_normalize_feed": True,
+            "section_id": section_id,
+            "no_fetch_context_on_resource": False
+        }
+        for result in self.resource_pages(BOARD_SECTION_PINS_RESOURCE, options, source_url):
+            for pin in result:
+                if pin["type"] == "pin":  # 避免广告pin
+                    item_data = {
+                        "sub_dir": "",
+                        "item_url": pin["images"]["orig"]["url"],
+                        "size": (pin["images"]["orig"]["width"], pin["images"]["orig"]["height"]),
+                        "item_index_reset": index_start_flag,
+                    }
+                    yield item_data
+
+                    if index_start_flag:
+                        index_start_flag = False
 
     def route(self, *args, **kwargs) -> [typing.Callable, None]:
         # 分类判断
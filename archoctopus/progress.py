@@ -0,0 +1,111 @@
+"""
+ArchOctopus 下载进度模块
+    TaskProgress -- 单个任务的下载进度
+    ProgressAggregator -- 全局进度汇总线程
+
+下载线程(协程)完成一个条目后只在TaskProgress中登记结果, 不再为每个条目发送事件;
+汇总线程每PROGRESS_INTERVAL秒将各任务新增的结果批量写入数据库(urls.status及history.download_count),
+并为进度有变化的任务面板合并发送一次刷新(call_refresh_gauge), GUI线程的刷新频率与下载线程数及图片大小无关.
+"""
+
+import time
+import threading
+import logging
+
+from archoctopus.constants import APP_NAME
+from archoctopus.core import get_context
+
+PROGRESS_INTERVAL = 0.1     # 刷新间隔(秒): 每个任务面板每秒最多刷新10次
+
+logger = logging.getLogger(APP_NAME)
+
+
+class TaskProgress:
+    """
+    单个任务的下载进度
+    add在下载线程(协程)中调用; flush由汇总线程定期调用, 下载线程退出前也会调用一次, 保证进度在call_thread_done之前送达.
+    """
+
+    def __init__(self, window, journal, base: int = 0):
+        self.window = window        # 任务面板
+        self.journal = journal      # 任务进度记录(TaskJournal)
+        self.base = base            # 本次运行前已完成的条目数(继续任务时)
+        self.count = 0              # 本次运行已完成的条目数
+        self.rows = []              # 尚未写入数据库的下载结果: [(url, prop), ...]
+        self.reported = 0           # 已通知任务面板的条目数
+        self.saved_bytes = 0        # 本次运行中图片库节省的字节数(下载前命中及下载后内容去重)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()     # 保证多个线程flush时面板刷新按顺序发送
+
+    def add(self, url: str, prop: [tuple, None]):
+        """登记条目下载结果"""
+        with self._lock:
+            self.rows.append((url, prop))
+            self.count += 1
+
+    def add_saved(self, saved: int):
+        """登记图片库节省的字节数"""
+        with self._lock:
+            self.saved_bytes += saved
+
+    def flush(self):
+        """批量写入新增的下载结果, 进度有变化时通知任务面板"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self.rows = self.rows, []
+                count = self.count
+            if rows:
+                self.journal.complete_many(rows, download_count=self.base + count)
+            if count != self.reported:
+                self.reported = count
+                get_context().events.post(self.window.call_refresh_gauge, self.base + count)
+
+
+class ProgressAggregator(threading.Thread):
+    """
+    全局进度汇总线程
+    整个应用只运行一个, 没有运行中的任务时等待.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL):
+        super(ProgressAggregator, self).__init__(name="progress_aggregator")
+        self.setDaemon(True)
+        self.interval = interval
+        self.tasks = []
+        self._cond = threading.Condition()
+
+    @classmethod
+    def instance(cls):
+        """获取(必要时启动)全局唯一的汇总线程"""
+        with cls._lock:
+            if cls._instance is None or not cls._instance.is_alive():
+                cls._instance = cls()
+                cls._instance.start()
+        return cls._instance
+
+    def register(self, progress: TaskProgress):
+        with self._cond:
+            if progress not in self.tasks:
+                self.tasks.append(progress)
+            self._cond.notify()
+
+    def unregister(self, progress: TaskProgress):
+        """任务结束(各下载线程退出前已送出剩余的进度)"""
+        with self._cond:
+            if progress in self.tasks:
+                self.tasks.remove(progress)
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self.tasks:
+                    self._cond.wait()
+                tasks = list(self.tasks)
+            for progress in tasks:
+                try:
+                    progress.flush()
+                except Exception as e:
+                    logger.error("下载进度更新失败: %s", e)
+            time.sleep(self.interval)
@@ -0,0 +1,232 @@
+"""
+ArchOctopus 分段下载模块
+    SegmentedDownload -- 大文件多连接分段下载
+    PartsJournal -- 分段下载进度记录(.parts文件)
+
+服务端支持Range请求(Accept-Ranges: bytes)且文件大小超过阈值时, 将文件分为N段, 每段使用一个连接并发下载,
+直接写入预先分配好大小的临时文件的对应位置(os.pwrite, 不支持pwrite的平台使用seek后write).
+每段的已下载字节数定期写入临时文件旁的.parts文件, 程序中断后再次下载时从各段已完成的位置继续;
+续传请求携带If-Range, 服务端文件已变化时返回200, 此时放弃分段记录重新下载.
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+import httpx
+
+from archoctopus.constants import APP_NAME
+from archoctopus.client import RETRY_STATUS_CODES
+from archoctopus.writer import preallocate
+
+SEGMENT_MIN_SIZE = 1024 * 1024      # 每段最小字节数
+JOURNAL_INTERVAL = 1.0              # 进度记录写入间隔(秒)
+
+logger = logging.getLogger(APP_NAME)
+
+
+class SegmentError(Exception):
+    """服务端未按请求返回分段内容(不支持Range或文件已变化), 需要改为单连接下载"""
+
+
+def split_ranges(total: int, count: int) -> list:
+    """
+    将文件平均分段, 每段不小于SEGMENT_MIN_SIZE
+    :return: list[[start, end, written]], end包含在内
+    """
+    count = max(1, min(count, total // SEGMENT_MIN_SIZE))
+    size = total // count
+    return [[i * size, (i + 1) * size - 1 if i < count - 1 else total - 1, 0] for i in range(count)]
+
+
+def segment_total(response, threshold: int) -> [int, None]:
+    """响应满足分段下载条件(200, 支持Range, 未压缩, 大小超过阈值)时返回文件总大小"""
+    if response.status_code != 200 or threshold <= 0:
+        return None
+    if response.headers.get("Accept-Ranges", "").lower() != "bytes":
+        return None
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    length = response.headers.get("Content-Length", "")
+    if not length.isdigit() or int(length) < threshold:
+        return None
+    return int(length)
+
+
+def range_validator(response) -> str:
+    """If-Range使用的校验值: 强ETag优先, 其次为Last-Modified"""
+    etag = response.headers.get("ETag", "")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified", "")
+
+
+class PartsJournal:
+    """
+    分段下载进度记录
+    保存在"临时文件.parts"中: {"url", "total", "validator", "segments": [[start, end, written], ...]}
+    """
+
+    def __init__(self, tmp_file: str, url: str, total: int, validator: str, segments: list):
+        self.tmp_file = tmp_file
+        self.path = tmp_file + ".parts"
+        self.url = url
+        self.total = total
+        self.validator = validator
+        self.segments = segments
+
+    @classmethod
+    def load(cls, tmp_file: str, url: str):
+        """读取上次中断的分段记录, 记录无效时删除并返回None"""
+        path = tmp_file + ".parts"
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            journal = cls(tmp_file, data["url"], data["total"], data["validator"], data["segments"])
+            valid = journal.url == url \
+                and os.path.isfile(tmp_file) and os.path.getsize(tmp_file) == journal.total \
+                and all(0 <= written <= end - start + 1 for start, end, written in journal.segments)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error("分段下载记录读取失败: %s, %s", e, path)
+            valid = False
+        if not valid:
+            os.remove(path)
+            return None
+        logger.debug("继续分段下载: %s, 已完成: %s/%s", url, journal.written, journal.total)
+        return journal
+
+    @classmethod
+    def create(cls, tmp_file: str, url: str, total: int, validator: str, count: int):
+        """新建分段记录并预先分配临时文件"""
+        journal = cls(tmp_file, url, total, validator, split_ranges(total, count))
+        with open(tmp_file, "wb") as f:
+            preallocate(f.fileno(), total)
+        journal.save()
+        return journal
+
+    @property
+    def written(self) -> int:
+        return sum(segment[2] for segment in self.segments)
+
+    def save(self):
+        data = {"url": self.url, "total": self.total, "validator": self.validator, "segments": self.segments}
+        tmp_path = self.path + ".swp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def discard(self):
+        """放弃分段下载: 删除记录及临时文件"""
+        self.remove()
+        if os.path.exists(self.tmp_file):
+            os.remove(self.tmp_file)
+
+
+class SegmentedDownload:
+    """
+    分段下载器
+    每段在独立线程中请求并写入临时文件, 任意一段出错时其余各段停止, 保存进度后抛出异常(由调用方重试);
+    全部完成后删除分段记录.
+    """
+
+    def __init__(self, session, url: str, journal: PartsJournal):
+        self.session = session
+        self.url = url
+        self.journal = journal
+        self._lock = threading.Lock()
+        self._saved = time.monotonic()
+        self._stopped = threading.Event()
+        self.rejected = False       # 文件头不符合过滤条件
+
+    @staticmethod
+    def _write(fd: int, data: bytes, offset: int):
+        view = memoryview(data)
+        while view:
+            if hasattr(os, "pwrite"):
+                written = os.pwrite(fd, view, offset)
+            else:   # windows: 每段使用独立的文件句柄, seek后写入
+                os.lseek(fd, offset, os.SEEK_SET)
+                written = os.write(fd, view)
+            view = view[written:]
+            offset += written
+
+    def _progress(self, segment: list, size: int):
+        with self._lock:
+            segment[2] += size
+            now = time.monotonic()
+            if now - self._saved >= JOURNAL_INTERVAL:
+                self._saved = now
+                self.journal.save()
+
+    def _fetch(self, segment: list, sniffer=None):
+        start, end, written = segment
+        if written > end - start or self._stopped.is_set():
+            return
+        headers = {"Range": f"bytes={start + written}-{end}"}
+        if self.journal.validator:
+            headers["If-Range"] = self.journal.validator
+        with self.session.stream("GET", self.url, headers=headers) as s:
+            if s.status_code in RETRY_STATUS_CODES:
+                s.raise_for_status()    # 交由调用方退避重试
+            content_range = s.headers.get("Content-Range", "")
+            if s.status_code != 206 or not content_range.startswith(f"bytes {start + written}-"):
+                raise SegmentError(f"分段响应错误: {s.status_code}, {content_range}")
+
+            fd = os.open(self.journal.tmp_file, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+            try:
+                for chunk in s.iter_bytes():
+                    if self._stopped.is_set():
+                        return
+                    chunk = chunk[:end - start + 1 - segment[2]]
+                    if not chunk:
+                        continue
+                    if sniffer is not None and sniffer.feed(chunk):
+                        self.rejected = True
+                        self._stopped.set()
+                        return
+                    self._write(fd, chunk, start + segment[2])
+                    self._progress(segment, len(chunk))
+                    if segment[2] > end - start:
+                        break
+            finally:
+                os.close(fd)
+        if segment[2] <= end - start:     # 连接提前结束, 由调用方重试并从记录的位置继续
+            raise httpx.ReadError(f"分段数据不完整: {start}-{end}, {segment[2]}")
+
+    def run(self, sniffer=None) -> bool:
+        """
+        下载全部未完成的分段
+        :param sniffer: 文件头过滤器(HeaderSniffer), 只在第一段从头下载时使用
+        :return: True表示下载完成, False表示文件头不符合过滤条件(已删除临时文件)
+        """
+        pending = [segment for segment in self.journal.segments if segment[2] <= segment[1] - segment[0]]
+        error = None
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                futures = [executor.submit(self._fetch, segment,
+                                           sniffer if segment[0] == 0 and segment[2] == 0 else None)
+                           for segment in pending]
+                done, _not_done = wait(futures, return_when=FIRST_EXCEPTION)
+                if any(future.exception() for future in done):
+                    self._stopped.set()     # 任意一段出错时停止其余各段
+                for future in futures:
+                    exception = future.exception()
+                    if exception is not None and error is None:
+                        error = exception
+        if self.rejected:
+            self.journal.discard()
+            return False
+        if error is not None:
+            self.journal.save()
+            raise error
+        self.journal.remove()
+        return True
@@ -0,0 +1,147 @@
+"""
+ArchOctopus 内容寻址图片库
+    ContentStore -- 按url及文件内容(SHA-256)登记已下载图片
+    materialize -- 在新位置生成已有文件的硬链接/写时复制副本/普通副本
+
+同一张图片经常在不同任务及同步画板中重复出现(如同一pin保存到多个画板, 同一项目被重复收藏).
+下载完成的图片按下载时流式计算的SHA-256登记到blobs表, url登记到blob_urls表:
+1. 下载前按url查询, 已下载过的图片直接在新任务目录中生成链接或副本, 不再请求网络;
+2. 下载后按内容查询, 与已有图片内容相同时把新文件替换为已有文件的链接, 节省磁盘空间.
+blobs.hits记录命中次数, 节省的字节数为 SUM(hits * bytes).
+"""
+
+import os
+import sys
+import shutil
+import hashlib
+import logging
+import typing
+
+from archoctopus.constants import APP_NAME
+
+logger = logging.getLogger(APP_NAME)
+
+FICLONE = 0x40049409    # Linux ioctl: 写时复制克隆文件(btrfs, xfs等)
+
+
+class Blob(typing.NamedTuple):
+    sha256: str
+    path: str
+    bytes: int
+    type: str
+    width: int
+    height: int
+
+
+def file_sha256(file: str, digest=None):
+    """计算文件的SHA-256, 可传入已有的hashlib对象继续计算(断点续传时补算已下载部分)"""
+    digest = digest or hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """写时复制副本, 文件系统不支持时返回False"""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return True
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+    return False
+
+
+def materialize(src: str, dst: str) -> str:
+    """
+    在dst生成src的副本: 依次尝试硬链接, 写时复制副本, 普通复制
+    :return: 使用的方式: link/reflink/copy
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "link"
+    except OSError:     # 跨分区, 文件系统不支持或链接数达到上限
+        pass
+    if _reflink(src, dst):
+        return "reflink"
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+class ContentStore:
+    """内容寻址图片库"""
+
+    def __init__(self, con):
+        self.con = con
+
+    def _valid(self, blob: [tuple, None]) -> [Blob, None]:
+        """已登记的文件被移动, 删除或修改时视为不存在"""
+        if not blob:
+            return None
+        blob = Blob(*blob)
+        if not os.path.isfile(blob.path) or os.path.getsize(blob.path) != blob.bytes:
+            return None
+        return blob
+
+    def get(self, sha256: str) -> [Blob, None]:
+        sql = "SELECT sha256, path, bytes, type, width, height FROM blobs WHERE sha256 = ?"
+        return self._valid(self.con.select_one(sql, (sha256,)))
+
+    def lookup(self, url: str) -> [Blob, None]:
+        """按url查询已下载的图片"""
+        sql = "SELECT blobs.sha256, blobs.path, blobs.bytes, blobs.type, blobs.width, blobs.height " \
+              "FROM blob_urls " \
+              "INNER JOIN blobs ON blob_urls.sha256 = blobs.sha256 " \
+              "WHERE blob_urls.url = ?"
+        return self._valid(self.con.select_one(sql, (url,)))
+
+    def fetch(self, url: str, dst: str) -> [Blob, None]:
+        """url已下载过时在dst生成副本, 代替网络请求"""
+        blob = self.lookup(url)
+        if blob is None:
+            return None
+        try:
+            method = materialize(blob.path, dst)
+        except OSError as e:
+            logger.error("图片库文件复制失败: %s, %s", e, dst)
+            return None
+        self.con.execute("UPDATE blobs SET hits = hits + 1 WHERE sha256 = ?", (blob.sha256,))
+        logger.debug("图片库命中(%s): %s -> %s", method, url, dst)
+        return blob
+
+    def add(self, url: str, sha256: str, file: str, file_type: str = None, size: tuple = (0, 0)) -> int:
+        """
+        登记下载完成的图片
+        内容与已登记的图片相同时, 将file替换为已有文件的链接.
+        :return: 节省的磁盘空间(字节)
+        """
+        saved = 0
+        blob = self.get(sha256)
+        if blob is None:
+            sql = "INSERT OR REPLACE INTO blobs (sha256, path, bytes, type, width, height) VALUES (?, ?, ?, ?, ?, ?)"
+            self.con.execute(sql, (sha256, file, os.path.getsize(file), file_type, *size))
+        elif not os.path.samefile(blob.path, file):
+            tmp_file = file + ".link"
+            try:
+                if materialize(blob.path, tmp_file) == "copy":     # 普通副本不节省空间, 保留新文件
+                    os.remove(tmp_file)
+                else:
+                    os.replace(tmp_file, file)
+                    saved = blob.bytes
+                    self.con.execute("UPDATE blobs SET hits = hits + 1 WHERE sha256 = ?", (sha256,))
+                    logger.debug("图片库内容重复: %s -> %s", file, blob.path)
+            except OSError as e:
+                logger.error("图片库链接失败: %s, %s", e, file)
+        self.con.execute("INSERT OR REPLACE INTO blob_urls (url, sha256) VALUES (?, ?)", (url, sha256))
+        return saved
+
+    def saved_bytes(self) -> int:
+        """图片库节省的下载流量及磁盘空间(字节)"""
+        result = self.con.select_one("SELECT SUM(hits * bytes) FROM blobs")
+        return (result[0] or 0) if result else 0
@@ -8,9 +8,14 @@ AoSync类初始化后自动开始检测指定的账户(_preload方法),判断系
 并获取登录的账户信息,用于同步面板GUI显示信息.
 
 同步启动后由GUI定时执行(默认间隔时间10*60000ms)_parser方法线程, 获取账户的画板、图片等信息.
+各站点在独立线程中并行解析, 站点内的board由线程池(/Sync/board_workers)并发解析, 同一站点的请求共享限速器.
 在解析方法线程启动后延时一段时间(默认间隔60000ms)后, 执行后台下载线程.
+下载线程分批领取待下载条目, 由/Sync/download_workers个下载线程并发下载.
 
 延时执行是为了避免解析线程未完成时, 下载线程没有获取到有效数据推出后, 需要等待一个定时循环的时间.
+
+每个board记录上次完整同步时的条目数, 更新时间和最新条目(sync_boards.sync_*), 未变化的board直接跳过,
+有变化的board翻页到上次的最新条目即停止, 每次同步只请求新增部分.
 """
 
 import re
@@ -22,47 +27,66 @@ from typing import Generator
 import json
 import base64
 import time
+import hashlib
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
-import wx
 from bs4 import BeautifulSoup
-from httpx import Client
 from httpx import ProxyError, HTTPError, StreamError, InvalidURL, CookieConflict
 
 from archoctopus import utils
 from archoctopus import cookies
 
 from archoctopus.database import AoDatabase
+from archoctopus.client import ClientPool, RateLimiter
+from archoctopus.store import ContentStore, file_sha256
+from archoctopus.segment import PartsJournal, SegmentedDownload, SegmentError, segment_total, range_validator
+from archoctopus.writer import ChunkWriter, response_length
 from archoctopus.constants import APP_NAME
-
-
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:58.0) Gecko/20100101 Firefox/58.0',
-}
+from archoctopus.core import get_context
 
 
 class SyncDownload(threading.Thread):
-    """账户同步下载器"""
+    """
+    账户同步下载器
+    按rowid分批领取sync_items中的待下载条目(keyset分页), 由多个下载线程并发下载.
+    下载失败的条目记录失败次数(attempts), 并按指数退避设置下次允许重试的时间(next_try),
+    失败次数达到max_attempts后不再领取.
+    """
+    batch_size = 200            # 每批领取条目数
+    max_attempts = 5            # 最大失败次数
+    backoff_base = 60           # 退避基数(秒): 60, 120, 240...
+    backoff_max = 24 * 3600     # 最大退避时间(秒)
 
     def __init__(self,
                  browser_cookies: CookieJar,
                  con: AoDatabase,
                  running_event: threading.Event,
-                 sync_dir: str):
+                 sync_dir: str,
+                 workers: int = 4,
+                 segments: int = 4,
+                 segment_threshold: int = 8 * 1024 * 1024):
         super(SyncDownload, self).__init__()
 
         self.logger = logging.getLogger(APP_NAME)
         self.con = con
         self.running_event = running_event
         self.sync_dir = sync_dir
-        self.session = Client(headers=HEADERS, cookies=browser_cookies)
-
-    def _download(self, *args):
+        self.workers = max(workers, 1)
+        self.segments = segments    # 大文件分段数(小于2时不分段)
+        self.segment_threshold = segment_threshold
+        self.session = ClientPool.borrow(cookies=browser_cookies)
+        self.store = ContentStore(con)
+        self.work_queue = Queue(maxsize=self.batch_size)    # 有界队列: 下载线程跟不上时暂停领取
+
+    def _download(self, *args, segmented=True):
         """
         下载函数
-        :param path:
-        :param url:
-        :return: tuple(file_type, file_bytes, file_size, tmp_file)
+        :param segmented: 是否允许分段下载
+        :return: dict(type, name)
         """
         board_id, site, raw_name, url, sub_dir, board_name = args
 
@@ -72,48 +96,70 @@ class SyncDownload(threading.Thread):
         else:
             name, suffix = utils.get_name_from_url(url)
         folder = os.path.join(self.sync_dir, site.capitalize(), utils.cleanup(board_name), sub_dir or "")
-        # 创建路径
-        os.makedirs(folder, exist_ok=True)
         tmp_file = os.path.join(folder, name+'.tmp')
-
-        # 判断文件是否已存在
-        is_downloaded_file = utils.is_downloaded(folder, name, suffix=suffix)
-        if is_downloaded_file:
-            self.logger.debug("图片已下载: %s", is_downloaded_file)
-            suffix = ".jpeg" if suffix == ".jpg" else suffix or ".jpeg"
-            result = {"type": suffix, "name": name+suffix}
-            return result
-
-        # 请求响应内容
-        tmp_file_size = utils.get_file_bytes(tmp_file)
-        if tmp_file_size:
-            self.logger.debug('tmp_file length: %s', tmp_file_size)
-            headers = {'Range': f"bytes={tmp_file_size}-"}
-        else:
-            headers = None
         try:
-            with self.session.stream("GET", url, headers=headers) as s:
-                self.logger.info("请求状态 : %s, %s", s.status_code, url)
-                if s.status_code == 200:
-                    mode = "wb"
-                elif s.status_code == 206:
-                    mode = "ab"
-                elif s.status_code == 416:
-                    self.logger.error("416 错误 – 所请求的范围无法满足: %s", url)
-                    os.remove(tmp_file)
-                    return
-                else:
-                    raise ValueError("响应码错误: {}, {}".format(s.status_code, url))
-
-                with open(tmp_file, mode) as f:
-                    for chunk in s.iter_bytes(chunk_size=10240):
-                        if chunk:
-                            f.write(chunk)
-                    f.flush()
-
+            # 创建路径
+            os.makedirs(folder, exist_ok=True)
+
+            # 判断文件是否已存在
+            is_downloaded_file = utils.is_downloaded(folder, name, suffix=suffix)
+            if is_downloaded_file:
+                self.logger.debug("图片已下载: %s", is_downloaded_file)
+                suffix = ".jpeg" if suffix == ".jpg" else suffix or ".jpeg"
+                result = {"type": suffix, "name": name+suffix}
+                return result
+
+            # 请求响应内容
+            # 图片库中已有该url的图片(如同一pin保存到多个画板)时直接生成链接或副本
+            if self.store.fetch(url, tmp_file) is not None:
                 suffix = utils.get_img_format(tmp_file)
                 file_path = re.sub("\\.tmp$", suffix, tmp_file)
-                os.rename(tmp_file, file_path)
+                os.replace(tmp_file, file_path)
+                return {"type": suffix, "name": os.path.basename(file_path)}
+
+            tmp_file_size = utils.get_file_bytes(tmp_file)
+            if tmp_file_size:
+                self.logger.debug('tmp_file length: %s', tmp_file_size)
+                headers = {'Range': f"bytes={tmp_file_size}-"}
+            else:
+                headers = None
+            # 上次中断的分段下载
+            segmented = segmented and self.segments > 1
+            journal = PartsJournal.load(tmp_file, url) if segmented else None
+            if journal is None:
+                with self.session.stream("GET", url, headers=headers) as s:
+                    self.logger.info("请求状态 : %s, %s", s.status_code, url)
+                    if s.status_code == 200:
+                        mode = "wb"
+                    elif s.status_code == 206:
+                        mode = "ab"
+                    elif s.status_code == 416:
+                        self.logger.error("416 错误 – 所请求的范围无法满足: %s", url)
+                        os.remove(tmp_file)
+                        return
+                    else:
+                        raise ValueError("响应码错误: {}, {}".format(s.status_code, url))
+
+                    total = segment_total(s, self.segment_threshold) if segmented else None
+                    if total:   # 大文件: 关闭当前响应, 改为分段下载
+                        journal = PartsJournal.create(tmp_file, url, total, range_validator(s), self.segments)
+                    else:
+                        digest = file_sha256(tmp_file) if mode == "ab" else hashlib.sha256()
+                        with ChunkWriter(tmp_file, mode, length=response_length(s), digest=digest) as writer:
+                            for chunk in s.iter_bytes():
+                                writer.write(chunk)
+            if journal is not None:
+                SegmentedDownload(self.session, url, journal).run()
+                digest = file_sha256(tmp_file)
+
+            suffix = utils.get_img_format(tmp_file)
+            file_path = re.sub("\\.tmp$", suffix, tmp_file)
+            os.rename(tmp_file, file_path)
+            self.store.add(url, digest.hexdigest(), file_path, suffix, utils.get_file_size(file_path))
+        except SegmentError as e:
+            self.logger.error("%s, 改为单连接下载: %s", e, url)
+            journal.discard()
+            return self._download(*args, segmented=False)
         except PermissionError as e:
             self.logger.error("权限错误: %s, %s", e, tmp_file)
         except FileExistsError as e:
@@ -135,34 +181,72 @@ class SyncDownload(threading.Thread):
             result = {"type": suffix, "name": os.path.basename(file_path)}
             return result
 
-    def run(self) -> None:
+    def _claim(self, last_rowid: int) -> list:
+        """领取rowid大于last_rowid的一批待下载条目"""
         select_sql = "SELECT " \
+                     "sync_items.rowid, sync_items.attempts, " \
                      "sync_items.board_id, sync_items.site, sync_items.name, " \
                      "sync_items.url, sync_items.sub_dir, sync_boards.name " \
                      "FROM sync_items " \
                      "INNER JOIN sync_boards " \
                      "ON sync_items.board_id = sync_boards.board_id AND sync_items.site = sync_boards.site " \
-                     "WHERE sync_items.state = 0 " \
-                     "LIMIT 1 OFFSET ?"
-        update_sql = "UPDATE sync_items SET name=?, state = 1, type = ? WHERE board_id = ? AND url = ?"
-
-        # 通过比对前一次运行的item与本次查询的item的主键值,避免在某个出错的item上出现死循环.
-        # 如果相同,说明此item在上次运行中已失败,则将查询参数offset+=1,获取下一个查询结果.
-        # 如果不同,说明运行成功.
-        pre_key = None
-        offset = 0
-        item_data = self.con.select_one(select_sql, (offset, ))
-        while item_data and self.running_event.is_set():
-            primary_key = (item_data[0], item_data[3])
-            if primary_key == pre_key:
-                offset += 1
+                     "WHERE sync_items.state = 0 AND sync_items.rowid > ? " \
+                     "AND sync_items.next_try <= ? AND sync_items.attempts < ? " \
+                     "ORDER BY sync_items.rowid " \
+                     "LIMIT ?"
+        return list(self.con.select(select_sql, (last_rowid, int(time.time()), self.max_attempts, self.batch_size)))
+
+    def _backoff(self, attempts: int) -> int:
+        """第attempts次失败后的退避时间(秒)"""
+        return min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+
+    def _worker(self):
+        update_sql = "UPDATE sync_items SET name=?, state = 1, type = ? WHERE rowid = ?"
+        failed_sql = "UPDATE sync_items SET attempts = ?, next_try = ? WHERE rowid = ?"
+        while True:
+            item_data = self.work_queue.get()
+            if item_data is None:
+                break
+            if not self.running_event.is_set():
+                continue
+            rowid, attempts = item_data[:2]
+            # 单个条目的异常不能结束下载线程, 否则run()会阻塞在有界队列上
+            try:
+                result = self._download(*item_data[2:])
+            except Exception as e:
+                self.logger.error("同步下载错误: %s, %s", e, item_data[5])
+                result = None
+            if result:
+                self.con.execute(update_sql, (result.get("name"), result.get("type"), rowid))
             else:
-                result = self._download(*item_data)
-                if result:
-                    self.con.execute(update_sql, (result.get("name"), result.get("type"), item_data[0], item_data[3]))
-            pre_key = primary_key
-            item_data = self.con.select_one(select_sql, (offset, ))
-        # 退出时关闭请求连接
+                attempts += 1
+                self.con.execute(failed_sql, (attempts, int(time.time()) + self._backoff(attempts), rowid))
+
+    def run(self) -> None:
+        workers = [threading.Thread(target=self._worker, name=f"sync_download_{i}", daemon=True)
+                   for i in range(self.workers)]
+        for worker in workers:
+            worker.start()
+
+        last_rowid = 0
+        count = 0
+        while self.running_event.is_set():
+            items = self._claim(last_rowid)
+            if not items:
+                break
+            for item_data in items:
+                if not self.running_event.is_set():
+                    break
+                self.work_queue.put(item_data)
+            last_rowid = items[-1][0]
+            count += len(items)
+
+        for _ in workers:
+            self.work_queue.put(None)
+        for worker in workers:
+            worker.join()
+        self.logger.info("同步下载结束: %s个条目", count)
+        # 退出时归还请求连接
         self.session.close()
 
 
@@ -174,10 +258,20 @@ class Account:
     """
     同步账户基类
     """
-    def __init__(self, browser_cookies: CookieJar, con: AoDatabase):
+    items_newest_first = True       # get_items是否按从新到旧的顺序返回条目(决定能否在sync_head处停止翻页)
+    rate_limit = 2.0                # 站点请求速率限制(次/秒), 同一站点的所有线程共享
+    rate_burst = 4                  # 允许的突发请求数
+
+    def __init__(self,
+                 browser_cookies: CookieJar,
+                 con: AoDatabase,
+                 running_event: threading.Event = None,
+                 board_workers: int = 4):
         self.logger = logging.getLogger(APP_NAME)
-        self.con = con or wx.GetApp().con
-        self.session = Client(headers=HEADERS, cookies=browser_cookies)
+        self.con = con or get_context().con
+        self.session = ClientPool.borrow(cookies=browser_cookies, cache=True)
+        self.running_event = running_event      # 同步关闭时停止解析(None表示不检查)
+        self.board_workers = max(board_workers, 1)  # 并发解析的board数
 
         self.site = str()
         self.user_info = dict()
@@ -213,14 +307,34 @@ class Account:
         self.con.execute(sql, arg=info)
 
     def _update_boards_db(self, board: dict):
-        """更新sync_boards表"""
-        sql = "INSERT OR REPLACE INTO " \
+        """更新sync_boards表, 保留增量同步标记字段(sync_*)"""
+        sql = "INSERT INTO " \
               "sync_boards (board_id, user_id, site, name, url, state, description, total, created_t, updated_t) " \
-              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) " \
+              "ON CONFLICT(board_id, site) DO UPDATE SET " \
+              "user_id = excluded.user_id, name = excluded.name, url = excluded.url, state = excluded.state, " \
+              "description = excluded.description, total = excluded.total, " \
+              "created_t = excluded.created_t, updated_t = excluded.updated_t"
         info = (board.get(k) for k in ("board_id", "user_id", "site", "name", "url", "state",
                                        "description", "total", "created_t", "updated_t"))
         self.con.execute(sql, arg=tuple(info))
 
+    def _load_board_mark(self, board: dict) -> [tuple, None]:
+        """
+        读取board上次完整同步的标记
+        :return: tuple(sync_total, sync_updated_t, sync_head), 从未完整同步时返回None
+        """
+        sql = "SELECT sync_total, sync_updated_t, sync_head FROM sync_boards WHERE board_id = ? AND site = ?"
+        result = self.con.select_one(sql, (board.get("board_id"), self.site))
+        if not result or result[2] is None:
+            return None
+        return result
+
+    def _update_board_mark(self, board: dict, head: str):
+        """board同步完成后记录标记"""
+        sql = "UPDATE sync_boards SET sync_total = ?, sync_updated_t = ?, sync_head = ? WHERE board_id = ? AND site = ?"
+        self.con.execute(sql, (board.get("total"), board.get("updated_t"), head, board.get("board_id"), self.site))
+
     def _update_items_db(self, item: dict):
         """更新sync_items表"""
         sql = "INSERT OR IGNORE INTO " \
@@ -284,7 +398,52 @@ class Account:
 
         return item_info
 
+    def sync_board(self, board):
+        """
+        增量同步单个board
+        条目数和更新时间与上次完整同步时相同的board直接跳过;
+        否则从最新条目开始翻页, 遇到上次完整同步时的最新条目(sync_head)即停止.
+        同步中断时不更新标记, 下次仍以原sync_head为终点, 中断前已写入的条目由INSERT OR IGNORE去重.
+        """
+        board_info = self.get_board_info(board)
+        mark = self._load_board_mark(board_info)
+        self._update_boards_db(board_info)
+        if mark and mark[0] == board_info.get("total") and mark[1] == board_info.get("updated_t"):
+            self.logger.debug("%s: board未变化, 跳过: %s", self.site, board_info.get("name"))
+            return
+
+        last_head = mark[2] if mark and self.items_newest_first else None
+        head = None
+        count = 0
+        for item in self.get_items(board):
+            if not self.is_running():
+                return      # 同步中断, 不更新标记
+            item_info = self.get_item_info(item)
+            url = item_info.get("url")
+            if last_head and url == last_head:
+                break
+            if head is None:
+                head = url
+            self._update_items_db(item_info)
+            count += 1
+        self._update_board_mark(board_info, head or last_head or "")
+        self.logger.debug("%s: board同步完成: %s, 新增条目: %s", self.site, board_info.get("name"), count)
+
+    def is_running(self) -> bool:
+        return self.running_event is None or self.running_event.is_set()
+
+    def _sync_board_safe(self, board):
+        """线程池任务: 单个board出错不影响其他board"""
+        if not self.is_running():
+            return
+        try:
+            self.sync_board(board)
+        except Exception as e:
+            self.logger.error("%s: board同步出错: %s", self.site, e, exc_info=True)
+
     def run(self, preload=False):
+        # 同一站点的全部请求共享限速器, 避免触发站点的反爬限制
+        self.session.limiter = RateLimiter.get(self.site, self.rate_limit, self.rate_burst)
         try:
             result = self.login()
             self.is_connected = result["is_connected"]
@@ -296,17 +455,18 @@ class Account:
             if preload:      # 后台尝试读取账户信息
                 self.logger.info("%s: preload finished.", self.site)
                 return
-            for board in self.get_boards():
-                board_info = self.get_board_info(board)
-                self._update_boards_db(board_info)
-                for item in self.get_items(board):
-                    item_info = self.get_item_info(item)
-                    self._update_items_db(item_info)
+            with ThreadPoolExecutor(max_workers=self.board_workers,
+                                    thread_name_prefix=f"sync_{self.site}") as executor:
+                for board in self.get_boards():
+                    if not self.is_running():
+                        break
+                    executor.submit(self._sync_board_safe, board)
         except Exception as e:
             self.logger.error("%s: %s", self.site, e, exc_info=True)
 
 
 class Archdaily(Account):
+    items_newest_first = False      # 收藏夹条目顺序不固定, 改为跳过已同步的收藏页面
 
     def __init__(self, *args, **kwargs):
         Account.__init__(self, *args, **kwargs)
@@ -376,12 +536,12 @@ class Archdaily(Account):
     @staticmethod
     def _utc_to_local(utc: str) -> [str, None]:
         # 原始格式:(ISO-Format): 2018-12-20T05:40:34.000Z
-        dt = wx.DateTime()
-        localtime = None
-        if dt.ParseISOCombined(utc[:-5]):  # 解析格式"YYYY-MM-DDTHH:MM:SS", 不包含时区
-            dt.MakeFromTimezone(wx.DateTime.TimeZone())  # 修正时区
-            localtime = dt.Format(format="%Y-%m-%d %H:%M:%S")
-        return localtime
+        try:
+            dt = datetime.strptime(utc[:-5], "%Y-%m-%dT%H:%M:%S")  # 解析格式"YYYY-MM-DDTHH:MM:SS", 不包含时区
+        except ValueError:
+            return None
+        dt = dt.replace(tzinfo=timezone.utc).astimezone()  # 修正时区
+        return dt.strftime("%Y-%m-%d %H:%M:%S")
 
     @utils.retry(times=3)
     def login(self):
@@ -509,17 +669,35 @@ class Archdaily(Account):
         }
         return board_data
 
+    def _is_synced_fav(self, board_id, fav_url: str) -> bool:
+        """收藏页面是否已完整同步"""
+        sql = "SELECT 1 FROM sync_favs WHERE board_id = ? AND site = ? AND url = ?"
+        return self.con.select_one(sql, (board_id, self.site, fav_url)) is not None
+
+    def _mark_synced_fav(self, board_id, fav_url: str):
+        """收藏页面的全部图片已写入sync_items"""
+        sql = "INSERT OR IGNORE INTO sync_favs (board_id, site, url) VALUES (?, ?, ?)"
+        self.con.execute(sql, (board_id, self.site, fav_url))
+
     def get_items(self, board) -> Generator:
+        """
+        逐个收藏页面生成图片条目, 跳过已完整同步的页面.
+        页面的最后一个条目被处理后(生成器继续执行)才记录完成标记; 同步中断或请求出错时不记录, 下次重新解析该页面.
+        """
         for fav in board["favs"]:
-            response = self.session.request("GET", fav["url"])
             title = utils.cleanup(fav["title"])
+            if self._is_synced_fav(board["id"], fav["url"]):
+                continue
+            response = self.session.request("GET", fav["url"])
             if fav["meta_type"] == "Photo":
                 yield from self._gallery(response, board_id=board["id"], title=title)
             else:
                 yield from self._article(response, board_id=board["id"], title=title)
+            self._mark_synced_fav(board["id"], fav["url"])
 
 
 class Pinterest(Account):
+    rate_limit = 1.0
 
     def __init__(self, *args, **kwargs):
         Account.__init__(self, *args, **kwargs)
@@ -545,12 +723,11 @@ class Pinterest(Account):
     @staticmethod
     def _utc_to_local(utc: str) -> [str, None]:
         # 原始格式:(RFC822-Format): Wed, 01 Apr 2015 03:38:16 +0000
-        dt = wx.DateTime()
-        localtime = None
-        if dt.ParseRfc822Date(utc):  # 解析格式"Sat, 18 Dec 1999 00:48:30 +0100", 包含时区
-            # dt.MakeFromTimezone(wx.DateTime.TimeZone())  # 不需要修正时区
-            localtime = dt.Format(format="%Y-%m-%d %H:%M:%S")
-        return localtime
+        try:
+            dt = parsedate_to_datetime(utc)  # 解析格式"Sat, 18 Dec 1999 00:48:30 +0100", 包含时区
+        except (TypeError, ValueError):
+            return None
+        return dt.astimezone().strftime("%Y-%m-%d %H:%M:%S")
 
     def login(self) -> dict:
         result = {
@@ -840,23 +1017,35 @@ class AoSync:
         self.account_state = {}                 # 账户登录状态
         self.sync_dir = sync_dir                # 同步目录
         self.running_event = threading.Event()  # 线程事件
-        self.con = wx.GetApp().con              # 数据库连接
+        self.con = get_context().con            # 数据库连接
 
     def _parser(self, browser_cookies: CookieJar):
         """
         同步解析线程
         :return:
         """
+        board_workers = get_context().cfg.ReadInt("/Sync/board_workers", defaultVal=4)
+        threads = []
         for site in [Archdaily, Huaban, Pinterest]:
-            if not self.running_event.is_set():
-                break
-            try:
-                parser = site(browser_cookies, con=self.con)
-                parser.run()
-                self.account_state[parser.site] = parser.user_info.get("user_id")
-            except Exception as e:
-                self.logger.error(e)
-                continue
+            thread = threading.Thread(target=self._parse_site,
+                                      args=(site, browser_cookies, board_workers),
+                                      name=f"sync_parser_{site.__name__.lower()}",
+                                      daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+    def _parse_site(self, site, browser_cookies: CookieJar, board_workers: int):
+        """单个站点的同步解析, 各站点在独立线程中并行执行"""
+        if not self.running_event.is_set():
+            return
+        try:
+            parser = site(browser_cookies, con=self.con, running_event=self.running_event, board_workers=board_workers)
+            parser.run()
+            self.account_state[parser.site] = parser.user_info.get("user_id")
+        except Exception as e:
+            self.logger.error(e)
 
     def _preload(self, browser_cookies: CookieJar):
         """账户信息检测线程函数"""
@@ -876,10 +1065,18 @@ class AoSync:
             self.logger.info("同步解析线程启动")
 
     def _download_thread(self, browser_cookies):
+        # 上一次的下载线程未结束时不重复启动, 避免重复领取同一批条目
+        if self.sync_download_thread is not None and self.sync_download_thread.is_alive():
+            return
+        cfg = get_context().cfg
         self.sync_download_thread = SyncDownload(browser_cookies=browser_cookies,
                                                  con=self.con,
                                                  running_event=self.running_event,
-                                                 sync_dir=self.sync_dir)
+                                                 sync_dir=self.sync_dir,
+                                                 workers=cfg.ReadInt("/Sync/download_workers", defaultVal=4),
+                                                 segments=cfg.ReadInt("/Network/segments", defaultVal=4),
+                                                 segment_threshold=cfg.ReadInt("/Network/segment_threshold",
+                                                                               defaultVal=8 * 1024 * 1024))
         self.sync_download_thread.setDaemon(True)
         self.sync_download_thread.start()
         self.logger.info("同步下载线程启动")
@@ -919,7 +1116,7 @@ class AoSync:
         self._parser_thread(browser_cookies)
 
         # 创建并执行同步下载线程(延时3分钟)
-        wx.CallLater(60000, self._download_thread, browser_cookies)
+        get_context().events.post_later(60, self._download_thread, browser_cookies)
 
     def stop(self):
         """
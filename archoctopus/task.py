@@ -1,25 +1,32 @@
 """
 ArchOctopus 任务管理模块
 
-"Plugin" -- 插件化加载管理器:
+"PluginRegistry" -- 插件化加载管理器:
     -- 根据url域名自动加载对应的解析类，同时保持已有解析类的缓存，在传入含相同域名的url参数时，可以直接调用。
+    -- 插件目录只在首次使用及插件更新后扫描.
+
+"TaskScheduler" -- 全局任务调度器:
+    -- 限制同时运行的任务数及下载线程总数, 超出的任务排队等待, 任务结束时在运行中的任务之间重新分配下载线程.
 """
 
 import threading
 from queue import Queue
 import os
-import re
-import weakref
+import sys
+import heapq
+import itertools
+import importlib
 from urllib.parse import urlparse, unquote
 import logging
-from importlib import import_module
-
-import wx
 
 from archoctopus import cookies
 from archoctopus.constants import APP_NAME
-from archoctopus.download import Downloader
+from archoctopus.core import get_context
+from archoctopus.download import Downloader, AsyncEngine, AsyncDownloader, WorkerQuota
+from archoctopus.journal import TaskJournal
+from archoctopus.progress import TaskProgress, ProgressAggregator
 from archoctopus.plugins import GeneralParser
+from archoctopus.normalize import plugin_name
 
 
 # Constant
@@ -28,24 +35,12 @@ COMPLETED = 1               # 项目状态 -- 完成
 ABORTED = 2                 # 项目状态 -- 中止
 ERROR = 4                   # 项目状态 -- 错误
 
-regexps = {
-    "archdaily": re.compile("(my|www).(archdaily|plataformaarquitectura)", re.I),
-}
 logger = logging.getLogger(APP_NAME)
 
 
 def get_domain_from_url(url: str):
-    domain = unquote(urlparse(url).hostname)
-    for k, v in regexps.items():
-        if v.match(domain):
-            return k
-    replacements = [('www\\.', ''),
-                    ('(\\.com|\\.org|\\.info|\\.net|\\.biz|'
-                     '\\.com\\.cn|\\.cn|\\.jp|\\.tw|\\.hk|\\.us|\\.es|\\.br|\\.fr|\\.it|\\.sg)$', ''),  # 常见顶级域名
-                    ('\\.', '_')]
-    for old, new in replacements:
-        domain = re.sub(old, new, domain)
-    return domain
+    """根据url获取解析插件模块名"""
+    return plugin_name(unquote(urlparse(url).hostname))
 
 
 # def get_custom_class(domain, rule):
@@ -61,39 +56,156 @@ def get_domain_from_url(url: str):
 #     return type(domain, (BaseParser,), {"friend_name": domain, "parse": parse})
 
 
-class Plugin:
-    """插件化调用解析类"""
-    manager = weakref.WeakValueDictionary()
+class PluginRegistry:
+    """
+    解析插件注册表
+    首次使用时扫描一次插件目录, 建立 插件名 -> 文件修改时间 索引; 解析类在首次使用时导入, 之后直接从缓存返回,
+    启动任务时不再访问文件系统.
+    PluginUpdate写入插件文件后调用invalidate, 下次使用时重新扫描, 修改时间变化的插件重新载入.
+    """
+    _lock = threading.Lock()
+    _path = None
+    _index = None           # 插件名 -> 文件修改时间
+    _dirty = True           # 需要重新扫描插件目录
+    _classes = {}           # 插件名 -> 解析类
+    _stale = set()          # 文件已更新, 需要重新载入(reload)的插件模块
+
+    @staticmethod
+    def _scan(path: str) -> dict:
+        index = {}
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name, ext = os.path.splitext(entry.name)
+                if ext == ".py" and name != "__init__" and entry.is_file():
+                    index[name] = entry.stat().st_mtime
+        return index
+
+    @classmethod
+    def _refresh(cls):
+        """重新扫描插件目录, 丢弃文件已更新的解析类缓存"""
+        if cls._path is None:
+            cls._path = os.path.join(get_context().install_dir, "plugins")
+        logger.debug("扫描解析插件目录: %s", cls._path)
+        index = cls._scan(cls._path)
+        if cls._index is not None:
+            for name, mtime in index.items():
+                if cls._index.get(name, mtime) != mtime:
+                    cls._classes.pop(name, None)
+                    cls._stale.add(name)
+            for name in cls._index.keys() - index.keys():     # 插件文件被删除
+                cls._classes.pop(name, None)
+        importlib.invalidate_caches()       # 新增的插件文件需要刷新导入系统的目录缓存
+        cls._index = index
+        cls._dirty = False
 
-    def __new__(cls, name, *args, **kwargs):
-        if name in cls.manager:
-            instance = cls.manager[name]
-            logger.debug("cache_parser: %s", name)
+    @classmethod
+    def _import(cls, name: str):
+        module_name = "plugins." + name
+        module = sys.modules.get(module_name)
+        if module is not None and name in cls._stale:
+            module = importlib.reload(module)
+            logger.debug("重新载入解析插件: %s", name)
         else:
-            instance = cls._load(name)
-            cls.manager[name] = instance
-            logger.debug("new_parser: %s", name)
+            module = importlib.import_module(module_name)
+        cls._stale.discard(name)
+        return module.Parser
+
+    @classmethod
+    def get(cls, name: str):
+        """获取插件名对应的解析类, 没有对应插件时返回通用解析类"""
+        with cls._lock:
+            if cls._dirty:
+                cls._refresh()
+            if name not in cls._index:
+                return GeneralParser        # 返回通用解析模块
+            parser = cls._classes.get(name)
+            if parser is None:
+                parser = cls._classes[name] = cls._import(name)     # 返回预定义解析模块
+                logger.debug("new_parser: %s", name)
+            return parser
+
+    @classmethod
+    def invalidate(cls):
+        """插件文件已更新, 下次使用时重新扫描插件目录"""
+        with cls._lock:
+            cls._dirty = True
+
+
+class TaskScheduler:
+    """
+    全局任务调度器(在GUI线程中调用)
+        -- 同时运行的任务数不超过max_tasks, 所有任务的下载线程总数不超过max_workers;
+        -- 超出的任务进入等待队列, 按优先级(数值小的优先)启动, 相同优先级先进先出;
+        -- 任务启动或结束时, 在运行中的任务之间平均分配下载线程.
+    任务面板需要实现: run(workers), resize_workers(workers), call_queued(), task属性.
+    """
+    PRIORITY_NORMAL = 0     # 手动输入的网址
+    PRIORITY_BATCH = 1      # 批量导入的网址
+
+    def __init__(self, max_tasks: int = 3, max_workers: int = 16):
+        self.max_tasks = max_tasks
+        self.max_workers = max_workers
+        self.pending = []       # 等待队列(堆): (priority, seq, panel)
+        self.running = []       # 运行中的任务面板
+        self._seq = itertools.count()
 
-        return instance(*args, **kwargs)
+    def configure(self, max_tasks: int, max_workers: int):
+        """配置变更后重新调度"""
+        self.max_tasks = max(1, max_tasks)
+        self.max_workers = max(1, max_workers)
+        self._schedule()
 
     @staticmethod
-    def _load(plugin_name):
-        # # 自定义规则-----------------
-        # cfg = wx.GetApp().cfg
-        # cfg_path = f"/Rules/{plugin_name}"
-        # if cfg.Exists(cfg_path):
-        #     rule = cfg.Read(cfg_path)
-        #     return get_custom_class(plugin_name, rule)     # 返回自定义规则解析类
-
-        # 内置规则-----------------
-        bundle_dir = wx.GetApp().get_install_dir()
-        plugins_path = os.path.join(bundle_dir, "plugins")
-        logger.debug("载入解析模块路径: %s", plugins_path)
-        if plugin_name+".py" in os.listdir(plugins_path):
-            plugin = import_module("plugins." + plugin_name)
-            return plugin.Parser        # 返回预定义解析模块
-        else:
-            return GeneralParser        # 返回通用解析模块
+    def _is_threaded(panel) -> bool:
+        task = getattr(panel, "task", None)
+        return task is not None and task.quota is not None
+
+    def _share(self, extra: int = 0) -> int:
+        """每个多线程任务分配的下载线程数上限"""
+        threaded = sum(1 for panel in self.running if self._is_threaded(panel)) + extra
+        return max(1, self.max_workers // max(1, threaded))
+
+    def is_pending(self, panel) -> bool:
+        return any(item[2] is panel for item in self.pending)
+
+    def is_active(self, panel) -> bool:
+        """任务正在运行或等待中"""
+        return panel in self.running or self.is_pending(panel)
+
+    def submit(self, panel, priority: int = PRIORITY_NORMAL):
+        """提交任务: 有空闲名额时立即启动, 否则进入等待队列"""
+        if self.is_active(panel):
+            logger.debug("任务已在运行或等待中: %s", panel.task_info["id"])
+            return
+        heapq.heappush(self.pending, (priority, next(self._seq), panel))
+        self._schedule()
+        if self.is_pending(panel):
+            logger.debug("任务进入等待队列: %s, 等待任务数: %s", panel.task_info["id"], len(self.pending))
+            panel.call_queued()
+
+    def cancel(self, panel):
+        """从等待队列中移除(任务面板删除时)"""
+        self.pending = [item for item in self.pending if item[2] is not panel]
+        heapq.heapify(self.pending)
+
+    def done(self, panel):
+        """任务结束(所有下载线程已退出), 释放名额并启动等待中的任务"""
+        if panel in self.running:
+            self.running.remove(panel)
+            self._schedule()
+
+    def _schedule(self):
+        while self.pending and len(self.running) < min(self.max_tasks, self.max_workers):
+            _priority, _seq, panel = heapq.heappop(self.pending)
+            panel.run(self._share(extra=1))
+            self.running.append(panel)
+        self.rebalance()
+
+    def rebalance(self):
+        """按当前运行任务数重新分配下载线程"""
+        share = self._share()
+        for panel in self.running:
+            panel.resize_workers(share)
 
 
 class TaskItem:
@@ -101,35 +213,44 @@ class TaskItem:
     任务类
     """
 
-    def __init__(self, parent, download_thread_count=5):
-        # GUI关联的任务面板
+    def __init__(self, parent, download_thread_count=5, use_async=False, proxies=None):
+        # 任务事件接收者(GUI中为任务面板, 无界面运行时为TaskListener)
         self.parent = parent
-        # 图片下载队列
-        self.queue = Queue()
-        # 下载线程数
+        # 下载线程数(异步模式下为下载协程数)
         self.download_thread_count = download_thread_count
+        # 异步下载引擎
+        self.engine = AsyncEngine.instance() if use_async else None
+        # 图片下载队列
+        self.queue = self.engine.make_queue() if self.engine else Queue()
         # 线程控制信号
         self.pause_event = threading.Event()  # 用于暂停线程的标识
         self.pause_event.set()  # 设置为True
         self.running_event = threading.Event()  # 用于停止线程的标识
         self.running_event.set()  # 将running设置为True
         # 网络代理
-        self.proxies = self.parent.GetTopLevelParent().proxies
+        self.proxies = proxies
         # 浏览器cookies
         try:
             self.cookies = cookies.load()
         except Exception as e:
             logger.error("浏览器cookies载入失败: %s", e)
             self.cookies = None
-        # 线程池
+        # 下载线程配额(异步模式下不调整)
+        self.quota = None if self.engine else WorkerQuota()
+        # 线程池(异步模式下包含下载协程的Future对象)
         self.pool = []
+        # 任务进度记录
+        self.journal = TaskJournal(get_context().con, self.parent.task_info["id"])
+        # 下载进度(从任务面板当前进度开始计数)
+        self.progress = TaskProgress(self.parent, self.journal, base=self.parent.gauge_value)
 
     def is_running(self):
         """
         通过检查解析线程和下载线程来检测任务是否还在运行.
         :return: bool
         """
-        return any(_thread.is_alive() for _thread in self.pool)
+        return any(_thread.is_alive() if isinstance(_thread, threading.Thread) else not _thread.done()
+                   for _thread in self.pool)
 
     def __getattr__(self, item):
         try:
@@ -143,8 +264,8 @@ class TaskItem:
         domain = get_domain_from_url(self.parent.task_info["url"])
         self.parent.task_info["domain"] = domain
         logger.debug("创建解析线程. \n任务参数: %s", self.parent.task_info)
-        parse_thread = Plugin(domain,
-                              self.parent,
+        parser = PluginRegistry.get(domain)
+        parse_thread = parser(self.parent,
                               self.parent.task_info["url"],
                               self.parent.task_info["id"],
                               self.queue,
@@ -152,22 +273,51 @@ class TaskItem:
                               self.running_event,
                               self.download_thread_count,
                               cookies=self.cookies,
-                              proxies=self.proxies)
+                              proxies=self.proxies,
+                              journal=self.journal)
         parse_thread.setDaemon(True)
         parse_thread.start()
         self.pool.append(parse_thread)
         logger.debug("执行解析线程.")
+        ProgressAggregator.instance().register(self.progress)
+        # 异步下载协程
+        if self.engine:
+            downloader = AsyncDownloader(self.parent,
+                                         self.engine,
+                                         self.queue,
+                                         self.pause_event,
+                                         self.running_event,
+                                         self.download_thread_count,
+                                         cookies=self.cookies,
+                                         proxies=self.proxies,
+                                         progress=self.progress)
+            self.pool.append(self.engine.submit(downloader.run()))
+            return
         # 下载线程池
-        for _download_thread in range(self.download_thread_count):
+        self.resize(self.download_thread_count)
+
+    def resize(self, count: int) -> int:
+        """
+        调整下载线程数: 增加时立即启动新线程, 减少时多余的线程在完成当前条目后退出.
+        异步模式下不调整.
+        :return: 新启动的线程数
+        """
+        if self.quota is None or not self.running_event.is_set():
+            return 0
+        spawn = self.quota.resize(count)
+        for _download_thread in range(spawn):
             _download_thread = Downloader(self.parent,
                                           self.queue,
                                           self.pause_event,
                                           self.running_event,
                                           cookies=self.cookies,
-                                          proxies=self.proxies)
+                                          proxies=self.proxies,
+                                          quota=self.quota,
+                                          progress=self.progress)
             _download_thread.setDaemon(True)
             _download_thread.start()
             self.pool.append(_download_thread)
+        return spawn
 
     def pause(self):
         """项目暂定"""
@@ -181,3 +331,4 @@ class TaskItem:
         """项目停止&删除"""
         self.pause_event.set()  # 将线程从暂停状态恢复, 如何已经暂停的话
         self.running_event.clear()  # 设置为False
+        self.queue.put(None)  # 唤醒阻塞在队列上的下载线程
@@ -10,6 +10,7 @@ import logging
 import wx
 
 from archoctopus.constants import APP_NAME
+from archoctopus.task import PluginRegistry
 from archoctopus.version import VERSION
 
 # local test
@@ -116,6 +117,7 @@ class PluginUpdate(threading.Thread):
             except PermissionError:
                 break
             else:
+                PluginRegistry.invalidate()     # 插件文件已更新, 下次启动任务时重新扫描并载入
                 return True
 
     def run(self):
@@ -53,8 +53,8 @@ class Usage(threading.Thread):
 
     def _sync_status(self):
         sql = "SELECT DISTINCT site FROM sync_account"
-        result = self.con.select(sql)
-        status = [i[0] for i in result]
+        result = self.con.select_columns(sql)
+        status = result[0] if result else []
         return status
 
     def _top_history(self):
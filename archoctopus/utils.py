@@ -4,45 +4,31 @@ ArchOctopus 通用工具
 
 import re
 import os
-import threading
+import sys
+import asyncio
 import time
+import random
 from datetime import datetime, timedelta
 from urllib.parse import urlparse, unquote
-import base64
-from io import BytesIO
-import imghdr
 
-import wx
-from httpx import ProxyError, HTTPError, StreamError, InvalidURL, CookieConflict, TimeoutException, HTTPStatusError
+from httpx import ProxyError, HTTPError, StreamError, InvalidURL, CookieConflict, TimeoutException, HTTPStatusError, \
+    NetworkError
 
+from archoctopus import imageinfo
+from archoctopus.normalize import cleanup     # noqa: F401 兼容原utils.cleanup调用
 from archoctopus.constants import APP_NAME
+from archoctopus.client import RETRY_STATUS_CODES, parse_retry_after
 
 
 def get_docs_dir():
     """
     Return the standard location on this platform for application data.
+    GUI运行时(wx已导入)使用wx.StandardPaths, 无界面运行时使用用户目录下的Documents.
     """
-    sp = wx.StandardPaths.Get()
-    return os.path.join(sp.GetDocumentsDir(), APP_NAME)
-
-
-def get_bitmap_from_embedded(data: bytes, scale: tuple = tuple(), isBase64: bool = True) -> wx.Bitmap:
-    """
-    从字节码中获取wx.Bitmap图片对象
-    :param data:
-    :param scale:
-    :param isBase64:
-    :return:
-    """
-    if isBase64:
-        data = base64.b64decode(data)
-    stream = BytesIO(data)
-    image = wx.Image()
-    image.SetLoadFlags(0)       # 忽略 'iCCP: known incorrect sRGB profile' 警告
-    image.LoadFile(stream)
-    if scale:
-        image = image.Scale(*scale, quality=wx.IMAGE_QUALITY_BOX_AVERAGE)
-    return wx.Bitmap(image)
+    wx = sys.modules.get("wx")
+    if wx is not None and hasattr(wx, "StandardPaths"):
+        return os.path.join(wx.StandardPaths.Get().GetDocumentsDir(), APP_NAME)
+    return os.path.join(os.path.expanduser("~"), "Documents", APP_NAME)
 
 
 def embedded_img(url):
@@ -58,23 +44,6 @@ def embedded_img(url):
         pass
 
 
-def cleanup(title):
-    """
-    替换非法字符
-    :param title: 初始输入标题
-    :return: 符合windows目录命名要求的标题
-    """
-    if not title:
-        return title
-    title = title.strip()
-    replacements = [("&#34;|&quot;|&#39;|&apos;|&#60;|&lt;|&#62;|&gt;", "\'"), ("&#38;|&amp;", "&"),
-                    ("&#8211;", "–"),
-                    ('[/:*?"<>|\\\\]', '_'), ('_{2,}', '_'), ('\\s{2,}', ' ')]
-    for _old, _new in replacements:
-        title = re.sub(_old, _new, title)
-    return title
-
-
 def time_to_date(timestamp: int):
     """将时间戳转换为本地日期文本格式"""
     isofmt = "%Y-%m-%d %H:%M:%S"
@@ -82,6 +51,14 @@ def time_to_date(timestamp: int):
     return time.strftime(isofmt, time_local)
 
 
+def format_bytes(size: int) -> str:
+    """字节数转换为易读的文本格式, 如: 1536 -> 1.5 KB"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
 def utc_to_local(utc: str, fmt: str):
     """
     将标准时区格式转为本地日期文本格式
@@ -97,8 +74,31 @@ def utc_to_local(utc: str, fmt: str):
     return localtime
 
 
+def _is_retryable(error: Exception) -> bool:
+    """超时, 网络连接错误及429/5xx响应可以重试"""
+    if isinstance(error, HTTPStatusError):
+        return error.response.status_code in RETRY_STATUS_CODES
+    return isinstance(error, (TimeoutException, NetworkError))
+
+
+def _retry_delay(attempt: int, error: Exception, base: float = 0.5, cap: float = 30.0) -> float:
+    """
+    重试等待时间: 带随机抖动的指数退避, 响应带有Retry-After时不少于其指定的时间
+    :param attempt: 已失败次数(从0开始)
+    """
+    delay = min(base * 2 ** attempt, cap) * random.uniform(0.5, 1.0)
+    if isinstance(error, HTTPStatusError):
+        retry_after = parse_retry_after(error.response.headers.get("Retry-After"))
+        if retry_after:
+            delay = max(delay, min(retry_after, cap))
+    return delay
+
+
 def retry(times=3):
-    """重试装饰器"""
+    """
+    重试装饰器
+    超时, 网络连接错误及429/5xx响应按指数退避重试, 最后一次仍失败时抛出异常.
+    """
 
     def retry_func(func):
 
@@ -106,15 +106,17 @@ def retry(times=3):
             for i in range(times):
                 try:
                     result = func(self, *args, **kwargs)
-                except TimeoutException as e:       # 仅超时错误重试
-                    self.logger.error("<请求次数 - %s>: %s", i, e)
-                    time.sleep(0.5)
-                    if times == 2:
+                except (TimeoutException, NetworkError, HTTPStatusError) as e:
+                    if not _is_retryable(e) or i == times - 1:
+                        self.logger.error("网络请求错误: %s", e)
                         raise
+                    delay = _retry_delay(i, e)
+                    self.logger.error("<请求次数 - %s>: %s, %.1f秒后重试", i, e, delay)
+                    time.sleep(delay)
                 except ProxyError as e:             # 单独捕捉代理错误
                     self.logger.error("ProxyError错误: %s", e)
                     raise
-                except (HTTPError, StreamError, InvalidURL, CookieConflict, HTTPStatusError) as e:
+                except (HTTPError, StreamError, InvalidURL, CookieConflict) as e:
                     self.logger.error("网络请求错误: %s", e)
                     raise
                 except RuntimeError as e:
@@ -128,6 +130,36 @@ def retry(times=3):
     return retry_func
 
 
+def async_retry(times=3):
+    """重试装饰器(协程版本)"""
+
+    def retry_func(func):
+
+        async def request(self, *args, **kwargs):
+            for i in range(times):
+                try:
+                    result = await func(self, *args, **kwargs)
+                except (TimeoutException, NetworkError, HTTPStatusError) as e:
+                    if not _is_retryable(e) or i == times - 1:
+                        self.logger.error("网络请求错误: %s", e)
+                        raise
+                    delay = _retry_delay(i, e)
+                    self.logger.error("<请求次数 - %s>: %s, %.1f秒后重试", i, e, delay)
+                    await asyncio.sleep(delay)
+                except ProxyError as e:             # 单独捕捉代理错误
+                    self.logger.error("ProxyError错误: %s", e)
+                    raise
+                except (HTTPError, StreamError, InvalidURL, CookieConflict) as e:
+                    self.logger.error("网络请求错误: %s", e)
+                    raise
+                else:
+                    return result
+
+        return request
+
+    return retry_func
+
+
 def is_downloaded(path, name, suffix=None) -> [str, None]:
     """判断图片文件是否已存在"""
     suffix = ".jpeg" if suffix == ".jpg" else suffix or ".jpeg"
@@ -157,20 +189,9 @@ def get_file_bytes(file) -> int:
 
 
 def get_file_size(file) -> tuple:
-    """获取文件尺寸大小"""
-    image = wx.Image()
-    image.SetLoadFlags(0)  # 屏蔽 'iCCP: known incorrect sRGB profile' Warning
-
-    # True if the operation succeeded, False otherwise.
-    # If the optional index parameter is out of range, False is returned and a call to wx.LogError takes place.
-    # dummy_log = wx.LogNull() 避免弹出的wx.LogError引发的错误窗口
-    dummy_log = wx.LogNull()
-    if image.LoadFile(file):
-        file_size = image.GetSize().Get()
-    else:
-        file_size = (0, 0)
-    del dummy_log
-    return file_size
+    """获取文件尺寸大小: 只解析文件头, 无法识别时返回(0, 0)"""
+    info = imageinfo.probe_file(file)
+    return info.size if info is not None else (0, 0)
 
 
 def get_name_from_url(url: str) -> tuple:
@@ -188,119 +209,12 @@ def get_name_from_url(url: str) -> tuple:
 def get_img_format(file: [str, bytes]) -> str:
     """获取图片类型"""
     if isinstance(file, str) and os.path.exists(file):
-        suffix = imghdr.what(file)
+        with open(file, "rb") as f:
+            suffix = imageinfo.what(f.read(64))
     elif isinstance(file, bytes):
-        suffix = imghdr.what(None, h=file)
+        suffix = imageinfo.what(file)
     else:
         raise ValueError("参数错误: 文件路径字符串或文件字节bytes数据")
 
     suffix = "."+suffix if suffix else ".jpeg"
     return suffix
-
-
-def gen_match_image(image: wx.Image, width: int, height: int) -> wx.Image:
-    """
-    居中缩放图片到指定尺寸
-    :param image:
-    :param width:
-    :param height:
-    :return:
-    """
-    raw_size = image.GetSize().Get()
-
-    x_scale_factor = width / raw_size[0]
-    y_scale_factor = height / raw_size[1]
-
-    if raw_size[1] * x_scale_factor > height:
-        new_size = (width, int(raw_size[1] * x_scale_factor))
-        rect = wx.Rect(0, (new_size[1] - height)//2, width, height)
-    elif raw_size[1] * x_scale_factor < height:
-        new_size = (int(raw_size[0] * y_scale_factor), height)
-        rect = wx.Rect((new_size[0] - width)//2, 0, width, height)
-    else:
-        new_size = (width, height)
-        rect = wx.Rect(0, 0, width, height)
-    scaled_image = image.Scale(*new_size, quality=wx.IMAGE_QUALITY_BOX_AVERAGE)
-    match_image = scaled_image.GetSubImage(rect)
-    return match_image
-
-
-def gen_cover_image(files: tuple):
-    """
-    生成同步面板中Board封面图片
-    :param files:
-    :return:
-    """
-    if not tuple:
-        return None
-
-    # # GUI board_cover组件尺寸计算
-    # gap = 2
-    # size = (176, 126)
-    #
-    # part_01 = (size[0]*2//3 - gap, size[1], 0, 0)
-    # part_02 = (size[0] - size[0]*2//3, (size[1]-gap)//2, size[0]*2//3, 0)
-    # part_03 = (part_02[0], size[1]-part_02[1]-gap, part_02[2], part_02[1]+gap)
-
-    part_01 = (115, 126, 0, 0)
-    part_02 = (59, 62, 117, 0)
-    part_03 = (59, 62, 117, 64)
-
-    cover_img = wx.Image(176, 126)
-    cover_img.Replace(0, 0, 0, 255, 255, 255)
-
-    new_files = [None, None, None]
-    for i, f in enumerate(files):
-        new_files[i] = f
-
-    for part, file in zip((part_01, part_02, part_03), new_files):
-        if file is None or not os.path.isfile(file):
-            match_image = wx.Image(*part[:2])
-            match_image.Replace(0, 0, 0, 220, 220, 220)
-        else:
-            raw_img = wx.Image(file, wx.BITMAP_TYPE_ANY)
-            if raw_img.IsOk():
-                match_image = gen_match_image(raw_img, *part[:2])
-            else:
-                match_image = wx.Image(*part[:2])
-                match_image.Replace(0, 0, 0, 200, 200, 200)
-        cover_img.Paste(match_image, *part[2:])
-
-    return wx.Bitmap(cover_img)
-
-
-class UpdateCover(threading.Thread):
-    """异步更新board封面,避免GUI载入时间过长和卡顿"""
-
-    def __init__(self, parent, queue, con):
-        super(UpdateCover, self).__init__()
-
-        self.parent = parent
-        self.queue = queue
-        self.con = con
-
-    def load_conver_files(self, board_id: int, site: str) -> tuple:
-        sql = "SELECT sub_dir, name " \
-              "From sync_items " \
-              "WHERE board_id = ? AND site = ? AND state = 1 AND type IN ('.jpeg', '.png') " \
-              "LIMIT 3"
-        result = self.con.select(sql, (board_id, site))
-        return result
-
-    def run(self):
-        while True:
-            data = self.queue.get()
-            if data is None:
-                break
-            board_panel_id, board_info = data
-            cover_files = self.load_conver_files(board_info[0], board_info[1])
-            cover_files = tuple(os.path.join(self.parent.sync_dir,
-                                             board_info[1],
-                                             cleanup(board_info[2]),
-                                             item[0] or "",
-                                             item[1])
-                                for item in cover_files)
-            cover_bitmap = gen_cover_image(cover_files)
-            if cover_bitmap is None:
-                continue
-            wx.CallAfter(self.parent.call_update_cover, board_panel_id, cover_bitmap, (board_info[0], board_info[1]))
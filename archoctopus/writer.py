@@ -0,0 +1,143 @@
+"""
+ArchOctopus 文件写入模块
+    ChunkWriter -- 缓冲写入器
+    ReusableBuffer -- 可复用的写入缓冲区
+    response_length -- 响应内容长度
+    preallocate -- 预先分配文件大小
+
+下载数据按网络接收的大小逐块返回(iter_bytes不指定chunk_size, 避免httpx重新拼接数据块),
+数据块先拷贝到复用的bytearray缓冲区, 缓冲区满时通过memoryview一次写入文件并更新SHA-256摘要.
+缓冲区大小按响应长度选择: 小文件整体缓冲后一次写入, 大文件使用较大的缓冲区, 减少Python层的调用及系统调用次数.
+响应带有Content-Length时预先分配文件大小, 关闭时按实际写入长度截断.
+"""
+
+import os
+import threading
+
+MIN_BUFFER = 64 * 1024              # 最小缓冲区
+MAX_BUFFER = 1024 * 1024            # 最大缓冲区
+DEFAULT_BUFFER = 256 * 1024         # 未知长度时的缓冲区
+PREALLOCATE_MIN = 1024 * 1024       # 超过该长度的文件预先分配大小
+
+_local = threading.local()
+
+
+def buffer_size(length: [int, None]) -> int:
+    """按响应长度选择缓冲区大小: 约为长度的1/4(取2的幂), 在MIN_BUFFER与MAX_BUFFER之间, 小文件整体缓冲"""
+    if not length:
+        return DEFAULT_BUFFER
+    if length <= MIN_BUFFER:
+        return MIN_BUFFER
+    return min(MAX_BUFFER, max(MIN_BUFFER, 1 << (length // 4).bit_length()))
+
+
+def response_length(response) -> [int, None]:
+    """响应内容长度(未压缩时的Content-Length)"""
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    length = response.headers.get("Content-Length", "")
+    return int(length) if length.isdigit() else None
+
+
+def preallocate(fd: int, length: int):
+    """预先分配文件大小, 减少大文件写入时的碎片及元数据更新"""
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, length)
+            return
+        except OSError:     # 文件系统不支持时改为设置文件长度
+            pass
+    os.ftruncate(fd, length)
+
+
+class ReusableBuffer:
+    """
+    可复用的写入缓冲区
+    每个下载线程(通过thread_buffer)或下载协程持有一个, 需要更大的缓冲区时才重新分配.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def get(self, size: int) -> memoryview:
+        if len(self._buffer) < size:
+            self._buffer = bytearray(size)
+        return memoryview(self._buffer)[:size]
+
+
+def thread_buffer() -> ReusableBuffer:
+    """当前线程的写入缓冲区(协程之间不能共享, 异步下载时每个协程使用自己的ReusableBuffer)"""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = ReusableBuffer()
+    return buffer
+
+
+class ChunkWriter:
+    """
+    缓冲写入器
+    用法:
+        with ChunkWriter(tmp_file, mode, length=response_length(s), digest=digest) as writer:
+            for chunk in s.iter_bytes():
+                writer.write(chunk)
+    """
+
+    def __init__(self, file: str, mode: str, length: int = None, digest=None, buffer: ReusableBuffer = None):
+        self.file = open(file, mode, buffering=0)   # 由本类缓冲
+        self.view = (buffer or thread_buffer()).get(buffer_size(length))
+        self.pos = 0
+        self.written = 0            # 本次写入的字节数
+        self.digest = digest        # 可选的hashlib对象, 写入时同时计算摘要
+        self.preallocated = False
+        if length and length >= PREALLOCATE_MIN and mode == "wb":
+            preallocate(self.file.fileno(), length)
+            self.preallocated = True
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            written = self.file.write(view)
+            view = view[written:]
+        if self.digest is not None:
+            self.digest.update(data)
+        self.written += len(data)
+
+    def try_buffer(self, chunk: bytes) -> bool:
+        """
+        只将数据块复制到缓冲区, 不写入文件; 缓冲区空间不足时返回False, 由调用方调用write.
+        异步下载时在事件循环中调用, 需要写入文件的write在线程池中执行.
+        """
+        size = len(chunk)
+        if self.pos + size > len(self.view):
+            return False
+        self.view[self.pos:self.pos + size] = chunk
+        self.pos += size
+        return True
+
+    def write(self, chunk: bytes):
+        if self.try_buffer(chunk):
+            return
+        self.flush()
+        if len(chunk) >= len(self.view):  # 超过缓冲区的数据块直接写入
+            self._write(chunk)
+            return
+        self.try_buffer(chunk)
+
+    def flush(self):
+        if self.pos:
+            self._write(self.view[:self.pos])
+            self.pos = 0
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self.preallocated:   # 下载中断或内容少于Content-Length时, 按实际写入长度截断
+                self.file.truncate(self.file.tell())
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
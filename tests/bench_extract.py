@@ -0,0 +1,111 @@
+"""
+通用页面图片地址提取性能对比
+    旧方法: BeautifulSoup(html, 'lxml')建立完整文档树, find_all(["img", "picture"])
+    新方法: archoctopus.extract.extract_image_uris, lxml解析目标接口, 不建立文档树
+
+用法: python bench_extract.py [页面目录]
+页面目录中为保存的.html页面(浏览器"另存为"或curl保存), 未指定时生成一个包含5000张图片的测试页面.
+内存为tracemalloc统计的Python对象峰值, 不包括libxml2内部分配.
+"""
+
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.extend(["../", ])
+
+from bs4 import BeautifulSoup
+
+from archoctopus.extract import extract_image_uris
+
+SRCSET_PAT = re.compile("(\\S+)(\\s+([\\d.]+)[xw])?(\\s*(?:,|$))")
+
+
+def old_extract(html: str) -> list:
+    """GeneralParser.parse_general原实现"""
+    uris = []
+    html_bs = BeautifulSoup(html, 'lxml')
+    for image in html_bs.find_all(["img", "picture"]):
+        src = image.get("src")
+        srcset = image.get("srcset")
+        data_src = image.get("data-src")
+        data_original = image.get("data-original")
+        data_original_src = image.get("data-original-src")
+
+        if data_original:
+            uri = data_original
+        elif data_original_src:
+            uri = data_original_src
+        elif data_src:
+            uri = data_src
+        elif srcset:
+            result = SRCSET_PAT.findall(srcset)
+            result.sort(key=lambda x: float(x[2]) if x[2] else 0)
+            uri = result[-1][0]
+        elif src:
+            uri = src
+        else:
+            continue
+        uris.append(uri)
+    return uris
+
+
+def sample_page(count: int = 5000) -> str:
+    """生成测试页面: 图片之间穿插正文段落, 脚本及样式"""
+    blocks = []
+    for i in range(count):
+        blocks.append(f'<div class="card" id="c{i}"><p>{"Lorem ipsum dolor sit amet. " * 8}</p>'
+                      f'<img src="/thumb/{i}-250x250.jpg" data-src="/images/{i}.jpg" alt="image {i}">'
+                      f'<picture><source srcset="/images/{i}-800.webp 800w, /images/{i}-1600.webp 1600w">'
+                      f'<img src="/images/{i}-800.jpg"></picture>'
+                      f'<script>var x{i} = {{"id": {i}}};</script></div>')
+    return "<html><head><title>bench</title></head><body>" + "".join(blocks) + "</body></html>"
+
+
+def load_pages(path: str) -> list:
+    pages = []
+    for root, _dirs, names in os.walk(path):
+        for name in names:
+            if name.endswith((".html", ".htm")):
+                with open(os.path.join(root, name), "r", encoding="utf-8", errors="ignore") as f:
+                    pages.append((name, f.read()))
+    return pages
+
+
+def bench(func, html: str) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(html)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = load_pages(sys.argv[1])
+        if not pages:
+            print(f"目录中没有html页面: {sys.argv[1]}")
+            return
+    else:
+        pages = [("sample.html", sample_page())]
+
+    total_old = total_new = 0.0
+    for name, html in pages:
+        old_time, old_peak, old_result = bench(old_extract, html)
+        new_time, new_peak, new_result = bench(extract_image_uris, html)
+        total_old += old_time
+        total_new += new_time
+        missing = set(uri for uri in old_result if not uri.startswith("data:")) - set(new_result)
+        print(f"{name}: {len(html) / 1024:.0f}KB, "
+              f"BeautifulSoup {old_time * 1000:.1f}ms/{old_peak / 1024 / 1024:.1f}MB ({len(old_result)}), "
+              f"extract {new_time * 1000:.1f}ms/{new_peak / 1024 / 1024:.1f}MB ({len(new_result)}), "
+              f"遗漏: {len(missing)}")
+    print(f"合计: BeautifulSoup {total_old:.3f}s, extract {total_new:.3f}s, 加速比: {total_old / total_new:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
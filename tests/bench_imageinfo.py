@@ -0,0 +1,92 @@
+"""
+图片尺寸/格式解析性能对比
+    旧方法: wx.Image.LoadFile解码整张图片获取尺寸, imghdr读取整个文件判断格式
+    新方法: archoctopus.imageinfo只解析文件头
+
+用法: python bench_imageinfo.py [图片目录]
+默认使用下载目录(~/Documents/ArchOctopus)中已下载的图片, 递归读取目录下所有文件.
+"""
+
+import os
+import sys
+import time
+
+sys.path.extend(["../", ])
+
+from archoctopus import imageinfo
+
+try:
+    import imghdr
+except ImportError:     # Python 3.13 已移除imghdr
+    imghdr = None
+
+try:
+    import wx
+except ImportError:
+    wx = None
+
+
+def collect(path: str) -> list:
+    files = []
+    for root, _dirs, names in os.walk(path):
+        for name in names:
+            if not name.endswith(".tmp"):
+                files.append(os.path.join(root, name))
+    return files
+
+
+def old_probe(file: str) -> tuple:
+    image = wx.Image()
+    image.SetLoadFlags(0)
+    dummy_log = wx.LogNull()
+    size = image.GetSize().Get() if image.LoadFile(file) else (0, 0)
+    del dummy_log
+    fmt = imghdr.what(file) if imghdr else None
+    return fmt, size
+
+
+def new_probe(file: str) -> tuple:
+    info = imageinfo.probe_file(file)
+    if info is None:
+        with open(file, "rb") as f:
+            return imageinfo.what(f.read(64)), (0, 0)
+    return info.format, info.size
+
+
+def bench(func, files: list) -> tuple:
+    start = time.perf_counter()
+    results = [func(file) for file in files]
+    return time.perf_counter() - start, results
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.expanduser("~"), "Documents", "ArchOctopus")
+    files = collect(path)
+    if not files:
+        print(f"目录中没有文件: {path}")
+        return
+    total_bytes = sum(os.path.getsize(file) for file in files)
+    print(f"文件数: {len(files)}, 总大小: {total_bytes / 1024 / 1024:.1f}MB")
+
+    new_time, new_results = bench(new_probe, files)
+    print(f"imageinfo: {new_time:.3f}s, {new_time / len(files) * 1000:.3f}ms/文件")
+
+    if wx is None:
+        print("未安装wxPython, 跳过旧方法对比")
+        return
+    app = wx.App(False)     # wx.Image需要已初始化的wx.App载入图片处理器
+    old_time, old_results = bench(old_probe, files)
+    print(f"wx.Image + imghdr: {old_time:.3f}s, {old_time / len(files) * 1000:.3f}ms/文件")
+    print(f"加速比: {old_time / new_time:.1f}x")
+
+    # 结果一致性: 旧方法能够识别的文件, 新方法的尺寸应当相同
+    mismatch = [(file, old, new) for file, old, new in zip(files, old_results, new_results)
+                if old[1] != (0, 0) and old[1] != new[1]]
+    print(f"尺寸不一致: {len(mismatch)}")
+    for file, old, new in mismatch[:10]:
+        print(f"    {file}: wx={old}, imageinfo={new}")
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+标题及url规范化性能对比
+    旧方法: 每次调用逐条执行re.sub(依赖re模块内部的编译缓存)
+    新方法: archoctopus.normalize, 预编译正则, str.translate单次替换及有界LRU缓存
+
+用法: python bench_normalize.py [条目数]
+生成100k条图片url(约50个站点, 2000个子目录标题), 模拟解析及下载时每个条目的规范化调用:
+cleanup(子目录标题), 站点名称及插件名称.
+"""
+
+import re
+import sys
+import time
+import random
+from urllib.parse import urlparse, unquote
+
+sys.path.extend(["../", ])
+
+from archoctopus import normalize
+
+
+def old_cleanup(title):
+    if not title:
+        return title
+    title = title.strip()
+    replacements = [("&#34;|&quot;|&#39;|&apos;|&#60;|&lt;|&#62;|&gt;", "\'"), ("&#38;|&amp;", "&"),
+                    ("&#8211;", "–"),
+                    ('[/:*?"<>|\\\\]', '_'), ('_{2,}', '_'), ('\\s{2,}', ' ')]
+    for _old, _new in replacements:
+        title = re.sub(_old, _new, title)
+    return title
+
+
+def old_site_name(url: str):
+    domain = unquote(urlparse(url).hostname)
+    replacements = [('www\\.|\\.com|\\.cn', ''), ('\\.', '_')]
+    for _old, _new in replacements:
+        domain = re.sub(_old, _new, domain)
+    return domain.capitalize()
+
+
+def old_plugin_name(url: str):
+    domain = unquote(urlparse(url).hostname)
+    if re.compile("(my|www).(archdaily|plataformaarquitectura)", re.I).match(domain):
+        return "archdaily"
+    replacements = [('www\\.', ''),
+                    ('(\\.com|\\.org|\\.info|\\.net|\\.biz|'
+                     '\\.com\\.cn|\\.cn|\\.jp|\\.tw|\\.hk|\\.us|\\.es|\\.br|\\.fr|\\.it|\\.sg)$', ''),
+                    ('\\.', '_')]
+    for old, new in replacements:
+        domain = re.sub(old, new, domain)
+    return domain
+
+
+def new_site_name(url: str):
+    return normalize.site_name(unquote(urlparse(url).hostname))
+
+
+def new_plugin_name(url: str):
+    return normalize.plugin_name(unquote(urlparse(url).hostname))
+
+
+def corpus(count: int) -> list:
+    random.seed(0)
+    hosts = [f"www.site{i}.{random.choice(['com', 'cn', 'com.cn', 'org'])}" for i in range(50)]
+    words = ["House", "Museum", "Pavilion", "Library", "&amp;", "&#8211;", "Studio", "/", ":", "  ", "School"]
+    titles = [" ".join(random.choice(words) for _ in range(6)) for _ in range(2000)]
+    return [(f"https://{random.choice(hosts)}/uploads/2022/{i}-1024x768.jpg", random.choice(titles))
+            for i in range(count)]
+
+
+def bench(funcs, items: list) -> float:
+    cleanup, site, plugin = funcs
+    start = time.perf_counter()
+    for url, title in items:
+        cleanup(title)
+        site(url)
+        plugin(url)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    items = corpus(count)
+
+    # 结果一致性
+    for url, title in items[:5000]:
+        assert old_cleanup(title) == normalize.cleanup(title)
+        assert old_site_name(url) == new_site_name(url)
+        assert old_plugin_name(url) == new_plugin_name(url)
+
+    old_time = bench((old_cleanup, old_site_name, old_plugin_name), items)
+    new_time = bench((normalize.cleanup, new_site_name, new_plugin_name), items)
+    print(f"条目数: {count}")
+    print(f"re.sub: {old_time:.3f}s, {old_time / count * 1e6:.2f}us/条目")
+    print(f"normalize: {new_time:.3f}s, {new_time / count * 1e6:.2f}us/条目")
+    print(f"每条目节省: {(old_time - new_time) / count * 1e6:.2f}us, 加速比: {old_time / new_time:.1f}x")
+
+    # 无缓存命中(每个标题都不同)时cleanup本身的差异
+    unique = [f"{title} {i}" for i, (_url, title) in enumerate(items)]
+    start = time.perf_counter()
+    for title in unique:
+        old_cleanup(title)
+    old_time = time.perf_counter() - start
+    normalize._cleanup.cache_clear()
+    start = time.perf_counter()
+    for title in unique:
+        normalize.cleanup(title)
+    new_time = time.perf_counter() - start
+    print(f"cleanup(不重复标题): re.sub {old_time / count * 1e6:.2f}us, normalize {new_time / count * 1e6:.2f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+下载写入性能对比
+    旧方法: iter_bytes(chunk_size=10240), 每个10KB数据块调用一次f.write及digest.update
+    新方法: archoctopus.writer.ChunkWriter, iter_bytes()按网络数据块返回, 复用缓冲区按响应长度合并写入
+
+用法: python bench_write.py [小文件次数] [大文件次数]
+启动本地http服务器, 分别下载50KB小文件(默认500次)及20MB大文件(默认10次), 两种方法交替运行.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import httpx
+
+sys.path.extend(["../", ])
+
+from archoctopus.writer import ChunkWriter, response_length
+
+FILES = {
+    "/small.jpg": os.urandom(50 * 1024),
+    "/large.jpg": os.urandom(20 * 1024 * 1024),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # 避免响应头与内容分开发送时的延迟确认(约40ms)
+
+    def do_GET(self):
+        data = FILES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class CountingWriter(ChunkWriter):
+    writes = 0
+
+    def _write(self, data):
+        CountingWriter.writes += 1
+        super()._write(data)
+
+
+def old_write(client: httpx.Client, url: str, file: str) -> tuple:
+    writes = 0
+    digest = hashlib.sha256()
+    with client.stream("GET", url) as s:
+        with open(file, "wb") as f:
+            for chunk in s.iter_bytes(chunk_size=10240):
+                if chunk:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    writes += 1
+            f.flush()
+    return writes, digest.hexdigest()
+
+
+def new_write(client: httpx.Client, url: str, file: str) -> tuple:
+    CountingWriter.writes = 0
+    digest = hashlib.sha256()
+    with client.stream("GET", url) as s:
+        with CountingWriter(file, "wb", length=response_length(s), digest=digest) as writer:
+            for chunk in s.iter_bytes():
+                writer.write(chunk)
+    return CountingWriter.writes, digest.hexdigest()
+
+
+def bench(func, client, url, file, count) -> tuple:
+    start = time.perf_counter()
+    writes = 0
+    for _ in range(count):
+        writes, _digest = func(client, url, file)
+    return time.perf_counter() - start, writes
+
+
+def main():
+    small_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    large_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    tmp_dir = tempfile.mkdtemp()
+    file = os.path.join(tmp_dir, "image.tmp")
+
+    with httpx.Client() as client:
+        # 结果一致性
+        for path, data in FILES.items():
+            digest = hashlib.sha256(data).hexdigest()
+            assert old_write(client, base_url + path, file)[1] == digest
+            assert new_write(client, base_url + path, file)[1] == digest
+
+        for path, count in (("/small.jpg", small_count), ("/large.jpg", large_count)):
+            size = len(FILES[path]) * count / 1024 / 1024
+            old_time, old_writes = bench(old_write, client, base_url + path, file, count)
+            new_time, new_writes = bench(new_write, client, base_url + path, file, count)
+            print(f"{path} x {count}:")
+            print(f"    iter_bytes(10240): {old_time:.3f}s, {size / old_time:.0f}MB/s, 每文件写入{old_writes}次")
+            print(f"    ChunkWriter: {new_time:.3f}s, {size / new_time:.0f}MB/s, 每文件写入{new_writes}次")
+            print(f"    加速比: {old_time / new_time:.2f}x")
+
+    server.shutdown()
+    os.remove(file)
+    os.rmdir(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
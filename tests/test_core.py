@@ -0,0 +1,198 @@
+import unittest
+import subprocess
+import threading
+import tempfile
+import struct
+import zlib
+import functools
+import types
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import sys
+import os
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus import core
+from archoctopus.database import AoDatabase
+
+CORE_MODULES = ("archoctopus.core", "archoctopus.core.runner", "archoctopus.task", "archoctopus.download",
+                "archoctopus.progress", "archoctopus.plugins", "archoctopus.sync")
+
+IMPORT_SCRIPT = """
+import sys
+sys.path.insert(0, "..")
+for name in sys.argv[1:]:
+    __import__(name)
+print("wx" in sys.modules)
+"""
+
+
+def make_png(width: int, height: int) -> bytes:
+    """生成纯色PNG图片"""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    raw = b"".join(b"\x00" + b"\x80\x40\x20" * width for _ in range(height))
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) + \
+        chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_head(self):
+        """只处理超出文件长度的Range请求: 返回416"""
+        path = self.translate_path(self.path)
+        range_header = self.headers.get("Range")
+        if range_header and os.path.isfile(path):
+            start = int(range_header.split("=")[1].split("-")[0])
+            if start >= os.path.getsize(path):
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+        return super(QuietHandler, self).send_head()
+
+
+class CoreImportTestCase(unittest.TestCase):
+
+    def test_no_wx(self):
+        """导入核心模块时不导入wx"""
+        result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT, *CORE_MODULES],
+                                capture_output=True, text=True)
+        if result.returncode and "ModuleNotFoundError" in result.stderr and "'wx'" not in result.stderr:
+            self.skipTest(result.stderr.strip().splitlines()[-1])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_dict_config(self):
+        cfg = core.DictConfig({"/General/is_page": "true", "/General/loop_max": "5"})
+        self.assertTrue(cfg.ReadBool("/General/is_page"))
+        self.assertEqual(cfg.ReadInt("/General/loop_max", defaultVal=3), 5)
+        self.assertEqual(cfg.Read("/General/download_dir", defaultVal="/tmp"), "/tmp")
+        cfg.WriteInt("/General/loop_max", 2)
+        self.assertEqual(cfg.ReadInt("/General/loop_max"), 2)
+
+    def test_events(self):
+        calls = []
+        events = core.Events()
+        events.post(calls.append, 1)
+        events.post(lambda: 1 / 0)     # 回调异常只记录日志
+        done = threading.Event()
+        events.post_later(0.01, lambda: (calls.append(2), done.set()))
+        self.assertTrue(done.wait(2))
+        self.assertEqual(calls, [1, 2])
+
+
+class HeadlessTaskTestCase(unittest.TestCase):
+
+    def test_resize_fast_exit(self):
+        """调度器增加的下载线程立即退出时, 任务不能提前结束"""
+        try:
+            from archoctopus.core.runner import HeadlessTask
+        except ModuleNotFoundError as e:
+            self.skipTest(str(e))
+        finished = []
+        collector = types.SimpleNamespace(context=core.Context(con=AoDatabase()), done=finished.append)
+        task = HeadlessTask(collector, {"id": 1, "url": "https://example.com/board"})
+        task.worker_limit = 5
+        task.download_thread_count = 1     # 一个运行中的下载线程
+        threads = []
+
+        def resize(count):
+            exited = threading.Event()
+            thread = threading.Thread(target=lambda: (task.call_thread_done(), exited.set()))
+            thread.start()
+            threads.append(thread)
+            exited.wait(0.5)    # 新线程立即退出
+            return 1
+
+        task.task = types.SimpleNamespace(resize=resize, progress=types.SimpleNamespace(saved_bytes=0),
+                                          running_event=threading.Event())
+        task.resize_workers(2)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(task.download_thread_count, 1)
+        self.assertEqual(finished, [])
+        self.assertFalse(task.done_event.is_set())
+        collector.context.con.on_close()
+
+
+class HeadlessRunTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        try:
+            from archoctopus.core.runner import Collector
+        except ModuleNotFoundError as e:
+            self.skipTest(str(e))
+        self.site = tempfile.TemporaryDirectory()
+        self.download_dir = tempfile.TemporaryDirectory()
+        images = "".join(f'<img src="/img_{i}.png">' for i in range(6))
+        for page, title in (("index.html", "Board"), ("copy.html", "Copy")):
+            with open(os.path.join(self.site.name, page), "w") as f:
+                f.write(f"<html><head><title>{title}</title></head><body>{images}</body></html>")
+        for i in range(6):
+            with open(os.path.join(self.site.name, f"img_{i}.png"), "wb") as f:
+                f.write(make_png(40 + i, 30))
+        handler = functools.partial(QuietHandler, directory=self.site.name)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/index.html".format(self.server.server_address[1])
+
+        self.con = AoDatabase()
+        self.cfg = core.DictConfig({"/General/download_dir": self.download_dir.name,
+                                    "/General/download_thread_count": 2})
+        core.setup(cfg=self.cfg, con=self.con)
+        self.collector = Collector()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.con.on_close()
+        core.setup()
+        self.site.cleanup()
+        self.download_dir.cleanup()
+
+    def test_collect(self):
+        results = self.collector.collect([self.url])
+        self.assertEqual(len(results), 1)
+        info = results[0]
+        self.assertEqual((info["total_count"], info["download_count"]), (6, 6))
+        files = [name for name in os.listdir(info["dir"]) if name.endswith(".png")]
+        self.assertEqual(len(files), 6)
+        row = self.con.select_one("SELECT total_count, download_count FROM history WHERE url=?", (self.url,))
+        self.assertEqual(tuple(row), (6, 6))
+        # 已下载的网址跳过
+        self.assertEqual(self.collector.collect([self.url]), [])
+
+    def test_saved_bytes(self):
+        """其他任务已下载过的图片从图片库生成副本, 报告节省的字节数"""
+        self.collector.collect([self.url])
+        info = self.collector.collect([self.url.replace("index.html", "copy.html")])[0]
+        total = sum(os.path.getsize(os.path.join(self.site.name, f"img_{i}.png")) for i in range(6))
+        self.assertEqual(info["download_count"], 6)
+        self.assertEqual(info["saved_bytes"], total)
+        self.assertEqual(self.collector.saved_bytes(), total)
+
+    def test_async_restart(self):
+        """异步下载: 预先分配后中断的临时文件(416)重新下载"""
+        self.cfg.WriteBool("/General/async_download", True)
+        task_dir = self.collector.collect([self.url])[0]["dir"]
+        for name in os.listdir(task_dir):
+            os.remove(os.path.join(task_dir, name))
+        for i in range(6):
+            size = os.path.getsize(os.path.join(self.site.name, f"img_{i}.png"))
+            with open(os.path.join(task_dir, f"{i + 1}_img_{i}.tmp"), "wb") as f:
+                f.write(bytes(size))
+
+        info = self.collector.collect([self.url], redownload=True)[0]
+        self.assertEqual(info["download_count"], 6)
+        for i in range(6):
+            with open(os.path.join(task_dir, f"{i + 1}_img_{i}.png"), "rb") as f, \
+                    open(os.path.join(self.site.name, f"img_{i}.png"), "rb") as src:
+                self.assertEqual(f.read(), src.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
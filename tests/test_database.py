@@ -0,0 +1,118 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.database import AoDatabase
+
+
+class DatabaseTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.con = AoDatabase()
+
+    def tearDown(self) -> None:
+        self.con.on_close()
+
+    def test_batch_write(self):
+        """写入语句合并为批次提交, 查询前先提交已入队的写入语句"""
+        sql = "INSERT INTO urls (task_id, url) VALUES (?, ?)"
+        for i in range(1200):
+            self.con.execute(sql, (1, f"https://example.com/{i}.jpg"))
+
+        result = self.con.select_one("SELECT COUNT(*) FROM urls WHERE task_id=?", (1,))
+        self.assertEqual(result[0], 1200)
+
+        stats = self.con.get_stats()
+        self.assertEqual(stats["statements"], 1200)
+        self.assertLessEqual(stats["max_batch"], self.con.batch_size)
+        self.assertGreaterEqual(stats["batches"], 3)
+
+    def test_executemany_with_error(self):
+        """批量执行中的单条错误不影响同组其他语句"""
+        sql = "INSERT INTO urls (task_id, url) VALUES (?, ?)"
+        self.con.executemany(sql, [(2, "a"), (2, "b"), (2, "a"), (2, "c")])
+
+        result = self.con.select("SELECT url FROM urls WHERE task_id=? ORDER BY url", (2,))
+        self.assertEqual([r[0] for r in result], ["a", "b", "c"])
+        self.assertEqual(self.con.get_stats()["errors"], 1)
+
+    def test_iter_select(self):
+        """分块读取与按列读取, 提前放弃读取不阻塞数据库线程"""
+        sql = "INSERT INTO urls (task_id, url) VALUES (?, ?)"
+        self.con.executemany(sql, [(3, f"u{i:04d}") for i in range(1000)])
+
+        chunks = list(self.con.iter_select("SELECT url FROM urls WHERE task_id=?", (3,), chunk_size=300))
+        self.assertEqual([len(chunk) for chunk in chunks], [300, 300, 300, 100])
+
+        for _chunk in self.con.iter_select("SELECT url FROM urls WHERE task_id=?", (3,), chunk_size=10):
+            break
+        columns = self.con.select_columns("SELECT task_id, url FROM urls WHERE task_id=? ORDER BY url", (3,))
+        self.assertEqual(len(columns), 2)
+        self.assertEqual(columns[1][:2], ["u0000", "u0001"])
+        self.assertEqual(len(columns[0]), 1000)
+        self.assertEqual(self.con.select_columns("SELECT url FROM urls WHERE task_id=?", (4,)), [])
+
+
+class WalDatabaseTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.con = AoDatabase(db=os.path.join(self.tmp_dir.name, "test.db"))
+
+    def tearDown(self) -> None:
+        self.con.on_close()
+        self.con.join()
+        self.tmp_dir.cleanup()
+
+    def test_wal_mode(self):
+        self.assertEqual(self.con.select_one("PRAGMA journal_mode"), ("wal",))
+
+    def test_read_your_writes(self):
+        """查询在调用线程中执行, 且能读到本线程之前入队的写入语句"""
+        self.con.execute("INSERT INTO history (url) VALUES (?)", ("https://example.com/",))
+        result = self.con.select_one("SELECT id FROM history WHERE url=?", ("https://example.com/",))
+        self.assertIsNotNone(result)
+
+    def test_barrier(self):
+        """barrier等待其他线程入队的写入语句提交"""
+        def writer():
+            for i in range(1000):
+                self.con.execute("INSERT INTO urls (task_id, url) VALUES (?, ?)", (1, str(i)))
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        thread.join()
+        self.con.barrier()
+        self.assertEqual(self.con.select_one("SELECT COUNT(*) FROM urls")[0], 1000)
+
+    def test_commit_then_select(self):
+        """手动提交后查询不阻塞"""
+        result = []
+
+        def query():
+            self.con.execute("INSERT INTO history (url) VALUES (?)", ("https://example.com/",))
+            self.con.on_commit()
+            result.append(self.con.select_one("SELECT COUNT(*) FROM history"))
+            self.con.on_commit()
+            self.con.barrier()
+            result.append(self.con.select_one("SELECT COUNT(*) FROM history"))
+
+        thread = threading.Thread(target=query, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(result, [(1,), (1,)])
+
+    def test_iter_select(self):
+        self.con.executemany("INSERT INTO urls (task_id, url) VALUES (?, ?)", [(1, str(i)) for i in range(500)])
+        chunks = list(self.con.iter_select("SELECT url FROM urls", chunk_size=200, columnar=True))
+        self.assertEqual([len(chunk[0]) for chunk in chunks], [200, 200, 100])
+
+
+if __name__ == '__main__':
+    unittest.main()
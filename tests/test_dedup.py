@@ -0,0 +1,47 @@
+import unittest
+import sys
+import os
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.database import AoDatabase
+from archoctopus.dedup import UrlIndex
+
+
+class UrlIndexTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.con = AoDatabase()
+        sql = "INSERT INTO urls (task_id, url) VALUES (?, ?)"
+        self.con.executemany(sql, ((1, f"https://example.com/{i}.jpg") for i in range(100)))
+
+    def tearDown(self) -> None:
+        self.con.on_close()
+
+    def test_hash_set(self):
+        index = UrlIndex(self.con, task_id=1)
+        self.assertIsNone(index.bloom)
+        self.assertIn("https://example.com/5.jpg", index)
+        self.assertNotIn("https://example.com/500.jpg", index)
+
+        index.add("https://example.com/500.jpg")
+        self.assertIn("https://example.com/500.jpg", index)
+        # 新url异步写回数据库
+        result = self.con.select_one("SELECT * FROM urls WHERE task_id=? AND url=?", (1, "https://example.com/500.jpg"))
+        self.assertIsNotNone(result)
+
+    def test_bloom_filter(self):
+        index = UrlIndex(self.con, task_id=1, bloom_threshold=10)
+        self.assertIsNotNone(index.bloom)
+        for i in range(100):
+            self.assertIn(f"https://example.com/{i}.jpg", index)
+        self.assertNotIn("https://example.com/500.jpg", index)
+
+    def test_other_task(self):
+        index = UrlIndex(self.con, task_id=2)
+        self.assertNotIn("https://example.com/5.jpg", index)
+
+
+if __name__ == '__main__':
+    unittest.main()
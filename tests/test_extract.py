@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.extract import extract_image_uris, largest_srcset
+
+
+HTML = """
+<html>
+<head>
+    <meta property="og:image" content="https://example.com/og.jpg">
+    <style>.hero { background-image: url("/css/hero.jpg"); }</style>
+</head>
+<body>
+    <img src="/a_small.jpg" data-src="/a.jpg">
+    <img src="/b.jpg" srcset="/b-300.jpg 300w, /b-1200.jpg 1200w, /b-800.jpg 800w">
+    <img data-original="/c.jpg" data-original-src="/c2.jpg">
+    <img src="data:image/gif;base64,R0lGODlhAQABAAAAACw=">
+    <picture>
+        <source srcset="/d.webp 1x, /d@2x.webp 2x" type="image/webp">
+        <img src="/d.jpg">
+    </picture>
+    <div style="background: #fff url('/e.jpg') no-repeat"></div>
+    <img alt="no source">
+</body>
+</html>
+"""
+
+
+class ExtractTestCase(unittest.TestCase):
+
+    def test_extract(self):
+        self.assertEqual(extract_image_uris(HTML), [
+            "https://example.com/og.jpg",
+            "/css/hero.jpg",
+            "/a.jpg",
+            "/b-1200.jpg",
+            "/c.jpg",
+            "/d@2x.webp",
+            "/d.jpg",
+            "/e.jpg",
+        ])
+
+    def test_broken_html(self):
+        """标签未闭合及属性无引号时与lxml建树结果一致"""
+        self.assertEqual(extract_image_uris("<div><p><img src=/a.jpg><img src='/b.jpg'"), ["/a.jpg"])
+        self.assertEqual(extract_image_uris(""), [])
+
+    def test_largest_srcset(self):
+        self.assertEqual(largest_srcset("a.jpg 1x, b.jpg 1.5x"), "b.jpg")
+        self.assertEqual(largest_srcset("a.jpg"), "a.jpg")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+
+import httpx
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.client import ClientPool, SharedClient
+from archoctopus.httpcache import HttpCache, strip_params
+
+
+class HttpCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = HttpCache(os.path.join(self.tmp_dir.name, "cache.db"), max_bytes=64 * 1024)
+        ClientPool.cache = self.cache
+        self.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            if request.url.path == "/etag":
+                if request.headers.get("If-None-Match") == '"v1"':
+                    return httpx.Response(304, headers={"ETag": '"v1"'})
+                return httpx.Response(200, headers={"ETag": '"v1"'}, text="etag page")
+            if request.url.path.startswith("/large"):
+                return httpx.Response(200, headers={"ETag": request.url.path}, content=os.urandom(10 * 1024))
+            return httpx.Response(200, text="plain page")
+
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        self.session = SharedClient(ClientPool, client, use_cache=True, identity="user")
+
+    def tearDown(self) -> None:
+        ClientPool.cache = None
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_conditional_request(self):
+        """有ETag的响应: 再次请求时发出条件请求, 304时返回缓存内容"""
+        first = self.session.get("https://example.com/etag", params={"_": "1"})
+        second = self.session.get("https://example.com/etag", params={"_": "2"})
+        self.assertEqual(first.text, "etag page")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.text, "etag page")
+        self.assertEqual(self.requests[1].headers["If-None-Match"], '"v1"')
+        self.assertEqual(self.cache.get_stats()["revalidated"], 1)
+
+    def test_stats(self):
+        """多个线程同时统计时计数不丢失, 关闭时记录统计"""
+        self.session.get("https://example.com/etag")
+        workers = [threading.Thread(target=lambda: [self.session.get("https://example.com/plain", cache_ttl=60)
+                                                    for _ in range(50)]) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stats = self.cache.get_stats()
+        self.assertEqual(stats["hits"] + stats["misses"], 401)
+
+        with self.assertLogs("ArchOctopus", level="INFO") as logs:
+            ClientPool.close_all()
+        self.assertIn("命中{}次".format(stats["hits"]), logs.output[-1])
+        self.cache = HttpCache(os.path.join(self.tmp_dir.name, "cache.db"))    # close_all已关闭缓存
+
+    def test_ttl(self):
+        """没有验证字段的响应只在指定ttl时缓存, 有效期内不发出请求"""
+        self.session.get("https://example.com/plain")
+        self.session.get("https://example.com/plain")
+        self.assertEqual(len(self.requests), 2)
+
+        self.session.get("https://example.com/plain", params={"a": 1}, cache_ttl=60)
+        response = self.session.get("https://example.com/plain", params={"a": 1}, cache_ttl=60)
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(response.text, "plain page")
+
+    def test_identity(self):
+        """不同账号不共享缓存"""
+        self.session.get("https://example.com/etag")
+        other = SharedClient(ClientPool, self.session.client, use_cache=True, identity="other")
+        other.get("https://example.com/etag")
+        self.assertNotIn("If-None-Match", self.requests[1].headers)
+
+    def test_evict(self):
+        """总容量超过上限时淘汰最久未访问的条目"""
+        for i in range(10):
+            self.session.get(f"https://example.com/large{i}")
+        self.assertLessEqual(self.cache.total, self.cache.max_bytes)
+        self.session.get("https://example.com/large9")
+        self.assertIn("If-None-Match", self.requests[-1].headers)
+        self.session.get("https://example.com/large0")
+        self.assertNotIn("If-None-Match", self.requests[-1].headers)
+
+    def test_evict_recent_hit(self):
+        """命中时不写数据库, 淘汰时仍按命中的访问时间排序"""
+        for i in range(5):
+            self.session.get(f"https://example.com/large{i}", cache_ttl=60)
+        changes = self.cache.con.total_changes
+        self.session.get("https://example.com/large0", cache_ttl=60)
+        self.assertEqual(self.cache.con.total_changes, changes)
+        self.assertEqual(len(self.requests), 5)
+
+        for i in range(5, 7):
+            self.session.get(f"https://example.com/large{i}", cache_ttl=60)
+        self.session.get("https://example.com/large0", cache_ttl=60)
+        self.assertEqual(len(self.requests), 7)
+        self.session.get("https://example.com/large1", cache_ttl=60)
+        self.assertEqual(len(self.requests), 8)
+
+    def test_strip_params(self):
+        self.assertEqual(strip_params("https://example.com/api?b=2&_=123&a=1"), "https://example.com/api?a=1&b=2")
+
+
+if __name__ == '__main__':
+    unittest.main()
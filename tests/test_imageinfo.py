@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+import struct
+import zlib
+import tempfile
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.imageinfo import probe, probe_file, what
+
+
+def png_header(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+
+
+def jpeg_header(width, height, exif_size=0):
+    app1 = b"\xff\xe1" + struct.pack(">H", exif_size + 2) + b"\x00" * exif_size if exif_size else b""
+    app0 = b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof = b"\xff\xc2\x00\x11\x08" + struct.pack(">HH", height, width) + b"\x03\x01\x22\x00\x02\x11\x01\x03\x11\x01"
+    return b"\xff\xd8" + app0 + app1 + sof
+
+
+def tiff_header(width, height):
+    entries = [(256, 3, 1, struct.pack("<HH", width, 0)), (257, 4, 1, struct.pack("<I", height))]
+    ifd = struct.pack("<H", len(entries)) + b"".join(struct.pack("<HHI", *e[:3]) + e[3] for e in entries)
+    return b"II*\x00" + struct.pack("<I", 8) + ifd + b"\x00" * 4
+
+
+def avif_header(sizes):
+    ftyp = struct.pack(">I", 32) + b"ftypavif" + b"\x00" * 4 + b"avifmif1miafMA1B"
+    ispe = b"".join(struct.pack(">I", 20) + b"ispe" + b"\x00" * 4 + struct.pack(">II", *size) for size in sizes)
+    return ftyp + struct.pack(">I", 8 + len(ispe)) + b"meta" + ispe
+
+
+class ImageInfoTestCase(unittest.TestCase):
+
+    def test_formats(self):
+        cases = [
+            (png_header(640, 480), ("png", 640, 480)),
+            (jpeg_header(1920, 1080, exif_size=3000), ("jpeg", 1920, 1080)),
+            (b"GIF89a" + struct.pack("<HH", 320, 200) + b"\x00" * 4, ("gif", 320, 200)),
+            (b"BM" + b"\x00" * 12 + struct.pack("<Iii", 40, 800, -600), ("bmp", 800, 600)),
+            (b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x00" * 8 + (999).to_bytes(3, "little") + (499).to_bytes(3, "little"),
+             ("webp", 1000, 500)),
+            (b"RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f" + ((99 | (49 << 14))).to_bytes(4, "little") + b"\x00" * 5,
+             ("webp", 100, 50)),
+            (tiff_header(3000, 2000), ("tiff", 3000, 2000)),
+            (avif_header([(160, 120), (4032, 3024)]), ("avif", 4032, 3024)),
+        ]
+        for data, expected in cases:
+            self.assertEqual(tuple(probe(data)), expected)
+
+    def test_incomplete(self):
+        """数据不足或格式不支持时返回None"""
+        self.assertIsNone(probe(jpeg_header(100, 100, exif_size=3000)[:1000]))
+        self.assertIsNone(probe(png_header(10, 10)[:20]))
+        self.assertIsNone(probe(b"<html></html>"))
+        self.assertEqual(what(jpeg_header(100, 100, exif_size=3000)[:100]), "jpeg")
+
+    def test_probe_file(self):
+        """JPEG文件头较大时逐步读取"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, "test.jpg")
+            with open(file, "wb") as f:
+                f.write(jpeg_header(1200, 800, exif_size=60000) + b"\x00" * 100000)
+            self.assertEqual(tuple(probe_file(file)), ("jpeg", 1200, 800))
+            self.assertIsNone(probe_file(os.path.join(tmp_dir, "missing.jpg")))
+
+
+if __name__ == '__main__':
+    unittest.main()
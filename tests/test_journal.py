@@ -0,0 +1,135 @@
+import unittest
+from queue import Queue
+import sys
+import os
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.database import AoDatabase
+from archoctopus.journal import TaskJournal
+
+
+def run_parser(journal: TaskJournal, route) -> TaskJournal:
+    """运行解析线程: 任务页面由route(response)生成解析结果, 返回重新读取的进度记录"""
+    import httpx
+    from archoctopus.plugins import BaseParser
+
+    class Parser(BaseParser):
+        def request(self, method, url, **kwargs):
+            return httpx.Response(200, headers={"content-type": "text/html"},
+                                  text="<html><head><title>Board</title></head></html>")
+
+        def route(self, response=None, **kwargs):
+            return route(self, response)
+
+    parser = Parser(parent=None, url=journal.con.select_one("SELECT url FROM history WHERE id=?", (1,))[0],
+                    task_id=1, parse_queue=Queue(), pause_event=None, running_event=None, threads_count=1,
+                    journal=journal)
+    parser.run()
+    journal.con.barrier()
+    return TaskJournal(journal.con, 1)
+
+
+class TaskJournalTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.con = AoDatabase()
+        self.con.execute("INSERT INTO history (id, url) VALUES (?, ?)", (1, "https://example.com/board"))
+        self.journal = TaskJournal(self.con, 1)
+        self.journal.begin()
+
+    def tearDown(self) -> None:
+        self.con.on_close()
+
+    def add_items(self, start: int, stop: int):
+        """模拟解析线程: 登记url后记录入队的条目数据"""
+        for i in range(start, stop):
+            url = f"https://example.com/{i}.jpg"
+            self.con.execute("INSERT INTO urls (task_id, url) VALUES (?, ?)", (1, url))
+            self.journal.queue({"item_url": url, "item_index": i, "size": (800, 600), "task_dir": "/tmp/board"})
+
+    def test_restore(self):
+        self.add_items(0, 10)
+        self.journal.save_cursor("fetch", 10, pages=1)
+        for i in range(4):
+            self.journal.complete(f"https://example.com/{i}.jpg", (("JPEG", "jpeg"), (800, 600), 1024))
+        self.journal.complete("https://example.com/4.jpg", None)
+        # 中断时正在处理的页面: url已登记但条目数据尚未记录
+        self.con.execute("INSERT INTO urls (task_id, url) VALUES (?, ?)", (1, "https://example.com/10.jpg"))
+
+        journal = TaskJournal(self.con, 1)
+        self.assertFalse(journal.parsed)
+        self.assertEqual(journal.cursor("fetch"), (True, 10, 1))
+        self.assertEqual(journal.cursor("other"), (False, None, 0))
+
+        items = journal.restore()
+        self.assertEqual([item["item_index"] for item in items], list(range(5, 10)))
+        self.assertEqual(items[0]["task_dir"], "/tmp/board")
+        self.assertEqual(journal.counts(), (10, 5))
+        # 未记录条目数据的url已删除, 重新解析时再次登记
+        self.assertIsNone(self.con.select_one("SELECT 1 FROM urls WHERE url=?", ("https://example.com/10.jpg",)))
+
+    def test_sync_counts(self):
+        self.add_items(0, 6)
+        for i in range(3):
+            self.journal.complete(f"https://example.com/{i}.jpg", None)
+        self.assertEqual(self.journal.sync_counts(), (6, 3))
+        row = self.con.select_one("SELECT total_count, download_count FROM history WHERE id=?", (1,))
+        self.assertEqual(tuple(row), (6, 3))
+
+    def test_finished_cursor(self):
+        self.journal.save_cursor("fetch", None, pages=3)
+        self.journal.finish()
+        journal = TaskJournal(self.con, 1)
+        self.assertTrue(journal.parsed)
+        self.assertEqual(journal.cursor("fetch"), (True, None, 0))
+
+    def test_unfinished(self):
+        self.con.execute("INSERT INTO history (id, url) VALUES (?, ?)", (2, "https://example.com/other"))
+        TaskJournal(self.con, 2).begin()
+        self.assertEqual(TaskJournal.unfinished(self.con), [(1, "https://example.com/board"),
+                                                            (2, "https://example.com/other")])
+        self.add_items(0, 3)
+        self.journal.close()
+        self.assertEqual(TaskJournal.unfinished(self.con), [(2, "https://example.com/other")])
+        self.assertIsNone(self.con.select_one("SELECT 1 FROM urls WHERE item IS NOT NULL"))
+
+
+class ParserJournalTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        try:
+            import archoctopus.plugins     # noqa: F401
+        except ModuleNotFoundError as e:
+            self.skipTest(str(e))
+        self.con = AoDatabase()
+        self.con.execute("INSERT INTO history (id, url) VALUES (?, ?)", (1, "https://example.com/board"))
+        self.journal = TaskJournal(self.con, 1)
+
+    def tearDown(self) -> None:
+        self.con.on_close()
+
+    def test_parse_done(self):
+        def route(parser, response):
+            yield {"item_url": "https://example.com/0.jpg", "item_index": 1}
+        self.assertTrue(run_parser(self.journal, route).parsed)
+
+    def test_parse_abort(self):
+        def route(parser, response):
+            yield from parser.abort("主动中止")
+        self.assertTrue(run_parser(self.journal, route).parsed)
+
+    def test_parse_error(self):
+        """解析出错时不记录完成, 保留游标以便继续"""
+        def route(parser, response):
+            yield {"item_url": "https://example.com/0.jpg", "item_index": 1}
+            parser.journal.save_cursor("fetch", 2, pages=1)
+            raise ConnectionError("第2页请求失败")
+        journal = run_parser(self.journal, route)
+        self.assertFalse(journal.parsed)
+        self.assertEqual(journal.cursor("fetch"), (True, 2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import sys
+import os
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.normalize import cleanup, site_name, plugin_name, get_title
+
+
+class NormalizeTestCase(unittest.TestCase):
+
+    def test_cleanup(self):
+        self.assertEqual(cleanup('  A/B: "C" &quot;D&quot; &amp; E &#8211; F  '), "A_B_ _C_ 'D' & E – F")
+        self.assertEqual(cleanup("a___b    c"), "a_b c")
+        self.assertEqual(cleanup("&amp;#8211;"), "–")
+        self.assertEqual(cleanup("&amp;quot;"), "&quot;")
+        self.assertIsNone(cleanup(None))
+        self.assertEqual(cleanup(""), "")
+
+    def test_domain(self):
+        self.assertEqual(site_name("www.archdaily.cn"), "Archdaily")
+        self.assertEqual(site_name("shows.vogue.com.cn"), "Shows_vogue")
+        self.assertEqual(plugin_name("my.archdaily.com"), "archdaily")
+        self.assertEqual(plugin_name("shows.vogue.com.cn"), "shows_vogue")
+        self.assertEqual(plugin_name("www.gooood.cn"), "gooood")
+
+    def test_get_title(self):
+        self.assertEqual(get_title("<html><title>\n A | B </title></html>"), "A _ B")
+        self.assertEqual(get_title('<meta content="OG" property="og:title">'), "OG")
+        self.assertEqual(get_title("<html></html>"), "No_Title")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.database import AoDatabase
+from archoctopus.journal import TaskJournal
+from archoctopus.progress import TaskProgress, ProgressAggregator
+
+URLS = [f"https://example.com/{i}.jpg" for i in range(1000)]
+PROP = (("JPEG", "jpeg"), (800, 600), 1024)
+
+
+class FakePanel:
+    """模拟任务面板, 记录每次刷新的进度"""
+
+    def __init__(self):
+        self.refreshes = []
+
+    def call_refresh_gauge(self, download_count):
+        self.refreshes.append(download_count)
+
+
+class ProgressTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.con = AoDatabase()
+        self.con.execute("INSERT INTO history (id, url) VALUES (?, ?)", (1, "https://example.com/board"))
+        self.con.executemany("INSERT INTO urls (task_id, url) VALUES (?, ?)", ((1, url) for url in URLS))
+        self.panel = FakePanel()
+        self.progress = TaskProgress(self.panel, TaskJournal(self.con, 1), base=10)
+
+    def tearDown(self) -> None:
+        self.con.on_close()
+
+    def download(self, urls):
+        for i, url in enumerate(urls):
+            self.progress.add(url, PROP if i % 2 else None)
+
+    def test_flush(self):
+        workers = [threading.Thread(target=self.download, args=(URLS[i::8],)) for i in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.progress.flush()
+        self.progress.flush()   # 没有新增结果时不刷新面板
+        self.assertEqual(self.panel.refreshes, [1010])
+
+        rows = self.con.select_one("SELECT TOTAL(status=1), TOTAL(status=2) FROM urls WHERE task_id=?", (1,))
+        self.assertEqual(tuple(rows), (496, 504))
+        row = self.con.select_one("SELECT download_count FROM history WHERE id=?", (1,))
+        self.assertEqual(row[0], 1010)
+
+    def test_aggregator(self):
+        aggregator = ProgressAggregator(interval=0.02)
+        aggregator.start()
+        aggregator.register(self.progress)
+        for i in range(0, len(URLS), 100):
+            self.download(URLS[i:i + 100])
+            time.sleep(0.005)
+        self.progress.flush()   # 下载线程退出前送出剩余的进度
+        aggregator.unregister(self.progress)
+        # 面板刷新次数与条目数无关, 进度递增且最终完整
+        self.assertLess(len(self.panel.refreshes), 50)
+        self.assertEqual(self.panel.refreshes, sorted(self.panel.refreshes))
+        self.assertEqual(self.panel.refreshes[-1], 1010)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import sys
+import os
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.download import WorkerQuota
+from archoctopus.task import TaskScheduler
+
+
+class FakeTask:
+    def __init__(self, threaded=True):
+        self.quota = WorkerQuota() if threaded else None
+
+    def resize(self, count):
+        return self.quota.resize(count) if self.quota else 0
+
+
+class FakePanel:
+    """模拟任务面板"""
+
+    def __init__(self, task_id, worker_limit=5, threaded=True):
+        self.task_info = {"id": task_id}
+        self.worker_limit = worker_limit
+        self.threaded = threaded
+        self.task = None
+        self.workers = 0
+        self.queued = False
+
+    def run(self, workers):
+        self.task = FakeTask(self.threaded)
+        self.workers = self.task.resize(min(self.worker_limit, workers))
+
+    def resize_workers(self, workers):
+        self.workers += self.task.resize(min(self.worker_limit, workers))
+
+    def call_queued(self):
+        self.queued = True
+
+    def target(self):
+        return self.task.quota.target
+
+
+class WorkerQuotaTestCase(unittest.TestCase):
+
+    def test_resize(self):
+        quota = WorkerQuota()
+        self.assertEqual(quota.resize(4), 4)
+        self.assertEqual(quota.resize(6), 2)
+        self.assertEqual(quota.resize(2), 0)
+        # 多余的4个线程依次退出
+        self.assertEqual(sum(quota.retire() for _ in range(6)), 4)
+        self.assertEqual(quota.active, 2)
+        quota.leave()
+        self.assertEqual(quota.resize(2), 1)
+
+
+class TaskSchedulerTestCase(unittest.TestCase):
+
+    def test_limit_running(self):
+        scheduler = TaskScheduler(max_tasks=2, max_workers=8)
+        panels = [FakePanel(i) for i in range(4)]
+        for panel in panels:
+            scheduler.submit(panel)
+        self.assertEqual(scheduler.running, panels[:2])
+        self.assertTrue(panels[2].queued and panels[3].queued)
+        self.assertEqual([panel.target() for panel in panels[:2]], [4, 4])
+
+        # 重复提交被忽略
+        scheduler.submit(panels[3])
+        self.assertEqual(len(scheduler.pending), 2)
+
+        scheduler.done(panels[0])
+        self.assertEqual(scheduler.running, panels[1:3])
+        scheduler.cancel(panels[3])
+        scheduler.done(panels[1])
+        self.assertEqual(scheduler.running, panels[2:3])
+        self.assertFalse(scheduler.pending)
+
+    def test_priority(self):
+        scheduler = TaskScheduler(max_tasks=1, max_workers=8)
+        first = FakePanel(0)
+        scheduler.submit(first)
+        batch = [FakePanel(i) for i in range(1, 4)]
+        for panel in batch:
+            scheduler.submit(panel, TaskScheduler.PRIORITY_BATCH)
+        manual = FakePanel(4)
+        scheduler.submit(manual)
+
+        order = []
+        while scheduler.running:
+            panel = scheduler.running[0]
+            order.append(panel.task_info["id"])
+            scheduler.done(panel)
+        self.assertEqual(order, [0, 4, 1, 2, 3])
+
+    def test_rebalance(self):
+        scheduler = TaskScheduler(max_tasks=4, max_workers=12)
+        panels = [FakePanel(i, worker_limit=8) for i in range(3)]
+        scheduler.submit(panels[0])
+        self.assertEqual(panels[0].target(), 8)
+        scheduler.submit(panels[1])
+        scheduler.submit(panels[2])
+        # 12个线程平均分配给3个任务
+        self.assertEqual([panel.target() for panel in panels], [4, 4, 4])
+        scheduler.done(panels[0])
+        self.assertEqual([panel.target() for panel in panels[1:]], [6, 6])
+        scheduler.done(panels[1])
+        self.assertEqual(panels[2].target(), 8)
+        self.assertEqual(panels[2].workers, 8)
+
+    def test_async_not_counted(self):
+        scheduler = TaskScheduler(max_tasks=3, max_workers=10)
+        async_panel = FakePanel(0, threaded=False)
+        panel = FakePanel(1, worker_limit=10)
+        scheduler.submit(async_panel)
+        scheduler.submit(panel)
+        self.assertEqual(panel.target(), 10)
+
+    def test_configure(self):
+        scheduler = TaskScheduler(max_tasks=1, max_workers=8)
+        panels = [FakePanel(i) for i in range(3)]
+        for panel in panels:
+            scheduler.submit(panel)
+        self.assertEqual(len(scheduler.running), 1)
+        scheduler.configure(max_tasks=3, max_workers=6)
+        self.assertEqual(len(scheduler.running), 3)
+        self.assertEqual([panel.target() for panel in panels], [2, 2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+import tempfile
+import shutil
+import json
+import sys
+import os
+
+import httpx
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus import segment
+from archoctopus.segment import PartsJournal, SegmentedDownload, SegmentError, split_ranges, segment_total
+
+URL = "https://example.com/large.jpg"
+ETAG = '"v1"'
+
+
+class BrokenStream(httpx.SyncByteStream):
+    """发送部分数据后连接中断"""
+
+    def __init__(self, data: bytes, limit: int):
+        self.data = data
+        self.limit = limit
+
+    def __iter__(self):
+        yield self.data[:self.limit]
+        raise httpx.ReadError("connection reset")
+
+
+class RangeServer:
+    """模拟支持Range请求的图片服务器"""
+
+    def __init__(self, data: bytes, etag: str = ETAG):
+        self.data = data
+        self.etag = etag
+        self.ranges = []
+        self.break_at = None    # 从该位置开始的分段在发送部分数据后中断
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        headers = {"Accept-Ranges": "bytes", "ETag": self.etag}
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if not range_header or (if_range and if_range != self.etag):
+            return httpx.Response(200, headers=headers, content=self.data)
+        start, end = (int(x) for x in range_header[len("bytes="):].split("-"))
+        self.ranges.append((start, end))
+        body = self.data[start:end + 1]
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(self.data)}"
+        if start == self.break_at:
+            self.break_at = None
+            return httpx.Response(206, headers=headers, stream=BrokenStream(body, len(body) // 2))
+        return httpx.Response(206, headers=headers, content=body)
+
+
+class RejectSniffer:
+    def feed(self, chunk):
+        return True
+
+
+class SegmentTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.tmp_file = os.path.join(self.dir, "large.tmp")
+        self.data = os.urandom(4 * segment.SEGMENT_MIN_SIZE + 12345)
+        self.server = RangeServer(self.data)
+        self.session = httpx.Client(transport=httpx.MockTransport(self.server))
+
+    def tearDown(self):
+        self.session.close()
+        shutil.rmtree(self.dir)
+
+    def read(self) -> bytes:
+        with open(self.tmp_file, "rb") as f:
+            return f.read()
+
+    def test_split_ranges(self):
+        ranges = split_ranges(10 * segment.SEGMENT_MIN_SIZE + 7, 4)
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 10 * segment.SEGMENT_MIN_SIZE + 6)
+        for prev, cur in zip(ranges, ranges[1:]):
+            self.assertEqual(prev[1] + 1, cur[0])
+        # 文件较小时减少分段数
+        self.assertEqual(len(split_ranges(segment.SEGMENT_MIN_SIZE + 1, 8)), 1)
+
+    def test_segment_total(self):
+        response = self.session.get(URL)
+        self.assertEqual(segment_total(response, 1024), len(self.data))
+        self.assertIsNone(segment_total(response, len(self.data) + 1))
+        response = httpx.Response(200, headers={"Content-Length": "99999999"})
+        self.assertIsNone(segment_total(response, 1024))
+
+    def test_download(self):
+        journal = PartsJournal.create(self.tmp_file, URL, len(self.data), ETAG, 4)
+        self.assertEqual(os.path.getsize(self.tmp_file), len(self.data))
+        self.assertTrue(SegmentedDownload(self.session, URL, journal).run())
+        self.assertEqual(self.read(), self.data)
+        self.assertEqual(len(self.server.ranges), 4)
+        self.assertFalse(os.path.exists(journal.path))
+
+    def test_resume(self):
+        journal = PartsJournal.create(self.tmp_file, URL, len(self.data), ETAG, 4)
+        third = journal.segments[2]
+        self.server.break_at = third[0]
+        with self.assertRaises(httpx.ReadError):
+            SegmentedDownload(self.session, URL, journal).run()
+        # 中断后进度记录在.parts文件中
+        with open(journal.path, "r", encoding="utf-8") as f:
+            saved = json.load(f)["segments"]
+        self.assertTrue(0 < saved[2][2] <= (third[1] - third[0] + 1) // 2)
+
+        self.server.ranges.clear()
+        journal = PartsJournal.load(self.tmp_file, URL)
+        self.assertIsNotNone(journal)
+        self.assertTrue(SegmentedDownload(self.session, URL, journal).run())
+        self.assertEqual(self.read(), self.data)
+        # 只请求未完成分段的剩余部分
+        expected = [(start + written, end) for start, end, written in saved if written <= end - start]
+        self.assertIn((third[0] + saved[2][2], third[1]), expected)
+        self.assertEqual(sorted(self.server.ranges), expected)
+
+    def test_changed_file(self):
+        journal = PartsJournal.create(self.tmp_file, URL, len(self.data), '"v0"', 4)
+        with self.assertRaises(SegmentError):
+            SegmentedDownload(self.session, URL, journal).run()
+
+    def test_invalid_journal(self):
+        journal = PartsJournal.create(self.tmp_file, URL, len(self.data), ETAG, 4)
+        self.assertIsNone(PartsJournal.load(self.tmp_file, "https://example.com/other.jpg"))
+        self.assertFalse(os.path.exists(journal.path))
+
+    def test_reject(self):
+        journal = PartsJournal.create(self.tmp_file, URL, len(self.data), ETAG, 4)
+        self.assertFalse(SegmentedDownload(self.session, URL, journal).run(sniffer=RejectSniffer()))
+        self.assertFalse(os.path.exists(self.tmp_file))
+        self.assertFalse(os.path.exists(journal.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
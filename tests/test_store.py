@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+import tempfile
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus.database import AoDatabase
+from archoctopus.store import ContentStore, file_sha256, materialize
+
+
+class ContentStoreTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.con = AoDatabase(db=os.path.join(self.tmp_dir.name, "test.db"))
+        self.store = ContentStore(self.con)
+
+    def tearDown(self) -> None:
+        self.con.on_close()
+        self.con.join()
+        self.tmp_dir.cleanup()
+
+    def _write(self, name: str, data: bytes) -> str:
+        file = os.path.join(self.tmp_dir.name, name)
+        with open(file, "wb") as f:
+            f.write(data)
+        return file
+
+    def test_materialize(self):
+        src = self._write("src.jpeg", b"x" * 100)
+        dst = os.path.join(self.tmp_dir.name, "dst.jpeg")
+        self.assertIn(materialize(src, dst), ("link", "reflink", "copy"))
+        with open(dst, "rb") as f:
+            self.assertEqual(f.read(), b"x" * 100)
+
+    def test_fetch(self):
+        """已登记的url直接生成副本, 登记的文件被删除后视为未命中"""
+        file = self._write("a.jpeg", b"a" * 1000)
+        self.store.add("https://example.com/a.jpg", file_sha256(file).hexdigest(), file, ".jpeg", (10, 10))
+
+        dst = os.path.join(self.tmp_dir.name, "b.tmp")
+        blob = self.store.fetch("https://example.com/a.jpg", dst)
+        self.assertEqual(blob.path, file)
+        self.assertEqual(blob.bytes, 1000)
+        self.assertTrue(os.path.isfile(dst))
+        self.assertIsNone(self.store.fetch("https://example.com/c.jpg", dst))
+        self.assertEqual(self.store.saved_bytes(), 1000)
+
+        os.remove(file)
+        self.assertIsNone(self.store.fetch("https://example.com/a.jpg", dst))
+
+    def test_add_duplicate(self):
+        """不同url内容相同时, 新文件替换为已有文件的链接"""
+        first = self._write("first.jpeg", b"b" * 1000)
+        second = self._write("second.jpeg", b"b" * 1000)
+        sha256 = file_sha256(first).hexdigest()
+        self.assertEqual(self.store.add("https://example.com/first.jpg", sha256, first), 0)
+        saved = self.store.add("https://example.com/second.jpg", sha256, second)
+
+        self.assertEqual(self.store.lookup("https://example.com/second.jpg").path, first)
+        with open(second, "rb") as f:
+            self.assertEqual(f.read(), b"b" * 1000)
+        if os.path.samefile(first, second):     # 文件系统支持硬链接
+            self.assertEqual(saved, 1000)
+            self.assertEqual(self.store.saved_bytes(), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import tempfile
+import hashlib
+import shutil
+import sys
+import os
+
+os.chdir(os.path.dirname(__file__))
+sys.path.extend(["../", ])
+
+from archoctopus import writer
+from archoctopus.writer import ChunkWriter, ReusableBuffer, buffer_size
+
+
+class WriterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, "image.tmp")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self) -> bytes:
+        with open(self.file, "rb") as f:
+            return f.read()
+
+    def test_buffer_size(self):
+        self.assertEqual(buffer_size(None), writer.DEFAULT_BUFFER)
+        self.assertEqual(buffer_size(50 * 1024), writer.MIN_BUFFER)
+        self.assertEqual(buffer_size(20 * 1024 * 1024), writer.MAX_BUFFER)
+        self.assertTrue(writer.MIN_BUFFER < buffer_size(1024 * 1024) < writer.MAX_BUFFER)
+
+    def test_write(self):
+        data = os.urandom(3 * 1024 * 1024 + 17)
+        sizes = [1, 100, 16384, 65536, 2 * 1024 * 1024, 7]     # 包括超过缓冲区的数据块
+        digest = hashlib.sha256()
+        with ChunkWriter(self.file, "wb", length=len(data), digest=digest) as chunk_writer:
+            pos = 0
+            while pos < len(data):
+                for size in sizes:
+                    chunk_writer.write(data[pos:pos + size])
+                    pos += size
+        self.assertEqual(self.read(), data)
+        self.assertEqual(chunk_writer.written, len(data))
+        self.assertEqual(digest.hexdigest(), hashlib.sha256(data).hexdigest())
+
+    def test_try_buffer(self):
+        """try_buffer只复制到缓冲区, 空间不足时由write写入文件(异步下载时在线程池中调用)"""
+        data = os.urandom(300 * 1024)
+        with ChunkWriter(self.file, "wb", buffer=ReusableBuffer()) as chunk_writer:
+            writes = 0
+            for pos in range(0, len(data), 16384):
+                chunk = data[pos:pos + 16384]
+                if not chunk_writer.try_buffer(chunk):
+                    chunk_writer.write(chunk)
+                    writes += 1
+            self.assertEqual(chunk_writer.written + chunk_writer.pos, len(data))     # 其余数据在缓冲区中
+        self.assertGreater(writes, 0)
+        self.assertEqual(self.read(), data)
+
+    def test_append(self):
+        with ChunkWriter(self.file, "wb") as chunk_writer:
+            chunk_writer.write(b"head")
+        with ChunkWriter(self.file, "ab") as chunk_writer:
+            chunk_writer.write(b"tail")
+        self.assertEqual(self.read(), b"headtail")
+
+    def test_interrupted(self):
+        """预先分配后下载中断时, 按实际写入长度截断, 已接收的数据写入文件"""
+        length = 4 * 1024 * 1024
+        with self.assertRaises(ConnectionError):
+            with ChunkWriter(self.file, "wb", length=length) as chunk_writer:
+                chunk_writer.write(b"x" * 1000)
+                raise ConnectionError
+        self.assertEqual(self.read(), b"x" * 1000)
+
+    def test_reusable_buffer(self):
+        buffer = ReusableBuffer()
+        first = buffer.get(1024)
+        self.assertIs(buffer.get(512).obj, first.obj)
+        self.assertEqual(len(buffer.get(4096)), 4096)
+
+
+if __name__ == '__main__':
+    unittest.main()